@@ -6,11 +6,13 @@ A Flask-based web app that provides the complete question improvement pipeline.
 
 import json
 import os
+import threading
+import time
 from typing import Dict, Optional
 
 # Check if Flask is available
 try:
-    from flask import Flask, render_template, request, jsonify
+    from flask import Flask, render_template, request, jsonify, Response, stream_with_context, g
     FLASK_AVAILABLE = True
 except ImportError:
     print("❌ Flask not installed. Install with: pip install flask")
@@ -19,150 +21,122 @@ except ImportError:
 # Import our question improvement functions
 from simple_question_tester import (
     PROMPT_TEMPLATES,
-    match_question_to_template_simple,
-    transform_question_with_template_simple,
     calculate_metrics_for_text,
-    should_polish_with_ollama,
-    polish_low_scoring_questions
+    get_polish_flight_stats
 )
+from streaming_stats import ImprovementStats
+from pipeline_engine import PipelineEngine, POLISH_AUTO, POLISH_FORCE, POLISH_NONE, build_pipeline_results
+from ollama_health import get_ollama_health
+from ollama_client import get_pool_stats
+from instrumentation import get_instrumentation, get_instrumentation_snapshot
+from profiling import Profiler, PROFILE_CPROFILE, PROFILE_MODES
+from prometheus_metrics import (CONTENT_TYPE as PROMETHEUS_CONTENT_TYPE, enable_stage_metrics, is_local_address,
+                                observe_request, record_pipeline_result, render_metrics)
+
+# Allow profiling single requests with ?profile=1 (or ?profile=sample); off by default since it writes files
+PROFILE_REQUESTS = os.environ.get("PROFILE_REQUESTS", "0").lower() in ("1", "true", "yes")
 
 if FLASK_AVAILABLE:
     app = Flask(__name__)
     # Configuration
     app.config['SECRET_KEY'] = 'your-secret-key-here'
+    # Stage latencies (Ollama calls included) for the Prometheus endpoint
+    enable_stage_metrics()
+
+# Running improvement summary for everything processed by this server process
+IMPROVEMENT_STATS = ImprovementStats()
+_improvement_stats_lock = threading.Lock()
+
+def stats_question_type(question_type: Optional[str]) -> str:
+    """Known template types as is; free-form client types fold into "other" to keep per-type state bounded."""
+    q_type = question_type or "Unknown"
+    return q_type if q_type in PROMPT_TEMPLATES or q_type == "Unknown" else "other"
+
+def record_improvement_stats(results: Dict, question_type: Optional[str] = None) -> None:
+    """Feed one pipeline result into the server-wide improvement summary."""
+    # Free-form types would make unbounded Prometheus label sets and per-type accumulators
+    q_type = stats_question_type(question_type)
+    record_pipeline_result(q_type, results['template_matched'], results['ollama_used'])
+    with _improvement_stats_lock:
+        IMPROVEMENT_STATS.count_question(q_type)
+        if results['template_matched']:
+            IMPROVEMENT_STATS.add('template', results['template_improvement'], q_type)
+            IMPROVEMENT_STATS.add_score('template', results['template_enhanced_score'], q_type)
+        if results['ollama_used']:
+            IMPROVEMENT_STATS.add('ollama', results['final_improvement'], q_type)
+            IMPROVEMENT_STATS.add_score('ollama', results['final_enhanced_score'], q_type)
+        IMPROVEMENT_STATS.add('final', results['final_improvement'], q_type)
+        IMPROVEMENT_STATS.add_score('final', results['final_enhanced_score'], q_type)
 
 def get_question_types():
     """Get list of available question types for dropdown."""
     return list(PROMPT_TEMPLATES.keys())
 
-def process_question_pipeline(question_text: str, question_type: Optional[str] = None) -> Dict:
+def sse_event(event: str, data: Dict) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def process_question_pipeline(question_text: str, question_type: Optional[str] = None,
+                              polish: bool = True, force_polish: bool = False) -> Dict:
     """
     Process a question through the complete pipeline.
     
     Args:
         question_text: The original question text
         question_type: Optional question type for targeted processing
+        polish: Run the Ollama polishing stage (False stops after templates)
+        force_polish: Polish once even if the template score is at or above the threshold
         
     Returns:
         Dictionary with all pipeline results
     """
-    # Calculate original metrics
-    original_metrics = calculate_metrics_for_text(question_text)
-    original_enhanced_score = sum([
-        original_metrics['clarity'],
-        original_metrics['conciseness'],
-        original_metrics['technical_accuracy'],
-        original_metrics['actionability']
-    ]) / 4
-    
-    # Initialize results
-    results = {
-        'original_text': question_text,
-        'original_metrics': original_metrics,
-        'original_enhanced_score': original_enhanced_score,
-        'template_matched': False,
-        'template_improved_text': question_text,
-        'template_metrics': original_metrics,
-        'template_enhanced_score': original_enhanced_score,
-        'ollama_used': False,
-        'ollama_improved_text': question_text,
-        'final_metrics': original_metrics,
-        'final_enhanced_score': original_enhanced_score,
-        'template_improvement': 0.0,
-        'final_improvement': 0.0,
-        'ollama_additional_improvement': 0.0
-    }
-    
-    # Try template matching
-    if question_type and question_type in PROMPT_TEMPLATES:
-        templates = PROMPT_TEMPLATES[question_type]
-        template, match_obj = match_question_to_template_simple(question_text, templates)
-        
-        if template and match_obj:
-            template_improved_text = transform_question_with_template_simple(question_text, template, match_obj)
-            template_metrics = calculate_metrics_for_text(template_improved_text)
-            template_enhanced_score = sum([
-                template_metrics['clarity'],
-                template_metrics['conciseness'],
-                template_metrics['technical_accuracy'],
-                template_metrics['actionability']
-            ]) / 4
-            
-            results.update({
-                'template_matched': True,
-                'template_improved_text': template_improved_text,
-                'template_metrics': template_metrics,
-                'template_enhanced_score': template_enhanced_score,
-                'template_improvement': template_enhanced_score - original_enhanced_score
-            })
-    
-    # Check if Ollama polishing is needed
-    if not results['template_matched']:
-        try:
-            ollama_improved_text = polish_low_scoring_questions(
-                results['template_improved_text'],
-                results['template_metrics'],
-                question_type or "Unknown"
-            )
-            
-            if ollama_improved_text != results['template_improved_text']:
-                final_metrics = calculate_metrics_for_text(ollama_improved_text)
-                final_enhanced_score = sum([
-                    final_metrics['clarity'],
-                    final_metrics['conciseness'],
-                    final_metrics['technical_accuracy'],
-                    final_metrics['actionability']
-                ]) / 4
-                
-                results.update({
-                    'ollama_used': True,
-                    'ollama_improved_text': ollama_improved_text,
-                    'final_metrics': final_metrics,
-                    'final_enhanced_score': final_enhanced_score,
-                    'final_improvement': final_enhanced_score - original_enhanced_score,
-                    'ollama_additional_improvement': final_enhanced_score - results['template_enhanced_score']
-                })
-            else:
-                results['final_improvement'] = results['template_improvement']
-        except Exception as e:
-            # If Ollama fails, use template results
-            results['final_improvement'] = results['template_improvement']
-    elif should_polish_with_ollama(results['template_metrics'], threshold=9.0):
-        try:
-            ollama_improved_text = polish_low_scoring_questions(
-                results['template_improved_text'],
-                results['template_metrics'],
-                question_type or "Unknown"
-            )
-            
-            if ollama_improved_text != results['template_improved_text']:
-                final_metrics = calculate_metrics_for_text(ollama_improved_text)
-                final_enhanced_score = sum([
-                    final_metrics['clarity'],
-                    final_metrics['conciseness'],
-                    final_metrics['technical_accuracy'],
-                    final_metrics['actionability']
-                ]) / 4
-                
-                results.update({
-                    'ollama_used': True,
-                    'ollama_improved_text': ollama_improved_text,
-                    'final_metrics': final_metrics,
-                    'final_enhanced_score': final_enhanced_score,
-                    'final_improvement': final_enhanced_score - original_enhanced_score,
-                    'ollama_additional_improvement': final_enhanced_score - results['template_enhanced_score']
-                })
-            else:
-                results['final_improvement'] = results['template_improvement']
-        except Exception as e:
-            # If Ollama fails, use template results
-            results['final_improvement'] = results['template_improvement']
-    else:
-        results['final_improvement'] = results['template_improvement']
-    
-    return results
+    mode = POLISH_NONE if not polish else POLISH_FORCE if force_polish else POLISH_AUTO
+    state = PipelineEngine(polish=mode).run_one(question_text, question_type or "")
+    return build_pipeline_results(state)
 
 if FLASK_AVAILABLE:
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        """Count the request and its latency under its route rule."""
+        started = g.pop('request_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            observe_request(route, request.method, response.status_code, time.perf_counter() - started)
+        return response
+
+    @app.before_request
+    def start_request_profile():
+        """Profile this request when PROFILE_REQUESTS is on and it asks for it."""
+        if not PROFILE_REQUESTS:
+            return
+        mode = request.args.get('profile', request.headers.get('X-Profile', '')).lower()
+        if not mode or mode in ('0', 'false', 'no'):
+            return
+        if mode not in PROFILE_MODES:
+            mode = PROFILE_CPROFILE
+        name = f"request-{request.endpoint or 'unknown'}-{int(time.time() * 1000)}"
+        g.profiler = Profiler(name, mode, current_thread_only=True).start()
+
+    @app.after_request
+    def finish_request_profile(response):
+        """Write the request's profile and point to it from the response headers."""
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            paths = profiler.stop()
+            response.headers['X-Profile-Files'] = ", ".join(paths.values())
+        return response
+
+    @app.teardown_request
+    def abort_request_profile(error=None):
+        # after_request is skipped when a view raises
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.stop()
+
     @app.route('/')
     def index():
         """Home page with navigation."""
@@ -247,6 +221,7 @@ if FLASK_AVAILABLE:
             
             # Process through pipeline
             results = process_question_pipeline(question_text, question_type)
+            record_improvement_stats(results, question_type)
             
             return jsonify({
                 'success': True,
@@ -267,37 +242,10 @@ if FLASK_AVAILABLE:
             if not question_text:
                 return jsonify({'error': 'No question text provided'}), 400
             
-            # Process through pipeline with Ollama
-            results = process_question_pipeline(question_text, question_type)
+            # Process through pipeline, polishing exactly once regardless of the template score
+            results = process_question_pipeline(question_text, question_type, force_polish=True)
             
-            # Force Ollama polishing if not already used
-            if not results['ollama_used']:
-                try:
-                    ollama_improved_text = polish_low_scoring_questions(
-                        results['template_improved_text'],
-                        results['template_metrics'],
-                        question_type or "Unknown"
-                    )
-                    
-                    if ollama_improved_text != results['template_improved_text']:
-                        final_metrics = calculate_metrics_for_text(ollama_improved_text)
-                        final_enhanced_score = sum([
-                            final_metrics['clarity'],
-                            final_metrics['conciseness'],
-                            final_metrics['technical_accuracy'],
-                            final_metrics['actionability']
-                        ]) / 4
-                        
-                        results.update({
-                            'ollama_used': True,
-                            'ollama_improved_text': ollama_improved_text,
-                            'final_metrics': final_metrics,
-                            'final_enhanced_score': final_enhanced_score,
-                            'final_improvement': final_enhanced_score - results['original_enhanced_score'],
-                            'ollama_additional_improvement': final_enhanced_score - results['template_enhanced_score']
-                        })
-                except Exception as e:
-                    results['error'] = f"Ollama polishing failed: {str(e)}"
+            record_improvement_stats(results, question_type)
             
             return jsonify({
                 'success': True,
@@ -307,6 +255,39 @@ if FLASK_AVAILABLE:
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
+    @app.route('/api/start_ollama/stream', methods=['POST'])
+    def api_start_ollama_stream():
+        """Streaming variant of /api/start_ollama that forwards generated tokens as Server-Sent Events."""
+        data = request.get_json() or {}
+        question_text = data.get('question_text', '').strip()
+        question_type = data.get('question_type', '').strip()
+        
+        if not question_text:
+            return jsonify({'error': 'No question text provided'}), 400
+        
+        def events():
+            try:
+                # Template stages first, so the page can show them before the first token
+                engine = PipelineEngine(polish=POLISH_FORCE)
+                for event, payload in engine.run_stream(question_text, question_type):
+                    if event == 'template':
+                        yield sse_event('pipeline', {'results': build_pipeline_results(payload)})
+                    elif event == 'token':
+                        yield sse_event('token', {'text': payload})
+                    else:
+                        results = build_pipeline_results(payload)
+                
+                record_improvement_stats(results, question_type)
+                yield sse_event('done', {'success': True, 'results': results})
+                
+            except Exception as e:
+                yield sse_event('error', {'error': str(e)})
+        
+        return Response(stream_with_context(events()), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+
     @app.route('/api/demo_examples', methods=['GET'])
     def api_demo_examples():
         """API endpoint for getting demo examples from CSV."""
@@ -324,6 +305,60 @@ if FLASK_AVAILABLE:
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
+    @app.route('/api/improvement_stats', methods=['GET'])
+    def api_improvement_stats():
+        """API endpoint for streaming improvement statistics and percentiles."""
+        try:
+            include_histograms = request.args.get('histograms', '').lower() in ('1', 'true', 'yes')
+            
+            with _improvement_stats_lock:
+                summary = IMPROVEMENT_STATS.to_dict(include_histograms=include_histograms)
+            
+            return jsonify({
+                'success': True,
+                'stats': summary,
+                'polish_coalescing': get_polish_flight_stats()
+            })
+            
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/ollama_status', methods=['GET'])
+    def api_ollama_status():
+        """API endpoint for the Ollama circuit breaker state and skipped polish count."""
+        try:
+            return jsonify({
+                'success': True,
+                'status': get_ollama_health(),
+                'endpoints': get_pool_stats()
+            })
+            
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/instrumentation', methods=['GET'])
+    def api_instrumentation():
+        """API endpoint for per-stage and per-type latency percentiles and counters (?reset=1 starts a new window)."""
+        try:
+            snapshot = get_instrumentation_snapshot()
+            if request.args.get('reset', '').lower() in ('1', 'true', 'yes'):
+                get_instrumentation().reset()
+            
+            return jsonify({
+                'success': True,
+                'instrumentation': snapshot
+            })
+            
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/metrics/prometheus', methods=['GET'])
+    def prometheus_metrics():
+        """Prometheus text exposition of request, pipeline, Ollama and cache metrics (local scrapers only)."""
+        if not is_local_address(request.remote_addr):
+            return Response("Forbidden\n", status=403, mimetype='text/plain')
+        return Response(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
+
 if __name__ == '__main__':
     if not FLASK_AVAILABLE:
         print("❌ Flask is required to run the web application.")
@@ -345,7 +380,12 @@ if __name__ == '__main__':
     print("   • /api/calculate_metrics - API for metrics calculation")
     print("   • /api/improve_question - API for question improvement")
     print("   • /api/start_ollama - API for manual Ollama polishing")
+    print("   • /api/start_ollama/stream - Streaming (SSE) version of /api/start_ollama")
     print("   • /api/demo_examples - API for demo examples")
+    print("   • /api/improvement_stats - API for improvement percentiles and histograms")
+    print("   • /api/ollama_status - API for Ollama health and circuit breaker state")
+    print("   • /api/instrumentation - API for per-stage latency percentiles")
+    print("   • /metrics/prometheus - Prometheus metrics for local scrapers")
     print()
     print("🌐 Starting Flask development server...")
     print("   Open http://localhost:5000 in your browser")
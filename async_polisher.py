@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Async Polisher - concurrent Ollama polishing for bulk runs.
+Runs many polish requests at once with a concurrency limit and a per-request
+timeout, and returns results in the same order as the requests.
+"""
+
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from reporter import get_reporter
+from ollama_health import record_polish_failure
+
+# Configuration (override with environment variables)
+POLISH_CONCURRENCY = int(os.environ.get("POLISH_CONCURRENCY", "4"))
+POLISH_TIMEOUT = float(os.environ.get("POLISH_TIMEOUT", "120"))
+
+
+def _default_polish_fn() -> Callable[..., str]:
+    # Imported lazily: simple_question_tester imports this module
+    from simple_question_tester import polish_low_scoring_questions
+    return polish_low_scoring_questions
+
+
+def _release_slot(loop: asyncio.AbstractEventLoop, semaphore: asyncio.Semaphore, _future) -> None:
+    try:
+        loop.call_soon_threadsafe(semaphore.release)
+    except RuntimeError:
+        # The run already finished and closed its loop; nobody is waiting for the slot
+        pass
+
+
+async def _polish_one(request: Dict, polish_fn: Callable[..., str], executor: ThreadPoolExecutor,
+                      semaphore: asyncio.Semaphore, timeout: Optional[float]) -> Dict:
+    question_text = request['question_text']
+    outcome = {
+        'polished_text': question_text,
+        'timed_out': False,
+        'error': None,
+        'elapsed': 0.0
+    }
+    loop = asyncio.get_running_loop()
+    call = functools.partial(
+        polish_fn,
+        question_text,
+        request.get('template_metrics', {}),
+        request.get('question_type', ""),
+        request.get('error_traceback', ""),
+        **({'force': True} if request.get('force') else {})
+    )
+    await semaphore.acquire()
+    start = time.perf_counter()
+    future = executor.submit(call)
+    # The slot is freed when the worker thread finishes, not when we stop waiting
+    # for it, so a timed-out call that is still running counts against the limit
+    future.add_done_callback(functools.partial(_release_slot, loop, semaphore))
+    try:
+        outcome['polished_text'] = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    except asyncio.TimeoutError:
+        # The worker thread cannot be interrupted; its late result is discarded
+        outcome['timed_out'] = True
+        outcome['error'] = f"Timed out after {timeout:.1f}s"
+        record_polish_failure(outcome['error'])
+    except Exception as e:
+        outcome['error'] = str(e)
+    outcome['elapsed'] = time.perf_counter() - start
+    return outcome
+
+
+async def polish_questions_async(requests: List[Dict], concurrency: int = POLISH_CONCURRENCY,
+                                 timeout: Optional[float] = POLISH_TIMEOUT,
+                                 polish_fn: Optional[Callable[..., str]] = None) -> List[Dict]:
+    """
+    Polish many questions concurrently.
+
+    Args:
+        requests: One dictionary per question with 'question_text', 'template_metrics',
+            'question_type' and 'error_traceback' (same arguments as polish_low_scoring_questions),
+            plus an optional 'force' flag
+        concurrency: Maximum number of polish calls running, including timed-out
+            calls whose worker thread has not returned yet
+        timeout: Per-request timeout in seconds (None = no timeout)
+        polish_fn: Polishing function (default: polish_low_scoring_questions)
+
+    Returns:
+        One outcome per request, in request order, with 'polished_text' (the
+        original text on timeout or failure), 'timed_out', 'error' and 'elapsed'
+    """
+    if not requests:
+        return []
+    polish_fn = polish_fn or _default_polish_fn()
+    concurrency = max(1, concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    # One thread per slot: a slot is held until its thread is free again
+    executor = ThreadPoolExecutor(max_workers=min(len(requests), concurrency), thread_name_prefix="polish")
+    try:
+        return await asyncio.gather(*(
+            _polish_one(request, polish_fn, executor, semaphore, timeout) for request in requests
+        ))
+    finally:
+        # Do not wait for timed-out calls that are still running
+        executor.shutdown(wait=False)
+
+
+def polish_questions_concurrently(requests: List[Dict], concurrency: int = POLISH_CONCURRENCY,
+                                  timeout: Optional[float] = POLISH_TIMEOUT,
+                                  polish_fn: Optional[Callable[..., str]] = None) -> List[Dict]:
+    """
+    Synchronous entry point for polish_questions_async, for the bulk runners.
+
+    See polish_questions_async for arguments and return value.
+    """
+    start = time.perf_counter()
+    outcomes = asyncio.run(polish_questions_async(requests, concurrency, timeout, polish_fn))
+    elapsed = time.perf_counter() - start
+    if outcomes:
+        timed_out = sum(1 for o in outcomes if o['timed_out'])
+        failed = sum(1 for o in outcomes if o['error'] and not o['timed_out'])
+        get_reporter().info(f"   ⚡ Polished {len(outcomes)} questions in {elapsed:.1f}s with concurrency {max(1, concurrency)}"
+              f" ({len(outcomes) / elapsed if elapsed else 0:.2f}/s, {timed_out} timed out, {failed} failed)")
+    return outcomes
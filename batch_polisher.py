@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Batch Polisher - multi-question prompts for bulk Ollama polishing.
+Packs several short low-scoring questions and their diagnostics into one
+prompt, asks the model for a JSON array, and splits the answer back into
+per-question results. Items the model drops or mangles, and questions too
+long to pack, are polished on their own.
+"""
+
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from async_polisher import POLISH_CONCURRENCY, POLISH_TIMEOUT, polish_questions_concurrently
+from ollama_client import check_ollama_available, generate
+from reporter import get_reporter
+from instrumentation import stage_timer
+from ollama_health import allow_polish, record_polish_failure, record_polish_success
+from polish_cache import POLISH_PROMPT_VERSION, store_polish
+
+# Configuration (override with environment variables)
+POLISH_BATCH_SIZE = int(os.environ.get("POLISH_BATCH_SIZE", "8"))
+POLISH_BATCH_MAX_CHARS = int(os.environ.get("POLISH_BATCH_MAX_CHARS", "600"))  # Longer questions are polished alone
+POLISH_BATCH_TRACEBACK_CHARS = int(os.environ.get("POLISH_BATCH_TRACEBACK_CHARS", "400"))
+
+# Batch results come from a different prompt, so they are cached under their own version
+BATCH_PROMPT_VERSION = f"{POLISH_PROMPT_VERSION}-batch1"
+
+_CODE_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.MULTILINE)
+
+BATCH_INSTRUCTIONS = """You improve support questions written by users of an automation product.
+Rewrite each question below so it is clear, concise, technically accurate and actionable.
+Keep the original meaning and every concrete detail (names, values, error messages).
+Each question lists its current scores out of 10; focus on the lowest ones.
+
+Answer with ONLY a JSON array, one object per question, in this exact form:
+[{"id": 0, "improved_question": "..."}, {"id": 1, "improved_question": "..."}]
+Do not add explanations or any text outside the JSON array."""
+
+
+def _tester():
+    # Imported lazily: simple_question_tester imports this module
+    import simple_question_tester
+    return simple_question_tester
+
+
+def build_batch_prompt(items: List[Dict]) -> str:
+    """
+    Build one prompt for several questions.
+
+    Args:
+        items: Dictionaries with 'question_text', 'question_type' and 'diagnostics'
+            (as built by build_polish_diagnostics)
+
+    Returns:
+        Prompt text; item i is labelled with id i
+    """
+    sections = [BATCH_INSTRUCTIONS, ""]
+    for i, item in enumerate(items):
+        diagnostics = item.get('diagnostics', {})
+        sections.append(f"### Question id {i}")
+        if item.get('question_type'):
+            sections.append(f"Type: {item['question_type']}")
+        sections.append(
+            "Scores: clarity {:.1f}, conciseness {:.1f}, technical accuracy {:.1f}, actionability {:.1f}".format(
+                diagnostics.get('clarity_score', 0.0),
+                diagnostics.get('conciseness_score', 0.0),
+                diagnostics.get('technical_accuracy_score', 0.0),
+                diagnostics.get('actionability_score', 0.0)
+            )
+        )
+        error_traceback = diagnostics.get('error_traceback') or ""
+        if error_traceback:
+            # Only the end of a traceback names the error; keep batch prompts small
+            sections.append(f"Error: {error_traceback[-POLISH_BATCH_TRACEBACK_CHARS:]}")
+        sections.append(f"Question: {item['question_text']}")
+        sections.append("")
+    return "\n".join(sections)
+
+
+def parse_batch_response(response: str, count: int) -> Dict[int, str]:
+    """
+    Split a batch answer into per-question results.
+
+    Args:
+        response: Raw model output
+        count: Number of questions in the batch
+
+    Returns:
+        Dictionary of item id to improved question for every item that parsed and validated
+    """
+    text = _CODE_FENCE_RE.sub("", response.strip())
+    start, end = text.find("["), text.rfind("]")
+    if start < 0 or end <= start:
+        return {}
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError:
+        return {}
+    if not isinstance(data, list):
+        return {}
+
+    results: Dict[int, str] = {}
+    for position, entry in enumerate(data):
+        if isinstance(entry, dict):
+            item_id = entry.get('id', position)
+            improved = entry.get('improved_question')
+        elif isinstance(entry, str) and len(data) == count:
+            # Some models drop the objects and return bare strings in order
+            item_id, improved = position, entry
+        else:
+            continue
+        try:
+            item_id = int(item_id)
+        except (TypeError, ValueError):
+            continue
+        if not 0 <= item_id < count or item_id in results:
+            continue
+        if isinstance(improved, str) and improved.strip():
+            results[item_id] = improved.strip()
+    return results
+
+
+def polish_batch(items: List[Dict], generate_fn: Optional[Callable[..., str]] = None,
+                 timeout: Optional[float] = POLISH_TIMEOUT) -> Dict[int, str]:
+    """
+    Polish several questions with one model call.
+
+    Args:
+        items: See build_batch_prompt
+        generate_fn: Completion function taking a prompt (default: ollama_client.generate)
+        timeout: Read timeout in seconds for the call
+
+    Returns:
+        Dictionary of item index to polished text for the items that came back valid;
+        empty if the call failed, nothing in the answer parsed or the Ollama circuit is open
+    """
+    generate_fn = generate_fn or generate
+    if not allow_polish():
+        return {}
+    try:
+        with stage_timer("ollama_batch"):
+            response = generate_fn(build_batch_prompt(items), timeout=timeout)
+    except Exception as e:
+        record_polish_failure(str(e))
+        get_reporter().error(f"   ❌ Batch polishing of {len(items)} questions failed: {e}")
+        return {}
+    parsed = parse_batch_response(response, len(items))
+    if not parsed:
+        # An answer nothing could be read from is as useless as no answer; the
+        # caller retries every item on its own
+        record_polish_failure(f"Batch response for {len(items)} questions had no valid items")
+        return {}
+    record_polish_success()
+    return parsed
+
+
+def polish_questions_batched(requests: List[Dict], batch_size: int = POLISH_BATCH_SIZE,
+                             concurrency: int = POLISH_CONCURRENCY,
+                             timeout: Optional[float] = POLISH_TIMEOUT,
+                             generate_fn: Optional[Callable[..., str]] = None) -> List[Dict]:
+    """
+    Polish many questions, packing short ones into multi-question prompts.
+
+    Args:
+        requests: Same format as polish_questions_concurrently
+        batch_size: Maximum questions per prompt
+        concurrency: Number of model calls in flight at once
+        timeout: Per-call timeout in seconds
+        generate_fn: Completion function for batch prompts (default: ollama_client.generate)
+
+    Returns:
+        One outcome per request, in request order, in the polish_questions_concurrently
+        format plus 'batched' (True if the text came from a batch prompt)
+    """
+    if not requests:
+        return []
+    tester = _tester()
+    start = time.perf_counter()
+    outcomes: List[Optional[Dict]] = [None] * len(requests)
+    batchable: List[int] = []
+    individual: List[int] = []
+
+    for i, request in enumerate(requests):
+        question_text = request['question_text']
+        question_type = request.get('question_type', "")
+        if request.get('force'):
+            # Forced requests skip the threshold gate and the batch prompt
+            individual.append(i)
+            continue
+        if not tester.should_polish_with_ollama(request.get('template_metrics', {}), threshold=9.0):
+            outcomes[i] = _outcome(question_text)
+            continue
+        cached_text = tester.get_cached_polish_for_path(question_text, question_type, tester.POLISH_PATH_BATCH)
+        if cached_text is not None:
+            outcomes[i] = _outcome(cached_text)
+        elif len(question_text) <= POLISH_BATCH_MAX_CHARS and batch_size > 1:
+            batchable.append(i)
+        else:
+            individual.append(i)
+
+    if batchable and (generate_fn is not None or check_ollama_available()):
+        batches = [batchable[b:b + batch_size] for b in range(0, len(batchable), batch_size)]
+
+        def run_batch(indices: List[int]) -> Dict[int, str]:
+            items = [{
+                'question_text': requests[i]['question_text'],
+                'question_type': requests[i].get('question_type', ""),
+                'diagnostics': tester.build_polish_diagnostics(requests[i].get('template_metrics', {}),
+                                                               requests[i].get('error_traceback', ""))
+            } for i in indices]
+            return polish_batch(items, generate_fn, timeout)
+
+        retried = 0
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(batches))),
+                                thread_name_prefix="polish-batch") as executor:
+            for indices, parsed in zip(batches, executor.map(run_batch, batches)):
+                for position, i in enumerate(indices):
+                    if position not in parsed:
+                        # Dropped or malformed item: retry it on its own
+                        individual.append(i)
+                        retried += 1
+                        continue
+                    request = requests[i]
+                    polished_text = parsed[position]
+                    if polished_text != request['question_text']:
+                        store_polish(request['question_text'], polished_text, request.get('question_type', ""),
+                                     model=tester.polish_model_for(BATCH_PROMPT_VERSION),
+                                     prompt_version=BATCH_PROMPT_VERSION)
+                    outcomes[i] = _outcome(polished_text, batched=True)
+        get_reporter().info(f"   📦 Batch polished {len(batchable) - retried}/{len(batchable)} questions"
+              f" in {len(batches)} prompts ({retried} retried individually)")
+    else:
+        individual.extend(batchable)
+
+    if individual:
+        individual.sort()
+        single_outcomes = polish_questions_concurrently([requests[i] for i in individual],
+                                                        concurrency=concurrency, timeout=timeout)
+        for i, outcome in zip(individual, single_outcomes):
+            outcome['batched'] = False
+            outcomes[i] = outcome
+
+    elapsed = time.perf_counter() - start
+    get_reporter().info(f"   ⚡ Polishing stage finished for {len(requests)} questions in {elapsed:.1f}s")
+    return outcomes
+
+
+def _outcome(polished_text: str, batched: bool = False) -> Dict:
+    return {
+        'polished_text': polished_text,
+        'timed_out': False,
+        'error': None,
+        'elapsed': 0.0,
+        'batched': batched
+    }
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Benchmark - microbenchmarks and an end-to-end pipeline benchmark.
+Times regex pattern building, template matching per question type, template
+transforms, metrics scoring and the full process_question_pipeline (with
+a stubbed polisher, so no Ollama is needed) over questions_sample.csv plus
+synthetic worst cases. Reports ops/sec and latency percentiles, writes the
+results as JSON and compares them with a stored baseline; a regression
+beyond the tolerance, or a missing baseline (unless --allow-missing-baseline),
+makes the run exit non-zero. --polish-scaling also
+measures concurrent polish throughput against mock_ollama_server.
+"""
+
+import os
+
+# Measure the real work: no caches, no background health probe
+os.environ.setdefault("METRICS_CACHE_ENABLED", "0")
+os.environ.setdefault("POLISH_CACHE_ENABLED", "0")
+os.environ.setdefault("OLLAMA_HEALTH_PROBE", "0")
+
+import argparse
+import json
+import platform
+import re
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+import simple_question_tester as tester
+from simple_question_tester import (
+    PROMPT_TEMPLATES,
+    create_flexible_regex_pattern,
+    match_question_to_template_simple,
+    transform_question_with_template_simple,
+    calculate_metrics_for_text,
+    iter_questions_from_csv
+)
+from reporter import get_reporter, configure_reporter, QUIET
+from question_preprocessor import reset_preprocessor
+from instrumentation import get_instrumentation
+
+# Configuration (override with environment variables)
+BENCHMARK_CSV = os.environ.get("BENCHMARK_CSV", "questions_sample.csv")
+BENCHMARK_OUTPUT = os.environ.get("BENCHMARK_OUTPUT", "benchmark_results.json")
+BENCHMARK_BASELINE = os.environ.get("BENCHMARK_BASELINE", "benchmark_baseline.json")
+BENCHMARK_MIN_TIME = float(os.environ.get("BENCHMARK_MIN_TIME", "1.0"))  # Seconds spent timing each benchmark
+BENCHMARK_TOLERANCE = float(os.environ.get("BENCHMARK_TOLERANCE", "0.25"))  # Allowed slowdown before failing (0.25 = 25%)
+BENCHMARK_ALLOW_MISSING_BASELINE = os.environ.get("BENCHMARK_ALLOW_MISSING_BASELINE", "0").lower() in ("1", "true", "yes")
+SCALING_LATENCY_MS = float(os.environ.get("BENCHMARK_SCALING_LATENCY_MS", "100"))  # Mock Ollama time per polish
+SCALING_REQUESTS = int(os.environ.get("BENCHMARK_SCALING_REQUESTS", "32"))  # Polishes per concurrency level
+SCALING_CONCURRENCY = (1, 2, 4, 8)
+
+WARMUP_CALLS = 3
+MAX_CALLS = 1000000
+QUANTILES = (0.5, 0.9, 0.99)
+
+# Compared against the baseline; higher is better for ops_per_sec, lower for the latency
+COMPARED_FIELDS = (("ops_per_sec", True), ("p50_us", False))
+
+
+def stub_polisher(question_text: str, diagnostics: Dict, latency: float = 0.0) -> str:
+    """Deterministic stand-in for local_polisher.polish_question_with_fallback."""
+    if latency:
+        time.sleep(latency)
+    return question_text.rstrip(".") + ". Include the exact values from the error details."
+
+
+def install_stub_polisher(latency: float = 0.0) -> None:
+    """Route pipeline polishing to stub_polisher (optionally sleeping to mimic Ollama)."""
+    tester.POLISH_BACKEND = tester.POLISH_BACKEND_LOCAL
+    tester.OLLAMA_AVAILABLE = True
+    tester.polish_question_with_fallback = lambda text, diagnostics: stub_polisher(text, diagnostics, latency)
+
+
+def reset_pipeline_state() -> None:
+    """Start a benchmark from a fresh preprocessor and empty stage timers, so earlier benchmarks cannot skew it."""
+    reset_preprocessor()
+    get_instrumentation().reset()
+
+
+def synthetic_worst_cases() -> List[Dict]:
+    """Inputs that stress the lazy regex groups and the metrics scorers."""
+    parse_lines = "\n".join(f"`ensure the data's Gross Weight {n} is not negative` : the line must have an ensure clause"
+                            for n in range(2000))
+    field_expression = "|".join(f"field{n}" for n in range(500))
+    return [
+        {'type': 'ParseErrorQuestion', 'combined_text': "Please resolve the following lines, and run again " + parse_lines},
+        # Almost matches: the lazy groups expand across the whole text before the match fails
+        {'type': 'ParseErrorQuestion', 'combined_text': "Please resolve the following lines " + parse_lines},
+        {'type': 'ValueNotKnownQuestion', 'combined_text': "Please provide " + field_expression},
+        {'type': 'NativeCodeErrorQuestion', 'combined_text': "Could not process the statement \"" + "x " * 5000 + "\"."}
+    ]
+
+
+def load_inputs(csv_file: str) -> List[Dict]:
+    """Sample questions from csv_file followed by the synthetic worst cases."""
+    questions = [{'type': q['type'], 'combined_text': q['combined_text']} for q in iter_questions_from_csv(csv_file)]
+    return questions + synthetic_worst_cases()
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def run_benchmark(fn: Callable, inputs: Sequence, min_time: float = BENCHMARK_MIN_TIME) -> Dict:
+    """
+    Call fn(input) over inputs in a loop until min_time has passed, timing each call.
+
+    Args:
+        fn: Function under test, called with one input at a time
+        inputs: Inputs to cycle through (tuples are unpacked into arguments)
+        min_time: Seconds to keep calling
+
+    Returns:
+        Dictionary with calls, ops_per_sec and latency statistics in microseconds
+    """
+    call = (lambda item: fn(*item)) if inputs and isinstance(inputs[0], tuple) else fn
+    for item in inputs[:WARMUP_CALLS]:
+        call(item)
+
+    timings: List[float] = []
+    clock = time.perf_counter
+    started = clock()
+    deadline = started + min_time
+    while len(timings) < MAX_CALLS:
+        for item in inputs:
+            begin = clock()
+            call(item)
+            timings.append(clock() - begin)
+        if clock() >= deadline:
+            break
+    busy = sum(timings)
+
+    timings.sort()
+    return {
+        'calls': len(timings),
+        'inputs': len(inputs),
+        'ops_per_sec': len(timings) / busy if busy > 0 else 0.0,
+        'mean_us': busy / len(timings) * 1e6,
+        'min_us': timings[0] * 1e6,
+        'max_us': timings[-1] * 1e6,
+        **{f"p{int(q * 100)}_us": percentile(timings, q) * 1e6 for q in QUANTILES}
+    }
+
+
+def build_benchmarks(inputs: List[Dict]) -> Dict[str, tuple]:
+    """Benchmark name -> (function, inputs), in reporting order."""
+    # Imported here: app pulls in Flask (optional) and the Prometheus/profiling hooks
+    from app import process_question_pipeline
+
+    benchmarks: Dict[str, tuple] = {}
+    originals = [template["original"] for templates in PROMPT_TEMPLATES.values() for template in templates]
+    benchmarks["regex.create_pattern"] = (create_flexible_regex_pattern, originals)
+
+    transforms = []
+    for question_type, templates in PROMPT_TEMPLATES.items():
+        texts = [(q['combined_text'], templates) for q in inputs if q['type'] == question_type]
+        if not texts:
+            continue
+        benchmarks[f"match.{question_type}"] = (match_question_to_template_simple, texts)
+        for text, _ in texts:
+            template, match = match_question_to_template_simple(text, templates)
+            if template is not None:
+                transforms.append((text, template, match))
+    if transforms:
+        benchmarks["transform"] = (transform_question_with_template_simple, transforms)
+
+    texts = [q['combined_text'] for q in inputs]
+    benchmarks["metrics"] = (lambda text: calculate_metrics_for_text(text, use_cache=False), texts)
+    benchmarks["pipeline"] = (process_question_pipeline, [(q['combined_text'], q['type']) for q in inputs])
+    benchmarks["pipeline.worst_case"] = (process_question_pipeline,
+                                         [(q['combined_text'], q['type']) for q in synthetic_worst_cases()])
+    return benchmarks
+
+
+def run_suite(csv_file: str = BENCHMARK_CSV, min_time: float = BENCHMARK_MIN_TIME,
+              name_filter: Optional[str] = None, polish_latency: float = 0.0) -> Dict:
+    """
+    Run every benchmark (or those whose name matches name_filter).
+
+    Returns:
+        Results document: environment details plus per-benchmark statistics
+    """
+    report = get_reporter()
+    install_stub_polisher(polish_latency)
+    benchmarks = build_benchmarks(load_inputs(csv_file))
+    pattern = re.compile(name_filter) if name_filter else None
+
+    results: Dict[str, Dict] = {}
+    for name, (fn, inputs) in benchmarks.items():
+        if pattern is not None and not pattern.search(name):
+            continue
+        reset_pipeline_state()
+        results[name] = run_benchmark(fn, inputs, min_time)
+        print_benchmark(name, results[name])
+        report.event('benchmark', benchmark=name, **results[name])
+
+    return {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'csv': csv_file,
+        'min_time': min_time,
+        'polish_latency': polish_latency,
+        'benchmarks': results
+    }
+
+
+def run_polish_scaling(concurrency_levels: Sequence[int] = SCALING_CONCURRENCY, requests: int = SCALING_REQUESTS,
+                       latency_ms: float = SCALING_LATENCY_MS) -> Dict:
+    """
+    Measure concurrent polishing throughput against mock_ollama_server.
+
+    Runs polish_questions_concurrently through the real polish path (HTTP
+    client, endpoint pool, circuit breaker) at each concurrency level. With a
+    fixed server latency, throughput should grow close to linearly with
+    concurrency.
+
+    Args:
+        concurrency_levels: Concurrency settings to compare
+        requests: Distinct questions polished per level
+        latency_ms: Fixed mock server latency per request
+
+    Returns:
+        Dictionary with the settings and per-level seconds, polishes/s, speedup
+        over the first level and efficiency (speedup / concurrency ratio);
+        empty if the requests package is missing
+    """
+    from async_polisher import polish_questions_concurrently
+    from mock_ollama_server import run_mock_ollama_server
+    from ollama_client import configure_endpoint_pool, OLLAMA_HOSTS, REQUESTS_AVAILABLE
+
+    report = get_reporter()
+    if not REQUESTS_AVAILABLE:
+        report.info("⚠️  requests is not installed - skipping the polish scaling run")
+        return {}
+
+    levels = []
+    saved_backend = tester.POLISH_BACKEND
+    tester.POLISH_BACKEND = tester.POLISH_BACKEND_POOL
+    report.info(f"\n📈 POLISH SCALING (mock Ollama, {latency_ms:.0f} ms per request, {requests} requests per level)")
+    try:
+        with run_mock_ollama_server(latency_ms=latency_ms, latency_jitter_ms=0.0, latency_distribution="fixed",
+                                    tokens_per_second=0.0) as url:
+            configure_endpoint_pool([url])
+            for concurrency in concurrency_levels:
+                # Distinct texts per level so single-flight never coalesces them
+                batch = [{'question_text': f"Why does check {concurrency}-{n} fail?", 'template_metrics': {},
+                          'question_type': "ScalingQuestion", 'force': True} for n in range(requests)]
+                start = time.perf_counter()
+                outcomes = polish_questions_concurrently(batch, concurrency, timeout=None)
+                seconds = time.perf_counter() - start
+                levels.append({
+                    'concurrency': concurrency,
+                    'seconds': seconds,
+                    'per_sec': requests / seconds if seconds else 0.0,
+                    'failed': sum(1 for request, o in zip(batch, outcomes)
+                                  if o['error'] or o['polished_text'] == request['question_text'])
+                })
+    finally:
+        tester.POLISH_BACKEND = saved_backend
+        configure_endpoint_pool(OLLAMA_HOSTS)
+
+    base = levels[0] if levels else None
+    for level in levels:
+        level['speedup'] = level['per_sec'] / base['per_sec'] if base and base['per_sec'] else 0.0
+        level['efficiency'] = level['speedup'] / (level['concurrency'] / base['concurrency']) if base else 0.0
+        report.info(f"   concurrency {level['concurrency']:>3}  {level['per_sec']:8.2f} polishes/s  "
+                    f"speedup {level['speedup']:5.2f}x  efficiency {level['efficiency']:6.1%}  failed {level['failed']}")
+        report.event('polish_scaling', **level)
+    return {'latency_ms': latency_ms, 'requests': requests, 'levels': levels}
+
+
+def print_benchmark(name: str, result: Dict) -> None:
+    get_reporter().info(f"   {name:<38} {result['ops_per_sec']:12,.1f} ops/s  p50={result['p50_us']:10.1f}µs"
+                        f"  p90={result['p90_us']:10.1f}µs  p99={result['p99_us']:10.1f}µs  n={result['calls']:,}")
+
+
+def compare_with_baseline(results: Dict, baseline: Dict, tolerance: float = BENCHMARK_TOLERANCE) -> List[str]:
+    """
+    Compare results with a baseline document.
+
+    Args:
+        results: run_suite output
+        baseline: Earlier run_suite output
+        tolerance: Allowed relative slowdown (0.25 = 25%)
+
+    Returns:
+        Descriptions of every regression beyond the tolerance (empty if none)
+    """
+    report = get_reporter()
+    regressions = []
+    report.info(f"\n📏 COMPARED WITH BASELINE ({baseline.get('created_at', 'unknown date')}, tolerance {tolerance:.0%})")
+    for name, result in results['benchmarks'].items():
+        base = baseline.get('benchmarks', {}).get(name)
+        if base is None:
+            report.info(f"   {name:<38} (new, no baseline)")
+            continue
+        changes = []
+        for field, higher_is_better in COMPARED_FIELDS:
+            if not base.get(field):
+                continue
+            change = result[field] / base[field] - 1
+            slowdown = -change if higher_is_better else change
+            changes.append(f"{field} {change:+.1%}")
+            if slowdown > tolerance:
+                regressions.append(f"{name}: {field} {base[field]:,.1f} -> {result[field]:,.1f} ({change:+.1%})")
+        status = "❌" if any(r.startswith(f"{name}:") for r in regressions) else "✅"
+        report.info(f"   {status} {name:<36} " + "  ".join(changes))
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Question pipeline benchmarks")
+    parser.add_argument("--csv", default=BENCHMARK_CSV, help="Questions to benchmark with")
+    parser.add_argument("--min-time", type=float, default=BENCHMARK_MIN_TIME, help="Seconds per benchmark")
+    parser.add_argument("-k", "--filter", default=None, help="Only run benchmarks whose name matches this regex")
+    parser.add_argument("--polish-latency", type=float, default=0.0,
+                        help="Seconds the stub polisher sleeps per call (default: 0, CPU cost only)")
+    parser.add_argument("--output", default=BENCHMARK_OUTPUT, help="Where to write the results JSON")
+    parser.add_argument("--baseline", default=BENCHMARK_BASELINE, help="Baseline results to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--allow-missing-baseline", action="store_true", default=BENCHMARK_ALLOW_MISSING_BASELINE,
+                        help="Exit 0 when there is no baseline to compare with (default: fail)")
+    parser.add_argument("--tolerance", type=float, default=BENCHMARK_TOLERANCE,
+                        help="Allowed slowdown before the run fails (0.25 = 25%%)")
+    parser.add_argument("--polish-scaling", action="store_true",
+                        help="Also measure concurrent polish throughput against mock_ollama_server")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Only print regressions and errors")
+    args = parser.parse_args(argv)
+    if args.quiet:
+        configure_reporter(verbosity=QUIET)
+
+    report = get_reporter()
+    report.info("⏱️  BENCHMARKS")
+    report.info("=" * 60)
+    results = run_suite(args.csv, args.min_time, args.filter, args.polish_latency)
+    if args.polish_scaling:
+        results['polish_scaling'] = run_polish_scaling()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    report.info(f"\n💾 Results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        report.info(f"📌 Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        if args.allow_missing_baseline:
+            report.info(f"ℹ️  No baseline at {args.baseline} - nothing to compare with")
+            return 0
+        report.error(f"❌ No baseline at {args.baseline} - run with --save-baseline on the reference machine "
+                     f"to create one, or pass --allow-missing-baseline")
+        return 1
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare_with_baseline(results, baseline, args.tolerance)
+    if regressions:
+        report.error(f"\n❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for regression in regressions:
+            report.error(f"   • {regression}")
+        return 1
+    report.info(f"\n✅ No regressions beyond {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
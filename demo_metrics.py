@@ -4,6 +4,8 @@ Demo script for the metrics comparison functionality.
 Shows how to use the new metrics features to compare original vs improved text.
 """
 
+import argparse
+
 # Configuration - Change this to adjust the number of questions processed
 NUM_QUESTIONS = 50  # Change this value to process more or fewer questions
 
@@ -13,6 +15,7 @@ from simple_question_tester import (
     calculate_metrics_for_text,
     print_metrics_comparison
 )
+from profiling import add_profile_argument, run_profiled
 
 def demo_single_question():
     """Demonstrate metrics comparison for a single question."""
@@ -129,33 +132,23 @@ def overall_metrics_summary():
         print(f"   📊 Average Improvement: {stats['avg_improvement']:+.3f}")
         
         # Calculate additional statistics
-        all_improvements = [r['improvement'] for r in stats['results'] if r['matched']]
-        if all_improvements:
-            max_imp = max(all_improvements)
-            min_imp = min(all_improvements)
-            positive_count = sum(1 for imp in all_improvements if imp > 0)
-            std_dev = (sum((imp - stats['avg_improvement']) ** 2 for imp in all_improvements) / len(all_improvements)) ** 0.5
-            
-            print(f"   🏆 Best Improvement: {max_imp:+.3f}")
-            print(f"   📉 Worst Improvement: {min_imp:+.3f}")
-            print(f"   📊 Standard Deviation: {std_dev:.3f}")
-            print(f"   ✅ Positive Improvements: {positive_count}/{len(all_improvements)}")
-            print(f"   📈 Success Rate: {positive_count/len(all_improvements)*100:.1f}%")
+        matched_improvements = stats['improvement_stats'].stage('template')
+        if matched_improvements.count:
+            print(f"   🏆 Best Improvement: {matched_improvements.max:+.3f}")
+            print(f"   📉 Worst Improvement: {matched_improvements.min:+.3f}")
+            print(f"   📊 Standard Deviation: {matched_improvements.std:.3f}")
+            print(f"   ✅ Positive Improvements: {matched_improvements.positive}/{matched_improvements.count}")
+            print(f"   📈 Success Rate: {matched_improvements.positive_rate:.1f}%")
         
         # Show improvements by question type
         print(f"\n📋 IMPROVEMENTS BY QUESTION TYPE:")
         for question_type, improvements in stats['improvements_by_type'].items():
-            if improvements:
-                type_avg = sum(improvements) / len(improvements)
-                type_positive = sum(1 for imp in improvements if imp > 0)
-                type_max = max(improvements)
-                type_min = min(improvements)
-                
+            if improvements.count:
                 print(f"   {question_type}:")
-                print(f"      Count: {len(improvements)}")
-                print(f"      Avg Improvement: {type_avg:+.3f}")
-                print(f"      Range: {type_min:+.3f} to {type_max:+.3f}")
-                print(f"      Positive Rate: {type_positive/len(improvements)*100:.1f}%")
+                print(f"      Count: {improvements.count}")
+                print(f"      Avg Improvement: {improvements.mean:+.3f}")
+                print(f"      Range: {improvements.min:+.3f} to {improvements.max:+.3f}")
+                print(f"      Positive Rate: {improvements.positive_rate:.1f}%")
         
         # Performance assessment
         print(f"\n🎯 PERFORMANCE ASSESSMENT:")
@@ -173,7 +166,7 @@ def overall_metrics_summary():
         else:
             print(f"   🔴 LOW MATCH RATE: {stats['match_rate']:.1f}% of questions matched templates - consider adding more templates")
 
-if __name__ == "__main__":
+def main():
     print("🚀 METRICS COMPARISON DEMO")
     print("=" * 60)
     print(f"📊 Configuration: Processing {NUM_QUESTIONS} questions")
@@ -193,4 +186,10 @@ if __name__ == "__main__":
     print("   • Use process_random_questions_with_metrics() for detailed analysis")
     print("   • Use process_all_questions_with_metrics() for bulk statistics")
     print("   • Use print_metrics_comparison() for custom text comparison")
-    print("   • Use calculate_metrics_for_text() for individual metric calculation") 
\ No newline at end of file
+    print("   • Use calculate_metrics_for_text() for individual metric calculation") 
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Metrics comparison demo")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    run_profiled("demo_metrics", args.profile, main)
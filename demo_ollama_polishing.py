@@ -4,6 +4,8 @@ Demo script for the Ollama polishing functionality.
 Shows how questions with scores below 9.0 are automatically polished with Ollama.
 """
 
+import argparse
+
 # Configuration
 NUM_QUESTIONS = 5  # Change this to test with more or fewer questions
 
@@ -12,6 +14,7 @@ from simple_question_tester import (
     should_polish_with_ollama,
     calculate_metrics_for_text
 )
+from profiling import add_profile_argument, run_profiled
 
 def demo_ollama_polishing():
     """Demonstrate Ollama polishing for low-scoring questions."""
@@ -102,9 +105,9 @@ def demo_ollama_availability():
     print("=" * 60)
     
     try:
-        from local_polisher import check_ollama_available, get_available_models
+        from ollama_client import check_ollama_available, get_available_models
         
-        if check_ollama_available():
+        if check_ollama_available(force=True):
             print("✅ Ollama is available!")
             models = get_available_models()
             if models:
@@ -119,10 +122,10 @@ def demo_ollama_availability():
             print("   2. Start Ollama: ollama serve")
             print("   3. Pull a model: ollama pull llama2")
     except ImportError:
-        print("❌ local_polisher module not available")
-        print("   Make sure local_polisher.py is in the same directory")
+        print("❌ ollama_client module not available")
+        print("   Make sure ollama_client.py is in the same directory")
 
-if __name__ == "__main__":
+def main():
     print("🚀 OLLAMA POLISHING DEMO")
     print("=" * 60)
     
@@ -130,4 +133,10 @@ if __name__ == "__main__":
     demo_ollama_availability()
     
     # Run the main Ollama polishing demo
-    demo_ollama_polishing()
\ No newline at end of file
+    demo_ollama_polishing()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ollama polishing demo")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    run_profiled("demo_ollama_polishing", args.profile, main)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Disk Cache - a small persistent key/value cache backed by SQLite in WAL mode.
+Safe for concurrent readers and writers across threads and processes
+(e.g. several Flask workers and a bulk analyzer sharing one file).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+# SQLite limits the number of bound parameters per statement
+_SQLITE_BATCH_SIZE = 500
+
+# How many writes happen between eviction checks
+_EVICTION_CHECK_INTERVAL = 1000
+
+
+class DiskCache:
+    """
+    Persistent JSON value cache with bulk lookups, TTL and size-based eviction.
+
+    Each thread (and each process after a fork) gets its own SQLite
+    connection; WAL mode lets readers proceed while another process writes.
+    When the table grows past max_entries, the least recently used entries
+    are deleted down to 90% of the limit. Entries older than ttl_seconds are
+    treated as misses and removed on the next eviction pass.
+    """
+
+    def __init__(self, path: str, table: str = "cache", max_entries: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None, timeout: float = 30.0):
+        """
+        Args:
+            path: SQLite database file
+            table: Table name (lets several caches share one file)
+            max_entries: Maximum number of entries before eviction (None = unbounded)
+            ttl_seconds: Maximum age of an entry (None = never expires)
+            timeout: Seconds to wait for a lock held by another process
+        """
+        if not table.isidentifier():
+            raise ValueError(f"Invalid cache table name: {table}")
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._writes_since_check = 0
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection, reopening it after a fork."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_schema(self) -> None:
+        conn = self._connect()
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table}_accessed_at ON {self.table} (accessed_at)"
+        )
+
+    def _count(self, hits: int, misses: int) -> None:
+        with self._stats_lock:
+            self.hits += hits
+            self.misses += misses
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Look up a single key. Returns None on a miss."""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Dict]:
+        """
+        Look up many keys with as few queries as possible.
+
+        Args:
+            keys: Keys to look up
+
+        Returns:
+            Dictionary of the keys that were found and their values
+        """
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, Dict] = {}
+        if not keys:
+            return found
+
+        conn = self._connect()
+        now = time.time()
+        oldest = now - self.ttl_seconds if self.ttl_seconds else 0.0
+        for start in range(0, len(keys), _SQLITE_BATCH_SIZE):
+            batch = keys[start:start + _SQLITE_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT key, value FROM {self.table} WHERE key IN ({placeholders}) AND created_at >= ?",
+                batch + [oldest]
+            ).fetchall()
+            for key, value in rows:
+                found[key] = json.loads(value)
+
+        if found:
+            try:
+                conn.executemany(
+                    f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+            except sqlite3.OperationalError:
+                # Recency is best effort; a busy database must not fail a read
+                pass
+
+        self._count(len(found), len(keys) - len(found))
+        return found
+
+    def set(self, key: str, value: Dict) -> None:
+        """Store a single value."""
+        self.set_many({key: value})
+
+    def set_many(self, items: Dict[str, Dict]) -> None:
+        """Store many values in one transaction."""
+        if not items:
+            return
+        now = time.time()
+        rows = [(key, json.dumps(value), now, now) for key, value in items.items()]
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                rows
+            )
+
+        with self._stats_lock:
+            self.writes += len(rows)
+            self._writes_since_check += len(rows)
+            check = self._writes_since_check >= _EVICTION_CHECK_INTERVAL
+            if check:
+                self._writes_since_check = 0
+        if check:
+            self.evict()
+
+    def delete(self, key: str) -> None:
+        """Remove a key if present."""
+        self._connect().execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def evict(self) -> int:
+        """
+        Delete expired entries, then enforce max_entries by deleting the least recently used ones.
+
+        Returns:
+            Number of entries removed
+        """
+        conn = self._connect()
+        removed = 0
+        if self.ttl_seconds:
+            removed += conn.execute(
+                f"DELETE FROM {self.table} WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+        if not self.max_entries:
+            return removed
+        size = self.size()
+        if size <= self.max_entries:
+            return removed
+        remove = size - int(self.max_entries * 0.9)
+        conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN ("
+            f"SELECT key FROM {self.table} ORDER BY accessed_at ASC LIMIT ?)",
+            (remove,)
+        )
+        return removed + remove
+
+    def size(self) -> int:
+        """Number of stored entries."""
+        return self._connect().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        self._connect().execute(f"DELETE FROM {self.table}")
+
+    def stats(self) -> Dict:
+        """Hit/miss/write counters for this process plus the current size."""
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                'path': self.path,
+                'table': self.table,
+                'hits': self.hits,
+                'misses': self.misses,
+                'writes': self.writes,
+                'hit_rate': self.hits / lookups * 100 if lookups else 0.0,
+                'entries': self.size(),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds
+            }
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Instrumentation - per-stage timers and latency histograms for the pipeline.
+Every pipeline stage (preprocessing, regex matching, template transform, each
+metrics3 scorer, Ollama calls...) records its wall time into a per-stage and
+per-question-type latency histogram plus counters. With instrumentation
+disabled, stage_timer() returns a shared no-op context manager, so the cost
+is one flag check per stage.
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from streaming_stats import LogHistogram, RunningStats
+
+# Configuration (override with environment variables)
+INSTRUMENTATION_ENABLED = os.environ.get("INSTRUMENTATION_ENABLED", "1").lower() not in ("0", "false", "no")
+
+# Latencies are recorded in milliseconds, in log-scaled buckets: +/-2.5% relative
+# error from 1µs to 10 minutes with at most ~420 buckets per stage
+LATENCY_RANGE_MS = (0.001, 600000.0)
+LATENCY_BUCKET_GROWTH = 1.05
+LATENCY_QUANTILES = (0.5, 0.9, 0.99)
+
+
+class _NoopTimer:
+    """Stand-in timer used while instrumentation is disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+class _StageTimer:
+    __slots__ = ("instrumentation", "stage", "question_type", "start")
+
+    def __init__(self, instrumentation: "Instrumentation", stage: str, question_type: Optional[str]):
+        self.instrumentation = instrumentation
+        self.stage = stage
+        self.question_type = question_type
+
+    def __enter__(self):
+        if self.instrumentation.track_active:
+            self.instrumentation.active_stages.setdefault(threading.get_ident(), []).append(self.stage)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.instrumentation.record(self.stage, time.perf_counter() - self.start, self.question_type,
+                                    error=exc_type is not None)
+        if self.instrumentation.track_active:
+            stages = self.instrumentation.active_stages.get(threading.get_ident())
+            if stages:
+                stages.pop()
+        return False
+
+
+class StageLatency:
+    """Latency accumulator and histogram (milliseconds) for one stage, optionally per type."""
+
+    __slots__ = ("stats", "histogram", "errors")
+
+    def __init__(self):
+        self.stats = RunningStats()
+        self.histogram = LogHistogram(LATENCY_RANGE_MS[0], LATENCY_RANGE_MS[1], LATENCY_BUCKET_GROWTH)
+        self.errors = 0
+
+    def add(self, milliseconds: float, error: bool = False) -> None:
+        self.stats.add(milliseconds)
+        self.histogram.add(milliseconds)
+        if error:
+            self.errors += 1
+
+    def to_dict(self) -> Dict:
+        quantiles = self.histogram.quantiles(LATENCY_QUANTILES)
+        return {
+            'count': self.stats.count,
+            'errors': self.errors,
+            'total_ms': self.stats.mean * self.stats.count,
+            'mean_ms': self.stats.mean,
+            'max_ms': self.stats.max if self.stats.count else None,
+            **{f"{label}_ms": value for label, value in quantiles.items()}
+        }
+
+
+class Instrumentation:
+    """Thread-safe registry of stage latencies and counters."""
+
+    def __init__(self, enabled: bool = INSTRUMENTATION_ENABLED):
+        self.enabled = enabled
+        self.started_at = time.time()
+        self._stages: Dict[Tuple[str, Optional[str]], StageLatency] = {}
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Stages each thread is currently inside (outermost first), kept only while a profiler asks for it
+        self.track_active = False
+        self.active_stages: Dict[int, List[str]] = {}
+        # Called with (stage, seconds, question_type, error) for every timed run, even while disabled
+        self.listeners: List[Callable[[str, float, Optional[str], bool], None]] = []
+
+    def timer(self, stage: str, question_type: Optional[str] = None):
+        """Context manager timing one run of a stage (no-op while disabled and nothing listens)."""
+        if not self.enabled and not self.listeners:
+            return _NOOP_TIMER
+        return _StageTimer(self, stage, question_type)
+
+    def record(self, stage: str, seconds: float, question_type: Optional[str] = None, error: bool = False) -> None:
+        """
+        Record one run of a stage.
+
+        Args:
+            stage: Stage name (e.g. 'match', 'metrics.clarity', 'ollama')
+            seconds: Wall time of the run
+            question_type: Question type for the per-type breakdown (optional)
+            error: Whether the run raised
+        """
+        for listener in self.listeners:
+            listener(stage, seconds, question_type, error)
+        if not self.enabled:
+            return
+        milliseconds = seconds * 1000
+        with self._lock:
+            keys = ((stage, None),) if question_type is None else ((stage, None), (stage, question_type))
+            for key in keys:
+                latency = self._stages.get(key)
+                if latency is None:
+                    latency = self._stages[key] = StageLatency()
+                latency.add(milliseconds, error)
+
+    def add_listener(self, listener: Callable[[str, float, Optional[str], bool], None]) -> None:
+        """Also send every stage timing to listener (e.g. an exporter with its own histograms)."""
+        with self._lock:
+            if listener not in self.listeners:
+                # Replaced rather than appended so record() can iterate without the lock
+                self.listeners = self.listeners + [listener]
+
+    def active_stage_path(self, thread_id: int) -> Tuple[str, ...]:
+        """Stages a thread is currently inside, outermost first (empty unless track_active is set)."""
+        return tuple(self.active_stages.get(thread_id, ()))
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        """Add to a named counter (e.g. cache hits)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + amount
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+            self.started_at = time.time()
+
+    def snapshot(self) -> Dict:
+        """Per-stage and per-type latency summaries plus counters."""
+        with self._lock:
+            stages = {}
+            by_type: Dict[str, Dict] = {}
+            for (stage, question_type), latency in sorted(self._stages.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+                if question_type is None:
+                    stages[stage] = latency.to_dict()
+                else:
+                    by_type.setdefault(str(question_type), {})[stage] = latency.to_dict()
+            return {
+                'enabled': self.enabled,
+                'started_at': self.started_at,
+                'elapsed': time.time() - self.started_at,
+                'stages': stages,
+                'by_type': by_type,
+                'counters': dict(self._counters)
+            }
+
+
+_instrumentation = Instrumentation()
+
+
+def get_instrumentation() -> Instrumentation:
+    """Get the process-wide instrumentation registry."""
+    return _instrumentation
+
+
+def stage_timer(stage: str, question_type: Optional[str] = None):
+    """Time a pipeline stage: `with stage_timer('match', question_type): ...`."""
+    if not _instrumentation.enabled and not _instrumentation.listeners:
+        return _NOOP_TIMER
+    return _StageTimer(_instrumentation, stage, question_type)
+
+
+def increment_counter(counter: str, amount: int = 1) -> None:
+    _instrumentation.increment(counter, amount)
+
+
+def set_instrumentation_enabled(enabled: bool) -> None:
+    _instrumentation.enabled = enabled
+
+
+def get_instrumentation_snapshot() -> Dict:
+    """Snapshot of the process-wide registry (see Instrumentation.snapshot)."""
+    return _instrumentation.snapshot()
+
+
+def print_instrumentation_summary(snapshot: Optional[Dict] = None, by_type: bool = False) -> None:
+    """
+    Print stage latencies, slowest total first.
+
+    Args:
+        snapshot: Snapshot to print (default: the process-wide registry)
+        by_type: Also print the per-question-type breakdown
+    """
+    # Imported here to keep this module free of output dependencies for the hot path
+    from reporter import get_reporter
+    report = get_reporter()
+    snapshot = snapshot or get_instrumentation_snapshot()
+    if not snapshot['enabled'] or not snapshot['stages']:
+        return
+
+    def print_stages(stages: Dict, indent: str) -> None:
+        for stage, latency in sorted(stages.items(), key=lambda item: -item[1]['total_ms']):
+            report.info(f"{indent}{stage:<28} n={latency['count']:<7} total={latency['total_ms'] / 1000:8.2f}s"
+                        f"  mean={latency['mean_ms']:9.3f}ms  p50={latency['p50_ms']:9.3f}ms"
+                        f"  p90={latency['p90_ms']:9.3f}ms  p99={latency['p99_ms']:9.3f}ms"
+                        + (f"  errors={latency['errors']}" if latency['errors'] else ""))
+
+    report.info(f"\n⏱️  STAGE TIMINGS")
+    print_stages(snapshot['stages'], "   ")
+    if snapshot['counters']:
+        report.info("   Counters: " + ", ".join(f"{name}={value:,}" for name, value in sorted(snapshot['counters'].items())))
+    if by_type:
+        for question_type, stages in snapshot['by_type'].items():
+            report.info(f"   {question_type}:")
+            print_stages(stages, "      ")
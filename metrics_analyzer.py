@@ -7,26 +7,121 @@ Shows original, template, and Ollama improvements with detailed statistics.
 # Configuration
 NUM_QUESTIONS = 10000  # Change this to analyze more or fewer questions
 
+import argparse
+import glob
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 from simple_question_tester import (
     process_random_questions_with_ollama_polishing,
-    calculate_metrics_for_text,
     process_all_questions_with_metrics
 )
+from streaming_stats import RunningStats, Histogram, ImprovementStats
+from question_preprocessor import get_preprocessing_stats
+from polish_cache import get_polish_cache_stats
+from ollama_health import get_ollama_health
+from async_polisher import POLISH_CONCURRENCY
+from reporter import get_reporter, configure_reporter, DETAIL, QUIET
+from instrumentation import print_instrumentation_summary
+from profiling import add_profile_argument, run_profiled
 import pandas as pd
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
+
+SHARD_OUTPUT_DIR = os.environ.get("SHARD_OUTPUT_DIR", "shards")  # Where shard result and summary files go
+
+def print_improvement_stats(title: str, stats: RunningStats, histogram: Optional[Histogram] = None):
+    """Print average/best/worst/positive summary for a streaming accumulator."""
+    report = get_reporter()
+    if not stats.count:
+        return
+    report.info(f"\n{title}:")
+    report.info(f"   📊 Average improvement: {stats.mean:+.3f}")
+    report.info(f"   📈 Best improvement: {stats.max:+.3f}")
+    report.info(f"   📉 Worst improvement: {stats.min:+.3f}")
+    report.info(f"   📏 Standard deviation: {stats.std:.3f}")
+    if histogram is not None and histogram.count:
+        quantiles = histogram.quantiles()
+        report.info(f"   🎚️  Percentiles: p50 {quantiles['p50']:+.3f}, p90 {quantiles['p90']:+.3f}, p99 {quantiles['p99']:+.3f}")
+    report.info(f"   ✅ Positive improvements: {stats.positive}/{stats.count}")
+
+def print_quantiles_by_type(summary: ImprovementStats, stage: str = 'final'):
+    """Print per-type improvement and enhanced-score percentiles for a stage."""
+    report = get_reporter()
+    if not summary.by_type:
+        return
+    report.info(f"\n🎚️  PERCENTILES BY QUESTION TYPE ({stage}):")
+    for q_type in summary.by_type:
+        improvement = summary.histogram(stage, q_type)
+        score = summary.score_histogram(stage, q_type)
+        if not improvement.count:
+            continue
+        imp_q = improvement.quantiles()
+        report.info(f"   {q_type}:")
+        report.info(f"      Improvement p50/p90/p99: {imp_q['p50']:+.3f} / {imp_q['p90']:+.3f} / {imp_q['p99']:+.3f}")
+        if score.count:
+            score_q = score.quantiles()
+            report.info(f"      Enhanced score p50/p90/p99: {score_q['p50']:.3f} / {score_q['p90']:.3f} / {score_q['p99']:.3f}")
+
+def print_question_analysis(result: Dict, index: int, total: int, final_enhanced: float):
+    """Print the per-question block of analyze_question_metrics (DETAIL verbosity)."""
+    report = get_reporter()
+    report.detail(f"\n🔍 QUESTION {index}/{total}")
+    report.detail("-" * 50)
+    
+    # Question info
+    report.detail(f"📝 ORIGINAL: {result['combined_text']}")
+    report.detail(f"   Type: {result['type']}")
+    
+    # Template analysis
+    if result['template_matched']:
+        report.detail(f"✨ TEMPLATE: {result['template_improved_text']}")
+    else:
+        report.detail(f"❌ TEMPLATE: No match found")
+    report.detail(f"   Enhanced Score: {result['template_enhanced_score']:.3f}")
+    
+    # Ollama analysis
+    if result['ollama_used']:
+        report.detail(f"🤖 OLLAMA: {result['ollama_improved_text']}")
+        report.detail(f"   Enhanced Score: {final_enhanced:.3f}")
+    else:
+        report.detail(f"✅ OLLAMA: Not needed (score above 9.0)")
+    
+    # Show individual metrics
+    report.detail(f"📊 METRICS:")
+    original_metrics = result['original_metrics']
+    report.detail(f"   Original - Clarity: {original_metrics['clarity']:.3f}, Conciseness: {original_metrics['conciseness']:.3f}, Technical: {original_metrics['technical_accuracy']:.3f}, Actionability: {original_metrics['actionability']:.3f}")
+    
+    if result['template_matched']:
+        template_metrics = result['template_metrics']
+        report.detail(f"   Template - Clarity: {template_metrics['clarity']:.3f}, Conciseness: {template_metrics['conciseness']:.3f}, Technical: {template_metrics['technical_accuracy']:.3f}, Actionability: {template_metrics['actionability']:.3f}")
+    
+    if result['ollama_used']:
+        final_metrics = result['final_metrics']
+        report.detail(f"   Final   - Clarity: {final_metrics['clarity']:.3f}, Conciseness: {final_metrics['conciseness']:.3f}, Technical: {final_metrics['technical_accuracy']:.3f}, Actionability: {final_metrics['actionability']:.3f}")
 
-def analyze_question_metrics(num_questions: int = 5):
-    """Analyze metrics for a specified number of questions."""
-    print("📊 METRICS ANALYZER")
-    print("=" * 60)
-    print(f"🔍 Analyzing {num_questions} questions for comprehensive metrics")
-    print()
+def analyze_question_metrics(num_questions: int = 5, concurrency: int = POLISH_CONCURRENCY, batch_size: int = 1):
+    """
+    Analyze metrics for a specified number of questions.
+    
+    Args:
+        num_questions: Number of questions to analyze (default: 5)
+        concurrency: Number of Ollama polish requests in flight at once (default: POLISH_CONCURRENCY)
+        batch_size: Short questions packed into one Ollama prompt (default: 1 = no batching)
+    """
+    report = get_reporter()
+    report.info("📊 METRICS ANALYZER")
+    report.info("=" * 60)
+    report.info(f"🔍 Analyzing {num_questions} questions for comprehensive metrics")
+    report.info()
     
     # Process questions with full pipeline
-    results = process_random_questions_with_ollama_polishing(num_questions)
+    results = process_random_questions_with_ollama_polishing(num_questions, concurrency=concurrency,
+                                                             batch_size=batch_size)
     
     if not results:
-        print("❌ No questions to analyze")
+        report.error("❌ No questions to analyze")
         return
     
     # Track statistics
@@ -35,135 +130,155 @@ def analyze_question_metrics(num_questions: int = 5):
         'template_matched': 0,
         'ollama_used': 0,
         'has_error_traceback': 0,
-        'template_improvements': [],
-        'ollama_improvements': [],
-        'final_improvements': [],
+        'polish_deferred': 0,
+        'improvements': ImprovementStats(),
         'question_types': {}
     }
+    improvements = stats['improvements']
     
-    print("📋 QUESTION ANALYSIS")
-    print("=" * 60)
+    show = report.enabled(DETAIL)
+    report.detail("📋 QUESTION ANALYSIS")
+    report.detail("=" * 60)
     
     for i, result in enumerate(results, 1):
-        print(f"\n🔍 QUESTION {i}/{len(results)}")
-        print("-" * 50)
-        
-        # Question info
-        print(f"📝 ORIGINAL: {result['combined_text']}")
-        print(f"   Type: {result['type']}")
+        q_type = result['type']
+        final_metrics = result['final_metrics']
+        final_enhanced = sum([
+            final_metrics['clarity'],
+            final_metrics['conciseness'],
+            final_metrics['technical_accuracy'],
+            final_metrics['actionability']
+        ]) / 4
         
         # Track question type
-        q_type = result['type']
         stats['question_types'][q_type] = stats['question_types'].get(q_type, 0) + 1
+        improvements.count_question(q_type)
         
         # Check for error traceback
         if result.get('error_traceback') and str(result['error_traceback']).strip() != '':
             stats['has_error_traceback'] += 1
         
-        # Template analysis
+        if result.get('polish_deferred'):
+            stats['polish_deferred'] += 1
+        
+        # Template and Ollama statistics
         if result['template_matched']:
             stats['template_matched'] += 1
-            stats['template_improvements'].append(result['template_improvement'])
-            print(f"✨ TEMPLATE: {result['template_improved_text']}")
-            print(f"   Enhanced Score: {result['template_enhanced_score']:.3f}")
-        else:
-            print(f"❌ TEMPLATE: No match found")
-            print(f"   Enhanced Score: {result['template_enhanced_score']:.3f}")
-        
-        # Ollama analysis
+            improvements.add('template', result['template_improvement'], q_type)
+            improvements.add_score('template', result['template_enhanced_score'], q_type)
         if result['ollama_used']:
             stats['ollama_used'] += 1
-            stats['ollama_improvements'].append(result['final_improvement'])
-            print(f"🤖 OLLAMA: {result['ollama_improved_text']}")
-            
-            # Calculate final enhanced score
-            final_metrics = result['final_metrics']
-            final_enhanced = sum([
-                final_metrics['clarity'],
-                final_metrics['conciseness'],
-                final_metrics['technical_accuracy'],
-                final_metrics['actionability']
-            ]) / 4
-            print(f"   Enhanced Score: {final_enhanced:.3f}")
-        else:
-            print(f"✅ OLLAMA: Not needed (score above 9.0)")
+            improvements.add('ollama', result['final_improvement'], q_type)
+            improvements.add_score('ollama', final_enhanced, q_type)
         
-        # Track final improvement
-        stats['final_improvements'].append(result['final_improvement'])
+        # Track final improvement and enhanced score distribution
+        improvements.add('final', result['final_improvement'], q_type)
+        improvements.add_score('final', final_enhanced, q_type)
         
-        # Show individual metrics
-        print(f"📊 METRICS:")
-        original_metrics = result['original_metrics']
-        print(f"   Original - Clarity: {original_metrics['clarity']:.3f}, Conciseness: {original_metrics['conciseness']:.3f}, Technical: {original_metrics['technical_accuracy']:.3f}, Actionability: {original_metrics['actionability']:.3f}")
-        
-        if result['template_matched']:
-            template_metrics = result['template_metrics']
-            print(f"   Template - Clarity: {template_metrics['clarity']:.3f}, Conciseness: {template_metrics['conciseness']:.3f}, Technical: {template_metrics['technical_accuracy']:.3f}, Actionability: {template_metrics['actionability']:.3f}")
-        
-        if result['ollama_used']:
-            final_metrics = result['final_metrics']
-            print(f"   Final   - Clarity: {final_metrics['clarity']:.3f}, Conciseness: {final_metrics['conciseness']:.3f}, Technical: {final_metrics['technical_accuracy']:.3f}, Actionability: {final_metrics['actionability']:.3f}")
+        if show:
+            print_question_analysis(result, i, len(results), final_enhanced)
     
     # Print comprehensive summary
-    print("\n" + "="*60)
-    print("📊 COMPREHENSIVE METRICS SUMMARY")
-    print("="*60)
+    report.info("\n" + "="*60)
+    report.info("📊 COMPREHENSIVE METRICS SUMMARY")
+    report.info("="*60)
+    
+    report.info(f"📈 OVERALL STATISTICS:")
+    report.info(f"   📊 Total questions analyzed: {stats['total_questions']}")
+    report.info(f"   ✅ Template matches: {stats['template_matched']}/{stats['total_questions']} ({stats['template_matched']/stats['total_questions']*100:.1f}%)")
+    report.info(f"   🤖 Ollama polishing used: {stats['ollama_used']}/{stats['total_questions']} ({stats['ollama_used']/stats['total_questions']*100:.1f}%)")
+    if stats['polish_deferred']:
+        report.info(f"   ⏱️  Polishing deferred by budget: {stats['polish_deferred']}/{stats['total_questions']}")
+    report.info(f"   🐛 Questions with error traceback: {stats['has_error_traceback']}/{stats['total_questions']} ({stats['has_error_traceback']/stats['total_questions']*100:.1f}%)")
+    
+    # Input removed by the length-aware preprocessing stage
+    preprocessing = get_preprocessing_stats()
+    stats['preprocessing'] = preprocessing
+    if not preprocessing['known_boilerplate_blocks']:
+        report.info(f"   ⚠️  No boilerplate learned from {preprocessing['boilerplate_corpus'] or 'any corpus'}"
+                    f" - preprocessing only caps lengths (set PREPROCESS_BOILERPLATE_CORPUS)")
+    if preprocessing['rows_changed']:
+        report.info(f"   ✂️  Preprocessing shortened {preprocessing['rows_changed']} inputs, removing {preprocessing['removed_chars']:,} text and {preprocessing['traceback_removed_chars']:,} traceback characters ({preprocessing['removed_rate']:.1f}% of input)")
+    
+    # Ollama calls avoided by the persistent polish cache
+    polish_cache = get_polish_cache_stats()
+    stats['polish_cache'] = polish_cache
+    if polish_cache['disk'] and polish_cache['disk']['hits'] + polish_cache['disk']['misses']:
+        disk = polish_cache['disk']
+        report.info(f"   ♻️  Polish cache: {disk['hits']} hits, {disk['misses']} misses ({disk['hit_rate']:.1f}% hit rate, {disk['entries']} entries)")
     
-    print(f"📈 OVERALL STATISTICS:")
-    print(f"   📊 Total questions analyzed: {stats['total_questions']}")
-    print(f"   ✅ Template matches: {stats['template_matched']}/{stats['total_questions']} ({stats['template_matched']/stats['total_questions']*100:.1f}%)")
-    print(f"   🤖 Ollama polishing used: {stats['ollama_used']}/{stats['total_questions']} ({stats['ollama_used']/stats['total_questions']*100:.1f}%)")
-    print(f"   🐛 Questions with error traceback: {stats['has_error_traceback']}/{stats['total_questions']} ({stats['has_error_traceback']/stats['total_questions']*100:.1f}%)")
+    # Polishes skipped because the Ollama circuit breaker was open
+    ollama_health = get_ollama_health()
+    stats['ollama_health'] = ollama_health
+    if ollama_health['skipped'] or ollama_health['times_opened']:
+        report.info(f"   ⏭️  Ollama circuit {ollama_health['state']}: opened {ollama_health['times_opened']} times, skipped {ollama_health['skipped']} polishes (last error: {ollama_health['last_error']})")
     
     # Improvement statistics
-    if stats['template_improvements']:
-        avg_template_improvement = sum(stats['template_improvements']) / len(stats['template_improvements'])
-        max_template_improvement = max(stats['template_improvements'])
-        min_template_improvement = min(stats['template_improvements'])
-        print(f"\n📈 TEMPLATE IMPROVEMENTS:")
-        print(f"   📊 Average improvement: {avg_template_improvement:+.3f}")
-        print(f"   📈 Best improvement: {max_template_improvement:+.3f}")
-        print(f"   📉 Worst improvement: {min_template_improvement:+.3f}")
-        print(f"   ✅ Positive improvements: {sum(1 for imp in stats['template_improvements'] if imp > 0)}/{len(stats['template_improvements'])}")
-    
-    if stats['ollama_improvements']:
-        avg_ollama_improvement = sum(stats['ollama_improvements']) / len(stats['ollama_improvements'])
-        max_ollama_improvement = max(stats['ollama_improvements'])
-        min_ollama_improvement = min(stats['ollama_improvements'])
-        print(f"\n🤖 OLLAMA IMPROVEMENTS:")
-        print(f"   📊 Average improvement: {avg_ollama_improvement:+.3f}")
-        print(f"   📈 Best improvement: {max_ollama_improvement:+.3f}")
-        print(f"   📉 Worst improvement: {min_ollama_improvement:+.3f}")
-        print(f"   ✅ Positive improvements: {sum(1 for imp in stats['ollama_improvements'] if imp > 0)}/{len(stats['ollama_improvements'])}")
-    
-    # Overall final improvements
-    if stats['final_improvements']:
-        avg_final_improvement = sum(stats['final_improvements']) / len(stats['final_improvements'])
-        max_final_improvement = max(stats['final_improvements'])
-        min_final_improvement = min(stats['final_improvements'])
-        print(f"\n🎯 FINAL IMPROVEMENTS:")
-        print(f"   📊 Average improvement: {avg_final_improvement:+.3f}")
-        print(f"   📈 Best improvement: {max_final_improvement:+.3f}")
-        print(f"   📉 Worst improvement: {min_final_improvement:+.3f}")
-        print(f"   ✅ Positive improvements: {sum(1 for imp in stats['final_improvements'] if imp > 0)}/{len(stats['final_improvements'])}")
+    print_improvement_stats("📈 TEMPLATE IMPROVEMENTS", improvements.stage('template'), improvements.histogram('template'))
+    print_improvement_stats("🤖 OLLAMA IMPROVEMENTS", improvements.stage('ollama'), improvements.histogram('ollama'))
+    print_improvement_stats("🎯 FINAL IMPROVEMENTS", improvements.stage('final'), improvements.histogram('final'))
+    print_quantiles_by_type(improvements, 'final')
     
     # Question type distribution
-    print(f"\n📋 QUESTION TYPE DISTRIBUTION:")
+    report.info(f"\n📋 QUESTION TYPE DISTRIBUTION:")
     for q_type, count in stats['question_types'].items():
-        print(f"   {q_type}: {count} ({count/stats['total_questions']*100:.1f}%)")
+        report.info(f"   {q_type}: {count} ({count/stats['total_questions']*100:.1f}%)")
     
     # Success rates
-    print(f"\n🎯 SUCCESS RATES:")
+    report.info(f"\n🎯 SUCCESS RATES:")
     template_success_rate = stats['template_matched'] / stats['total_questions'] * 100
     ollama_success_rate = stats['ollama_used'] / stats['total_questions'] * 100
-    positive_improvement_rate = sum(1 for imp in stats['final_improvements'] if imp > 0) / len(stats['final_improvements']) * 100
+    positive_improvement_rate = improvements.stage('final').positive_rate
     
-    print(f"   ✅ Template matching success: {template_success_rate:.1f}%")
-    print(f"   🤖 Ollama polishing success: {ollama_success_rate:.1f}%")
-    print(f"   📈 Positive improvement rate: {positive_improvement_rate:.1f}%")
+    report.info(f"   ✅ Template matching success: {template_success_rate:.1f}%")
+    report.info(f"   🤖 Ollama polishing success: {ollama_success_rate:.1f}%")
+    report.info(f"   📈 Positive improvement rate: {positive_improvement_rate:.1f}%")
     
+    report.event('summary', total_questions=stats['total_questions'], template_matched=stats['template_matched'],
+                 ollama_used=stats['ollama_used'], polish_deferred=stats['polish_deferred'],
+                 has_error_traceback=stats['has_error_traceback'], question_types=stats['question_types'],
+                 improvements=improvements.to_dict(include_histograms=False))
     return stats
 
+def print_all_questions_summary(stats: Dict):
+    """Print the all-questions report for process_all_questions_with_metrics (or merged shard) statistics."""
+    report = get_reporter()
+    report.info("\n" + "="*60)
+    report.info("📊 COMPREHENSIVE ALL-QUESTIONS SUMMARY")
+    report.info("="*60)
+    
+    report.info(f"📈 OVERALL STATISTICS:")
+    report.info(f"   📊 Total questions processed: {stats['total_processed']:,}")
+    report.info(f"   ✅ Template matches: {stats['matched_count']:,}/{stats['total_processed']:,} ({stats['match_rate']:.1f}%)")
+    
+    if stats.get('avg_improvement'):
+        report.info(f"   📈 Average improvement: {stats['avg_improvement']:+.3f}")
+    
+    # Show improvements by question type
+    if stats.get('improvements_by_type'):
+        report.info(f"\n📋 IMPROVEMENTS BY QUESTION TYPE:")
+        for question_type, improvements in stats['improvements_by_type'].items():
+            if improvements.count:
+                report.info(f"   {question_type}:")
+                report.info(f"      Count: {improvements.count}")
+                report.info(f"      Avg improvement: {improvements.mean:+.3f}")
+                report.info(f"      Positive rate: {improvements.positive_rate:.1f}%")
+    
+    if stats.get('improvement_stats'):
+        print_quantiles_by_type(stats['improvement_stats'], 'final')
+    
+    report.event('summary', total_processed=stats['total_processed'], matched_count=stats['matched_count'],
+                 match_rate=stats['match_rate'], avg_improvement=stats.get('avg_improvement', 0),
+                 improvements=(stats['improvement_stats'].to_dict(include_histograms=False)
+                               if stats.get('improvement_stats') else None))
+    
+    report.info(f"\n🎉 Analysis completed successfully!")
+    report.info(f"   📊 Processed {stats['total_processed']:,} questions")
+    report.info(f"   ✅ Template match rate: {stats['match_rate']:.1f}%")
+    
+    if stats.get('avg_improvement'):
+        report.info(f"   📈 Average improvement: {stats['avg_improvement']:+.3f}")
+
 def analyze_all_questions(csv_file: str = "questions.csv", sample_size: Optional[int] = None):
     """
     Analyze all questions from the CSV file with comprehensive metrics.
@@ -172,101 +287,332 @@ def analyze_all_questions(csv_file: str = "questions.csv", sample_size: Optional
         csv_file: Path to the CSV file (default: "questions.csv")
         sample_size: Number of questions to sample (None = all questions)
     """
-    print("🌍 COMPREHENSIVE ALL-QUESTIONS ANALYSIS")
-    print("=" * 60)
+    report = get_reporter()
+    report.info("🌍 COMPREHENSIVE ALL-QUESTIONS ANALYSIS")
+    report.info("=" * 60)
     
     if sample_size is None:
-        print("🔍 Analyzing ALL questions from the dataset")
+        report.info("🔍 Analyzing ALL questions from the dataset")
     else:
-        print(f"🔍 Analyzing {sample_size} questions from the dataset")
-    print()
+        report.info(f"🔍 Analyzing {sample_size} questions from the dataset")
+    report.info()
     
     try:
         # Read CSV to get total count
         df = pd.read_csv(csv_file)
         total_questions = len(df)
-        print(f"📊 Total questions in dataset: {total_questions:,}")
+        report.info(f"📊 Total questions in dataset: {total_questions:,}")
         
         # Handle sample size
         if sample_size is None:
             sample_size = total_questions
         elif sample_size > total_questions:
             sample_size = total_questions
-            print(f"⚠️  Sample size adjusted to {sample_size} (total available)")
+            report.info(f"⚠️  Sample size adjusted to {sample_size} (total available)")
         
-        print(f"📋 Processing {sample_size:,} questions...")
-        print("   (This may take a while for large datasets)")
-        print()
+        report.info(f"📋 Processing {sample_size:,} questions...")
+        report.info("   (This may take a while for large datasets)")
+        report.info()
         
         # Use the existing comprehensive analysis function
         stats = process_all_questions_with_metrics(csv_file, sample_size)
         
         if stats:
-            print("\n" + "="*60)
-            print("📊 COMPREHENSIVE ALL-QUESTIONS SUMMARY")
-            print("="*60)
-            
-            print(f"📈 OVERALL STATISTICS:")
-            print(f"   📊 Total questions processed: {stats['total_processed']:,}")
-            print(f"   ✅ Template matches: {stats['matched_count']:,}/{stats['total_processed']:,} ({stats['match_rate']:.1f}%)")
-            
-            if stats.get('avg_improvement'):
-                print(f"   📈 Average improvement: {stats['avg_improvement']:+.3f}")
-            
-            # Show improvements by question type
-            if stats.get('improvements_by_type'):
-                print(f"\n📋 IMPROVEMENTS BY QUESTION TYPE:")
-                for question_type, improvements in stats['improvements_by_type'].items():
-                    if improvements:
-                        type_avg = sum(improvements) / len(improvements)
-                        type_positive = sum(1 for imp in improvements if imp > 0)
-                        print(f"   {question_type}:")
-                        print(f"      Count: {len(improvements)}")
-                        print(f"      Avg improvement: {type_avg:+.3f}")
-                        print(f"      Positive rate: {type_positive/len(improvements)*100:.1f}%")
-            
-            print(f"\n🎉 Analysis completed successfully!")
-            print(f"   📊 Processed {stats['total_processed']:,} questions")
-            print(f"   ✅ Template match rate: {stats['match_rate']:.1f}%")
-            
-            if stats.get('avg_improvement'):
-                print(f"   📈 Average improvement: {stats['avg_improvement']:+.3f}")
+            print_all_questions_summary(stats)
         
         return stats
         
     except FileNotFoundError:
-        print(f"❌ Error: {csv_file} file not found")
+        report.error(f"❌ Error: {csv_file} file not found")
         return None
     except Exception as e:
-        print(f"❌ Error processing CSV: {e}")
+        report.error(f"❌ Error processing CSV: {e}")
         return None
 
 def quick_metrics_test():
     """Run a quick test with a small number of questions."""
-    print("🚀 QUICK METRICS TEST")
-    print("=" * 60)
+    report = get_reporter()
+    report.info("🚀 QUICK METRICS TEST")
+    report.info("=" * 60)
     
     # Test with 3 questions
     stats = analyze_question_metrics(3)
     
     if stats:
-        print(f"\n✅ Quick test completed successfully!")
-        print(f"   Processed {stats['total_questions']} questions")
-        print(f"   Template matches: {stats['template_matched']}")
-        print(f"   Ollama usage: {stats['ollama_used']}")
+        report.info(f"\n✅ Quick test completed successfully!")
+        report.info(f"   Processed {stats['total_questions']} questions")
+        report.info(f"   Template matches: {stats['template_matched']}")
+        report.info(f"   Ollama usage: {stats['ollama_used']}")
 
-if __name__ == "__main__":
-    print("🚀 METRICS ANALYZER")
-    print("=" * 60)
+def all_questions_stats(matched_count: int, summary: ImprovementStats, results: Optional[List[Dict]] = None) -> Dict:
+    """Build the process_all_questions_with_metrics result dictionary from a (merged) summary."""
+    total_processed = summary.total_questions
+    matched_improvements = summary.stage('template')
+    return {
+        'total_processed': total_processed,
+        'matched_count': matched_count,
+        'match_rate': matched_count/total_processed*100 if total_processed else 0,
+        'avg_improvement': matched_improvements.mean if matched_improvements.count else 0,
+        'improvements_by_type': {
+            question_type: type_stages['final']
+            for question_type, type_stages in summary.by_type.items()
+            if 'final' in type_stages
+        },
+        'improvement_stats': summary,
+        'results': results or []
+    }
 
-    # analyze_all_questions()
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Parse an 'i/N' shard argument."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Shard must look like i/N, got {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"Shard index must be in [0, {count}), got {value!r}")
+    return index, count
 
-    analyze_question_metrics(NUM_QUESTIONS)
+def shard_coverage(shards) -> Optional[float]:
+    """
+    Share of the corpus covered by a set of (index, count) shards.
+    
+    Shards with different counts may be mixed (see run_sharded): a question
+    whose hash is h belongs to shard (i, N) when h % N == i, so coverage is
+    checked over the residues modulo the least common multiple of the counts.
+    
+    Returns:
+        Covered share in [0, 1], or None if there are too many residues to check
+    """
+    period = 1
+    for _, count in shards:
+        period = period * count // math.gcd(period, count)
+    if period > 1_000_000:
+        return None
+    covered = sum(1 for residue in range(period) if any(residue % count == index for index, count in shards))
+    return covered / period
 
-    print(f"\n🎉 Analysis completed!")
-    print(f"\n💡 USAGE TIPS:")
-    print(f"   • Change NUM_QUESTIONS at the top to analyze more questions")
-    print(f"   • Run 'python metrics_analyzer.py all' to analyze all questions")
-    print(f"   • Questions are automatically processed through template matching and Ollama polishing")
-    print(f"   • Metrics show clarity, conciseness, technical accuracy, and actionability")
-    print(f"   • Enhanced scores below 9.0 trigger Ollama polishing") 
\ No newline at end of file
+def shards_overlap(first: Tuple[int, int], second: Tuple[int, int]) -> bool:
+    """
+    Whether two (index, count) shards share any question.
+    
+    h % N == i and h % M == j have a common solution exactly when
+    i and j agree modulo gcd(N, M), so e.g. 0/2 and 0/4 overlap but 1/2 and 0/4 do not.
+    """
+    divisor = math.gcd(first[1], second[1])
+    return first[0] % divisor == second[0] % divisor
+
+def run_shard(csv_file: str, shard_index: int, num_shards: int, output_dir: str = SHARD_OUTPUT_DIR,
+              sample_size: Optional[int] = None) -> Optional[str]:
+    """
+    Analyze one shard of the CSV, writing its results and mergeable summary.
+    
+    Args:
+        csv_file: Path to the CSV file
+        shard_index: Shard to process
+        num_shards: Total number of shards
+        output_dir: Directory for shard-<i>-of-<N>.results.jsonl and .summary.json
+        sample_size: Questions sampled from the shard (None = all of them)
+    
+    Returns:
+        Path of the summary file, or None if the shard could not be processed
+    """
+    report = get_reporter()
+    os.makedirs(output_dir, exist_ok=True)
+    stem = os.path.join(output_dir, f"shard-{shard_index:03d}-of-{num_shards:03d}")
+    results_path = f"{stem}.results.jsonl"
+    summary_path = f"{stem}.summary.json"
+    
+    # Results are written as they are produced, so memory stays flat however large the shard is
+    with open(results_path, 'w', encoding='utf-8') as f:
+        stats = process_all_questions_with_metrics(
+            csv_file, sample_size, keep_results=False, shard=(shard_index, num_shards),
+            on_result=lambda result: f.write(json.dumps(result, default=str) + "\n")
+        )
+    if not stats:
+        return None
+    
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'shard': shard_index,
+            'num_shards': num_shards,
+            'csv_file': csv_file,
+            'sample_size': sample_size,
+            'matched_count': stats['matched_count'],
+            'results_file': results_path,
+            'improvement_stats': stats['improvement_stats'].to_dict()
+        }, f, indent=2)
+    report.info(f"💾 Shard {shard_index}/{num_shards} written to {summary_path}")
+    return summary_path
+
+def run_sharded(csv_file: str = "questions.csv", workers: int = 1, shard: Optional[Tuple[int, int]] = None,
+                output_dir: str = SHARD_OUTPUT_DIR, sample_size: Optional[int] = None) -> Optional[Dict]:
+    """
+    Analyze the CSV (or one shard of it) with several worker processes, then print the merged report.
+    
+    With shard i/N and W workers, worker k handles shard i + k*N of N*W: the
+    workers' shards are disjoint and together cover exactly shard i/N, so
+    every machine can use its own worker count and the merged files still
+    cover the corpus once.
+    
+    Args:
+        csv_file: Path to the CSV file
+        workers: Worker processes on this machine
+        shard: (index, count) handled by this machine (None = the whole file)
+        output_dir: Directory for shard files
+        sample_size: Questions sampled per worker shard (None = all)
+    
+    Returns:
+        Merged statistics in the process_all_questions_with_metrics format
+    """
+    report = get_reporter()
+    workers = max(1, workers)
+    shard_index, num_shards = shard or (0, 1)
+    shards = [(shard_index + k * num_shards, num_shards * workers) for k in range(workers)]
+    report.info(f"🧩 Processing {len(shards)} shard(s) of {csv_file} with {workers} worker(s)")
+    
+    if workers == 1:
+        summary_paths = [run_shard(csv_file, index, count, output_dir, sample_size) for index, count in shards]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(run_shard, csv_file, index, count, output_dir, sample_size)
+                       for index, count in shards]
+            summary_paths = [future.result() for future in futures]
+    
+    summary_paths = [path for path in summary_paths if path]
+    if not summary_paths:
+        report.error("❌ No shard produced results")
+        return None
+    return merge_shard_summaries(summary_paths)
+
+def merge_shard_summaries(paths: List[str]) -> Optional[Dict]:
+    """
+    Merge shard summary files and print the all-questions report.
+    
+    Shards that share questions with one already merged (a duplicate, or a
+    stale file from a run with a different shard count, e.g. 0/2 next to 0/4)
+    are skipped with a warning so no question is counted twice. Files are
+    merged newest first, so the most recent run wins.
+    
+    Args:
+        paths: Summary files, or directories containing *.summary.json files
+    
+    Returns:
+        Merged statistics in the process_all_questions_with_metrics format
+    """
+    report = get_reporter()
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.summary.json")),
+                                key=os.path.getmtime, reverse=True))
+        else:
+            files.append(path)
+    if not files:
+        report.error(f"❌ No shard summaries found in: {', '.join(paths)}")
+        return None
+    
+    summary = ImprovementStats()
+    matched_count = 0
+    seen = set()
+    for file in files:
+        with open(file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        key = (data['shard'], data['num_shards'])
+        overlapping = next((other for other in seen if shards_overlap(key, other)), None)
+        if overlapping is not None:
+            report.info(f"⚠️  Skipping shard {key[0]}/{key[1]}: it overlaps shard {overlapping[0]}/{overlapping[1]}"
+                  f" already merged ({file})")
+            continue
+        seen.add(key)
+        matched_count += data['matched_count']
+        summary.merge(ImprovementStats.from_dict(data['improvement_stats']))
+    
+    report.info(f"🧩 Merged {len(seen)} shard summaries")
+    coverage = shard_coverage(seen)
+    if coverage is not None and coverage < 1.0:
+        report.info(f"⚠️  Shards cover only {coverage:.1%} of the corpus - some shard files are missing")
+    
+    stats = all_questions_stats(matched_count, summary)
+    print_all_questions_summary(stats)
+    return stats
+
+def main(argv: Optional[List[str]] = None):
+    # Output options, accepted before or after the subcommand
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument("-v", "--verbose", action="store_const", const=DETAIL, dest="verbosity", default=argparse.SUPPRESS,
+                        help="Print per-question texts and metrics")
+    output.add_argument("-q", "--quiet", action="store_const", const=QUIET, dest="verbosity", default=argparse.SUPPRESS,
+                        help="Only print errors")
+    output.add_argument("--json-events", metavar="PATH", default=argparse.SUPPRESS,
+                        help="Write per-question, progress and summary events as JSON lines ('-' = stdout)")
+    output.add_argument("--timings-by-type", action="store_true", default=argparse.SUPPRESS,
+                        help="Break the stage timing summary down by question type")
+    add_profile_argument(output, default=argparse.SUPPRESS)
+    
+    parser = argparse.ArgumentParser(description="Question improvement metrics analyzer", parents=[output])
+    subparsers = parser.add_subparsers(dest="command")
+    
+    sample_parser = subparsers.add_parser("sample", parents=[output],
+                                          help="Analyze random questions with Ollama polishing (default)")
+    sample_parser.add_argument("-n", "--num-questions", type=int, default=NUM_QUESTIONS)
+    sample_parser.add_argument("--concurrency", type=int, default=POLISH_CONCURRENCY)
+    sample_parser.add_argument("--batch-size", type=int, default=1)
+    
+    all_parser = subparsers.add_parser("all", parents=[output], help="Analyze the whole CSV, optionally sharded")
+    all_parser.add_argument("--csv", default="questions.csv")
+    all_parser.add_argument("--sample-size", type=int, default=None,
+                            help="Questions to sample (per worker shard when sharding)")
+    all_parser.add_argument("--workers", type=int, default=1, help="Worker processes on this machine")
+    all_parser.add_argument("--shard", type=parse_shard, default=None,
+                            help="Only process shard i/N (split by a hash of id) for multi-machine runs")
+    all_parser.add_argument("--output-dir", default=SHARD_OUTPUT_DIR)
+    
+    merge_parser = subparsers.add_parser("merge", parents=[output], help="Merge shard summaries into one report")
+    merge_parser.add_argument("paths", nargs="*", default=[SHARD_OUTPUT_DIR],
+                              help="Summary files or directories (default: the shard output directory)")
+    
+    args = parser.parse_args(argv)
+    if hasattr(args, 'verbosity') or hasattr(args, 'json_events'):
+        configure_reporter(verbosity=getattr(args, 'verbosity', None), json_path=getattr(args, 'json_events', None))
+    
+    # Sharded runs profile only this process; worker processes are not sampled
+    run_profiled(f"metrics_analyzer-{args.command or 'sample'}", getattr(args, 'profile', None), _run_command, args)
+
+def _run_command(args: argparse.Namespace) -> None:
+    timings_by_type = getattr(args, 'timings_by_type', False)
+    
+    if args.command == "all":
+        if args.workers > 1 or args.shard is not None:
+            # Worker processes keep their own timers; only in-process runs are summarized
+            run_sharded(args.csv, args.workers, args.shard, args.output_dir, args.sample_size)
+        else:
+            analyze_all_questions(args.csv, args.sample_size)
+            print_instrumentation_summary(by_type=timings_by_type)
+        return
+    if args.command == "merge":
+        merge_shard_summaries(args.paths)
+        return
+    
+    report = get_reporter()
+    report.info("🚀 METRICS ANALYZER")
+    report.info("=" * 60)
+    
+    if args.command == "sample":
+        analyze_question_metrics(args.num_questions, concurrency=args.concurrency, batch_size=args.batch_size)
+    else:
+        analyze_question_metrics(NUM_QUESTIONS)
+    print_instrumentation_summary(by_type=timings_by_type)
+    
+    report.info(f"\n🎉 Analysis completed!")
+    report.info(f"\n💡 USAGE TIPS:")
+    report.info(f"   • Change NUM_QUESTIONS at the top to analyze more questions")
+    report.info(f"   • Run 'python metrics_analyzer.py all' to analyze all questions")
+    report.info(f"   • Run 'python metrics_analyzer.py all --workers 8' (or '--shard i/N' per machine, then 'merge') for large corpora")
+    report.info(f"   • Questions are automatically processed through template matching and Ollama polishing")
+    report.info(f"   • Metrics show clarity, conciseness, technical accuracy, and actionability")
+    report.info(f"   • Enhanced scores below 9.0 trigger Ollama polishing")
+    report.info(f"   • Add -v for per-question detail, -q for errors only, --json-events PATH for machine-readable output")
+    report.info(f"   • Add --profile (or --profile sample) to write .pstats and stage-grouped flamegraph stacks")
+
+if __name__ == "__main__":
+    main()
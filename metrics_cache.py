@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Metrics Cache - persistent cache of text metrics shared across runs and processes.
+Entries are keyed by a hash of the text plus the metrics implementation
+version, so changing templates only re-scores texts that actually changed,
+while changing the scorers invalidates everything.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from disk_cache import DiskCache
+
+# Configuration (override with environment variables)
+METRICS_CACHE_PATH = os.environ.get("METRICS_CACHE_PATH", ".cache/metrics_cache.sqlite3")
+METRICS_CACHE_ENABLED = os.environ.get("METRICS_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+METRICS_CACHE_MAX_ENTRIES = int(os.environ.get("METRICS_CACHE_MAX_ENTRIES", "1000000"))
+MEMORY_CACHE_MAX_ENTRIES = int(os.environ.get("METRICS_MEMORY_CACHE_MAX_ENTRIES", "50000"))
+
+# Bump when the scorers change in a way that alters results
+METRICS_IMPLEMENTATION_VERSION = "1"
+
+
+def _metrics_version() -> str:
+    """Version string of the metrics implementation, including metrics3's own version if it has one."""
+    try:
+        import metrics3
+        module_version = getattr(metrics3, "__version__", "")
+    except ImportError:
+        module_version = ""
+    return f"{METRICS_IMPLEMENTATION_VERSION}:{module_version}"
+
+
+METRICS_VERSION = _metrics_version()
+
+_disk_cache: Optional[DiskCache] = None
+_disk_cache_lock = threading.Lock()
+_memory_cache: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+_memory_cache_lock = threading.Lock()
+_memory_hits = 0
+_memory_misses = 0
+
+
+def metrics_key(text: str) -> str:
+    """Cache key for a text: metrics version plus a SHA-256 of the text."""
+    digest = hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+    return f"{METRICS_VERSION}:{digest}"
+
+
+def get_metrics_cache() -> Optional[DiskCache]:
+    """Get the process-wide disk cache, opening it on first use. None if disabled or unavailable."""
+    global _disk_cache, METRICS_CACHE_ENABLED
+    if not METRICS_CACHE_ENABLED:
+        return None
+    if _disk_cache is None:
+        with _disk_cache_lock:
+            if _disk_cache is None:
+                try:
+                    _disk_cache = DiskCache(METRICS_CACHE_PATH, table="metrics",
+                                            max_entries=METRICS_CACHE_MAX_ENTRIES)
+                except Exception as e:
+                    print(f"⚠️  Metrics cache disabled ({METRICS_CACHE_PATH}): {e}")
+                    METRICS_CACHE_ENABLED = False
+                    return None
+    return _disk_cache
+
+
+def _remember(key: str, metrics: Dict[str, float]) -> None:
+    """Store metrics in the bounded in-process cache."""
+    with _memory_cache_lock:
+        _memory_cache[key] = metrics
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > MEMORY_CACHE_MAX_ENTRIES:
+            _memory_cache.popitem(last=False)
+
+
+def _recall(key: str) -> Optional[Dict[str, float]]:
+    """Look up metrics in the in-process cache."""
+    global _memory_hits, _memory_misses
+    with _memory_cache_lock:
+        metrics = _memory_cache.get(key)
+        if metrics is not None:
+            _memory_cache.move_to_end(key)
+            _memory_hits += 1
+        else:
+            _memory_misses += 1
+        return metrics
+
+
+def get_cached_metrics(text: str) -> Optional[Dict[str, float]]:
+    """
+    Look up metrics for a text in memory, then on disk.
+
+    Returns:
+        A copy of the cached metrics, or None on a miss
+    """
+    key = metrics_key(text)
+    metrics = _recall(key)
+    if metrics is None:
+        cache = get_metrics_cache()
+        if cache is None:
+            return None
+        try:
+            metrics = cache.get(key)
+        except Exception as e:
+            print(f"⚠️  Metrics cache lookup failed: {e}")
+            return None
+        if metrics is None:
+            return None
+        _remember(key, metrics)
+    return dict(metrics)
+
+
+def store_metrics(text: str, metrics: Dict[str, float]) -> None:
+    """Store metrics for a text in memory and on disk."""
+    key = metrics_key(text)
+    _remember(key, dict(metrics))
+    cache = get_metrics_cache()
+    if cache is not None:
+        try:
+            cache.set(key, metrics)
+        except Exception as e:
+            print(f"⚠️  Metrics cache write failed: {e}")
+
+
+def prefetch_metrics(texts: Iterable[str]) -> int:
+    """
+    Bulk-load cached metrics for a batch of texts into memory.
+
+    Args:
+        texts: Texts that are about to be scored
+
+    Returns:
+        Number of texts found in the disk cache
+    """
+    keys = [metrics_key(text) for text in texts]
+    cache = get_metrics_cache()
+    if cache is None or not keys:
+        return 0
+    with _memory_cache_lock:
+        missing = [key for key in keys if key not in _memory_cache]
+    try:
+        found = cache.get_many(missing)
+    except Exception as e:
+        print(f"⚠️  Metrics cache bulk lookup failed: {e}")
+        return 0
+    for key, metrics in found.items():
+        _remember(key, metrics)
+    return len(found)
+
+
+def get_metrics_cache_stats() -> Dict:
+    """Hit/miss counters and sizes for the memory and disk layers."""
+    cache = get_metrics_cache()
+    with _memory_cache_lock:
+        memory_entries = len(_memory_cache)
+        memory_hits, memory_misses = _memory_hits, _memory_misses
+    return {
+        'enabled': cache is not None,
+        'version': METRICS_VERSION,
+        'memory_entries': memory_entries,
+        'memory_hits': memory_hits,
+        'memory_misses': memory_misses,
+        'disk': cache.stats() if cache is not None else None
+    }
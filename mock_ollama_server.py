@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Mock Ollama Server - a local stand-in for `ollama serve` for benchmarks and load tests.
+Speaks the subset of the Ollama HTTP API used by the polishing path
+(/api/tags, /api/version, /api/generate and /api/chat, streaming and not)
+with configurable latency distribution, tokens per second and error rate.
+
+Usage:
+    python mock_ollama_server.py --port 11435 --latency-ms 300 --tokens-per-second 40
+    OLLAMA_HOST=http://localhost:11435 python metrics_analyzer.py
+
+Or from Python:
+    with run_mock_ollama_server(latency_ms=50) as url:
+        ...
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+_TOKEN_RE = re.compile(r"\S+\s*")
+_QUESTION_RE = re.compile(r"^Question:\s*(.+)$", re.MULTILINE)
+
+
+class MockOllamaConfig:
+    """Behaviour of the mock server."""
+
+    def __init__(self, model: str = "llama2", latency_ms: float = 200.0, latency_jitter_ms: float = 50.0,
+                 latency_distribution: str = "normal", tokens_per_second: float = 50.0,
+                 error_rate: float = 0.0, seed: Optional[int] = None):
+        """
+        Args:
+            model: Model name reported by /api/tags
+            latency_ms: Mean time to first token in milliseconds
+            latency_jitter_ms: Spread of the time to first token (uniform half-width,
+                normal standard deviation, or lognormal standard deviation)
+            latency_distribution: One of LATENCY_DISTRIBUTIONS
+            tokens_per_second: Generation speed after the first token (0 = instant)
+            error_rate: Share of generate/chat requests answered with HTTP 500
+            seed: Random seed for repeatable runs
+        """
+        if latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {latency_distribution}")
+        self.model = model
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.latency_distribution = latency_distribution
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+    def sample_latency(self) -> float:
+        """Time to first token in seconds."""
+        mean, jitter = self.latency_ms, self.latency_jitter_ms
+        with self._random_lock:
+            if self.latency_distribution == "fixed" or jitter <= 0:
+                value = mean
+            elif self.latency_distribution == "uniform":
+                value = self._random.uniform(mean - jitter, mean + jitter)
+            elif self.latency_distribution == "normal":
+                value = self._random.gauss(mean, jitter)
+            else:
+                # Lognormal with the requested mean and standard deviation: a long right tail
+                sigma2 = math.log(1 + (jitter / mean) ** 2) if mean > 0 else 0.0
+                value = self._random.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2)) if mean > 0 else 0.0
+        return max(0.0, value) / 1000
+
+    def should_fail(self) -> bool:
+        with self._random_lock:
+            return self._random.random() < self.error_rate
+
+    def to_dict(self) -> Dict:
+        return {
+            'model': self.model,
+            'latency_ms': self.latency_ms,
+            'latency_jitter_ms': self.latency_jitter_ms,
+            'latency_distribution': self.latency_distribution,
+            'tokens_per_second': self.tokens_per_second,
+            'error_rate': self.error_rate
+        }
+
+
+def mock_completion(prompt: str) -> str:
+    """
+    Deterministic stand-in answer for a polish prompt.
+
+    Batch prompts (see batch_polisher) get a JSON array with one entry per
+    question; anything else gets a rewritten version of its last question.
+    """
+    questions = _QUESTION_RE.findall(prompt)
+    if "### Question id" in prompt:
+        return json.dumps([{'id': i, 'improved_question': _rewrite(q)} for i, q in enumerate(questions)])
+    return _rewrite(questions[-1] if questions else prompt.strip().splitlines()[-1] if prompt.strip() else "")
+
+
+def _rewrite(question: str) -> str:
+    question = question.strip().rstrip("?.!")
+    return f"Could you explain how to resolve this: {question}?" if question else "Could you clarify the question?"
+
+
+class _MockOllamaHandler(BaseHTTPRequestHandler):
+    server_version = "MockOllama/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Keep benchmark output clean
+        pass
+
+    @property
+    def config(self) -> MockOllamaConfig:
+        return self.server.config
+
+    def _count(self, key: str) -> None:
+        with self.server.stats_lock:
+            self.server.stats[key] = self.server.stats.get(key, 0) + 1
+
+    def _send_json(self, status: int, payload: Dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get("Content-Length", 0) or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length).decode("utf-8"))
+
+    def do_GET(self):
+        self._count('requests')
+        if self.path == "/api/tags":
+            self._send_json(200, {'models': [{
+                'name': self.config.model,
+                'model': self.config.model,
+                'modified_at': datetime.now(timezone.utc).isoformat(),
+                'size': 0
+            }]})
+        elif self.path == "/api/version":
+            self._send_json(200, {'version': "0.0.0-mock"})
+        elif self.path == "/mock/stats":
+            with self.server.stats_lock:
+                stats = dict(self.server.stats)
+            self._send_json(200, {'stats': stats, 'config': self.config.to_dict()})
+        else:
+            self._send_json(404, {'error': f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        self._count('requests')
+        if self.path not in ("/api/generate", "/api/chat"):
+            self._send_json(404, {'error': f"Unknown path {self.path}"})
+            return
+        try:
+            payload = self._read_json()
+        except ValueError:
+            self._send_json(400, {'error': "Invalid JSON"})
+            return
+
+        chat = self.path == "/api/chat"
+        if chat:
+            messages = payload.get('messages') or [{}]
+            prompt = messages[-1].get('content', '')
+        else:
+            prompt = payload.get('prompt', '')
+        stream = payload.get('stream', True)
+        model = payload.get('model') or self.config.model
+
+        self._count('generate_requests')
+        time.sleep(self.config.sample_latency())
+        if self.config.should_fail():
+            self._count('errors')
+            self._send_json(500, {'error': "mock server injected failure"})
+            return
+
+        tokens = _TOKEN_RE.findall(mock_completion(prompt)) or [""]
+        token_delay = 1.0 / self.config.tokens_per_second if self.config.tokens_per_second > 0 else 0.0
+        if stream:
+            self._stream(tokens, token_delay, model, chat)
+        else:
+            time.sleep(token_delay * max(0, len(tokens) - 1))
+            self._send_json(200, self._chunk("".join(tokens), model, chat, done=True))
+        self._count('completed')
+
+    def _chunk(self, text: str, model: str, chat: bool, done: bool) -> Dict:
+        chunk = {'model': model, 'created_at': datetime.now(timezone.utc).isoformat(), 'done': done}
+        if chat:
+            chunk['message'] = {'role': 'assistant', 'content': text}
+        else:
+            chunk['response'] = text
+        return chunk
+
+    def _stream(self, tokens: List[str], token_delay: float, model: str, chat: bool) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for i, token in enumerate(tokens):
+                if i:
+                    time.sleep(token_delay)
+                self._write_chunk(json.dumps(self._chunk(token, model, chat, done=False)) + "\n")
+            self._write_chunk(json.dumps(self._chunk("", model, chat, done=True)) + "\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self._count('disconnects')
+
+    def _write_chunk(self, text: str) -> None:
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+class MockOllamaServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the mock configuration and request counters."""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 11435, config: Optional[MockOllamaConfig] = None):
+        super().__init__((host, port), _MockOllamaHandler)
+        self.config = config or MockOllamaConfig()
+        self.stats: Dict[str, int] = {}
+        self.stats_lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+@contextmanager
+def run_mock_ollama_server(host: str = "127.0.0.1", port: int = 0, **config) -> Iterator[str]:
+    """
+    Run a mock server on a background thread for the duration of a with block.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind (0 = any free port)
+        **config: MockOllamaConfig arguments
+
+    Yields:
+        Base URL of the server (use as OLLAMA_HOST)
+    """
+    server = MockOllamaServer(host, port, MockOllamaConfig(**config))
+    thread = threading.Thread(target=server.serve_forever, name="mock-ollama", daemon=True)
+    thread.start()
+    try:
+        yield server.url
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Ollama server for benchmarks and load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--model", default="llama2")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Mean time to first token")
+    parser.add_argument("--latency-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--latency-distribution", choices=LATENCY_DISTRIBUTIONS, default="normal")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests that fail (0-1)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = MockOllamaConfig(
+        model=args.model,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        latency_distribution=args.latency_distribution,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        seed=args.seed
+    )
+    server = MockOllamaServer(args.host, args.port, config)
+    print(f"🧪 Mock Ollama server listening on {server.url}")
+    print(f"   Latency: {config.latency_distribution} {config.latency_ms:.0f}±{config.latency_jitter_ms:.0f} ms, "
+          f"{config.tokens_per_second:.0f} tokens/s, error rate {config.error_rate:.0%}")
+    print(f"   Use with: OLLAMA_HOST={server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stopping mock server")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
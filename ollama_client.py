@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+Ollama Client - pooled keep-alive HTTP access to the local Ollama servers.
+One requests.Session per process is shared by every thread (Flask workers,
+the bulk polishing executor), so connections are reused instead of being
+set up for every polish or availability probe. With several endpoints in
+OLLAMA_HOSTS, requests go to the least-loaded healthy one, optionally with a
+hedged second request when the first runs past its p95 latency.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from streaming_stats import Histogram
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    REQUESTS_AVAILABLE = True
+except ImportError:
+    REQUESTS_AVAILABLE = False
+
+# Configuration (override with environment variables)
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434").rstrip("/")
+OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "llama2")
+OLLAMA_POOL_CONNECTIONS = int(os.environ.get("OLLAMA_POOL_CONNECTIONS", "4"))  # Hosts kept in the pool
+OLLAMA_POOL_MAXSIZE = int(os.environ.get("OLLAMA_POOL_MAXSIZE", "16"))  # Keep-alive connections per host
+OLLAMA_CONNECT_TIMEOUT = float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", "3"))
+OLLAMA_READ_TIMEOUT = float(os.environ.get("OLLAMA_READ_TIMEOUT", "120"))
+OLLAMA_PROBE_TIMEOUT = float(os.environ.get("OLLAMA_PROBE_TIMEOUT", "2"))
+OLLAMA_AVAILABILITY_TTL = float(os.environ.get("OLLAMA_AVAILABILITY_TTL", "30"))  # Seconds a probe result is reused
+
+# Endpoint pool: comma-separated base URLs (default: just OLLAMA_HOST)
+OLLAMA_HOSTS = [host.strip().rstrip("/") for host in os.environ.get("OLLAMA_HOSTS", OLLAMA_HOST).split(",") if host.strip()]
+OLLAMA_HEDGE_ENABLED = os.environ.get("OLLAMA_HEDGE", "0").lower() in ("1", "true", "yes")
+OLLAMA_HEDGE_QUANTILE = float(os.environ.get("OLLAMA_HEDGE_QUANTILE", "0.95"))
+OLLAMA_HEDGE_MIN_SAMPLES = int(os.environ.get("OLLAMA_HEDGE_MIN_SAMPLES", "20"))  # Latencies needed before hedging
+OLLAMA_ENDPOINT_FAILURE_LIMIT = int(os.environ.get("OLLAMA_ENDPOINT_FAILURE_LIMIT", "3"))  # Consecutive failures that bench an endpoint
+OLLAMA_ENDPOINT_COOLDOWN = float(os.environ.get("OLLAMA_ENDPOINT_COOLDOWN", "15"))  # Seconds a benched endpoint is avoided
+
+T = TypeVar("T")
+
+_session = None
+_session_pid: Optional[int] = None
+_session_lock = threading.Lock()
+
+_availability: Optional[bool] = None
+_availability_checked_at = 0.0
+_availability_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Get the process-wide pooled session, creating it on first use (and again after a fork).
+
+    Returns:
+        A requests.Session with a keep-alive connection pool
+    """
+    global _session, _session_pid
+    if not REQUESTS_AVAILABLE:
+        raise RuntimeError("The requests package is required to talk to Ollama")
+    if _session is None or _session_pid != os.getpid():
+        with _session_lock:
+            if _session is None or _session_pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=max(OLLAMA_POOL_CONNECTIONS, len(OLLAMA_HOSTS)),
+                                      pool_maxsize=OLLAMA_POOL_MAXSIZE,
+                                      pool_block=False)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+                _session_pid = os.getpid()
+    return _session
+
+
+def _url(path: str, host: Optional[str] = None) -> str:
+    return f"{(host or OLLAMA_HOST).rstrip('/')}{path}"
+
+
+class OllamaEndpoint:
+    """Load, health and latency bookkeeping for one Ollama server (guarded by the pool lock)."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.last_failure_at = 0.0
+        self.last_error: Optional[str] = None
+        self.latency = Histogram(0.0, max(OLLAMA_READ_TIMEOUT, 1.0), 0.01)
+
+    def healthy(self, now: float) -> bool:
+        """Benched after repeated failures until the cooldown has passed."""
+        return (self.consecutive_failures < OLLAMA_ENDPOINT_FAILURE_LIMIT or
+                now - self.last_failure_at >= OLLAMA_ENDPOINT_COOLDOWN)
+
+    def median_latency(self) -> float:
+        if not self.latency.count:
+            return 0.0
+        return self.latency.quantile(0.5) or 0.0
+
+    def to_dict(self, now: float) -> Dict:
+        return {
+            'url': self.url,
+            'healthy': self.healthy(now),
+            'in_flight': self.in_flight,
+            'requests': self.requests,
+            'errors': self.errors,
+            'error_rate': self.errors / self.requests * 100 if self.requests else 0.0,
+            'consecutive_failures': self.consecutive_failures,
+            'last_error': self.last_error,
+            'latency': self.latency.quantiles() if self.latency.count else {}
+        }
+
+
+class EndpointPool:
+    """
+    Least-loaded routing over several Ollama endpoints.
+
+    Each call goes to the healthy endpoint with the fewest requests in
+    flight (ties broken by median latency). With hedging, a second request
+    goes to another endpoint once the first has run past the endpoint's
+    latency quantile, and whichever succeeds first wins.
+    """
+
+    def __init__(self, urls: List[str], hedge: bool = OLLAMA_HEDGE_ENABLED,
+                 hedge_quantile: float = OLLAMA_HEDGE_QUANTILE):
+        if not urls:
+            raise ValueError("An endpoint pool needs at least one URL")
+        self.endpoints = [OllamaEndpoint(url) for url in urls]
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def acquire(self, exclude: Tuple[OllamaEndpoint, ...] = ()) -> Optional[OllamaEndpoint]:
+        """
+        Reserve the least-loaded healthy endpoint.
+
+        Args:
+            exclude: Endpoints not to use (e.g. the one a hedge backs up)
+
+        Returns:
+            The endpoint, or None if only excluded or unhealthy ones remain while excluding
+        """
+        now = time.monotonic()
+        with self._lock:
+            candidates = [e for e in self.endpoints if e not in exclude]
+            healthy = [e for e in candidates if e.healthy(now)]
+            if not healthy:
+                if exclude or not candidates:
+                    return None
+                # Everything is benched: try the one that failed longest ago rather than failing outright
+                healthy = [min(candidates, key=lambda e: e.last_failure_at)]
+            endpoint = min(healthy, key=lambda e: (e.in_flight, e.median_latency(), e.requests))
+            endpoint.in_flight += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def release(self, endpoint: OllamaEndpoint, elapsed: Optional[float], error: Optional[str] = None) -> None:
+        """Return an endpoint reserved with acquire and record the outcome."""
+        with self._lock:
+            endpoint.in_flight -= 1
+            if error is None:
+                endpoint.consecutive_failures = 0
+                if elapsed is not None:
+                    endpoint.latency.add(elapsed)
+            else:
+                endpoint.errors += 1
+                endpoint.consecutive_failures += 1
+                endpoint.last_failure_at = time.monotonic()
+                endpoint.last_error = error
+
+    def record_probe(self, endpoint: OllamaEndpoint, ok: bool) -> None:
+        """Feed an availability probe result into an endpoint's health."""
+        with self._lock:
+            if ok:
+                endpoint.consecutive_failures = 0
+            else:
+                endpoint.consecutive_failures = max(endpoint.consecutive_failures + 1, OLLAMA_ENDPOINT_FAILURE_LIMIT)
+                endpoint.last_failure_at = time.monotonic()
+                endpoint.last_error = "Availability probe failed"
+
+    def hedge_delay(self, endpoint: OllamaEndpoint) -> Optional[float]:
+        """Seconds to wait before hedging a request to endpoint; None until enough latencies are known."""
+        with self._lock:
+            if endpoint.latency.count < OLLAMA_HEDGE_MIN_SAMPLES:
+                return None
+            return endpoint.latency.quantile(self.hedge_quantile)
+
+    def _run(self, endpoint: OllamaEndpoint, fn: Callable[[str], T]) -> T:
+        start = time.perf_counter()
+        try:
+            result = fn(endpoint.url)
+        except Exception as e:
+            self.release(endpoint, None, str(e) or type(e).__name__)
+            raise
+        self.release(endpoint, time.perf_counter() - start)
+        return result
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=max(4, OLLAMA_POOL_MAXSIZE * len(self.endpoints)),
+                                                        thread_name_prefix="ollama-hedge")
+        return self._executor
+
+    def call(self, fn: Callable[[str], T], hedge: Optional[bool] = None) -> T:
+        """
+        Run fn(base_url) on the best endpoint, hedging if enabled.
+
+        Args:
+            fn: Request function taking an endpoint base URL
+            hedge: Override the pool's hedging setting
+
+        Returns:
+            The first successful result
+
+        Raises:
+            The last error if every attempt failed
+        """
+        hedge = self.hedge if hedge is None else hedge
+        primary = self.acquire()
+        delay = self.hedge_delay(primary) if hedge and len(self.endpoints) > 1 else None
+        if delay is None:
+            return self._run(primary, fn)
+
+        executor = self._get_executor()
+        futures = {executor.submit(self._run, primary, fn): primary}
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            backup = self.acquire(exclude=(primary,))
+            if backup is not None:
+                with self._lock:
+                    self.hedges_sent += 1
+                futures[executor.submit(self._run, backup, fn)] = backup
+
+        # The slower request keeps running in the background; its result is discarded
+        last_error: Optional[BaseException] = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if futures[future] is not primary:
+                    with self._lock:
+                        self.hedges_won += 1
+                return result
+        raise last_error
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'hedge': self.hedge,
+                'hedge_quantile': self.hedge_quantile,
+                'hedges_sent': self.hedges_sent,
+                'hedges_won': self.hedges_won,
+                'endpoints': [endpoint.to_dict(now) for endpoint in self.endpoints]
+            }
+
+
+_pool: Optional[EndpointPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_endpoint_pool() -> EndpointPool:
+    """Get the process-wide endpoint pool built from OLLAMA_HOSTS."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = EndpointPool(OLLAMA_HOSTS)
+    return _pool
+
+
+def configure_endpoint_pool(hosts: List[str]) -> EndpointPool:
+    """
+    Replace the process-wide endpoint pool, e.g. to point a benchmark at a mock server.
+
+    Args:
+        hosts: Ollama base URLs
+
+    Returns:
+        The new pool
+    """
+    global _pool, _availability
+    with _pool_lock:
+        _pool = EndpointPool([host.rstrip("/") for host in hosts])
+    with _availability_lock:
+        _availability = None
+    return _pool
+
+
+def get_available_models(host: Optional[str] = None) -> List[str]:
+    """
+    List the models installed on the Ollama server.
+
+    Args:
+        host: Ollama base URL (default: every endpoint in OLLAMA_HOSTS)
+
+    Returns:
+        Model names, or an empty list if no server can be reached
+    """
+    models: List[str] = []
+    for url in ([host] if host else OLLAMA_HOSTS):
+        try:
+            response = get_session().get(_url("/api/tags", url),
+                                         timeout=(OLLAMA_CONNECT_TIMEOUT, OLLAMA_PROBE_TIMEOUT))
+            response.raise_for_status()
+        except Exception:
+            continue
+        for model in response.json().get('models', []):
+            if model.get('name', '') not in models:
+                models.append(model.get('name', ''))
+    return models
+
+
+def check_ollama_available(force: bool = False, host: Optional[str] = None) -> bool:
+    """
+    Check whether the Ollama server answers. The result is reused for OLLAMA_AVAILABILITY_TTL seconds.
+
+    Args:
+        force: Probe the server even if a recent result exists
+        host: Ollama base URL (default: every endpoint in the pool; other hosts are never cached)
+
+    Returns:
+        True if the server (or at least one pool endpoint) responded
+    """
+    global _availability, _availability_checked_at
+    if not REQUESTS_AVAILABLE:
+        return False
+    if host is None and not force:
+        with _availability_lock:
+            if _availability is not None and time.monotonic() - _availability_checked_at < OLLAMA_AVAILABILITY_TTL:
+                return _availability
+
+    if host is not None:
+        return _probe(host)
+
+    # Probe every endpoint so the pool learns which ones are down
+    pool = get_endpoint_pool()
+    available = False
+    for endpoint in pool.endpoints:
+        ok = _probe(endpoint.url)
+        pool.record_probe(endpoint, ok)
+        available = available or ok
+
+    with _availability_lock:
+        _availability = available
+        _availability_checked_at = time.monotonic()
+    return available
+
+
+def _probe(host: str) -> bool:
+    try:
+        response = get_session().get(_url("/api/tags", host),
+                                     timeout=(OLLAMA_CONNECT_TIMEOUT, OLLAMA_PROBE_TIMEOUT))
+        return response.status_code == 200
+    except Exception:
+        return False
+
+
+def generate(prompt: str, model: Optional[str] = None, system: Optional[str] = None,
+             options: Optional[Dict] = None, host: Optional[str] = None,
+             timeout: Optional[float] = None) -> str:
+    """
+    Run a non-streaming completion.
+
+    Args:
+        prompt: Prompt text
+        model: Model name (default: OLLAMA_MODEL)
+        system: System prompt (optional)
+        options: Ollama generation options such as temperature (optional)
+        host: Ollama base URL (default: routed through the endpoint pool)
+        timeout: Read timeout in seconds (default: OLLAMA_READ_TIMEOUT)
+
+    Returns:
+        The generated text
+
+    Raises:
+        requests.RequestException: If the request fails
+    """
+    payload = {'model': model or OLLAMA_MODEL, 'prompt': prompt, 'stream': False}
+    if system:
+        payload['system'] = system
+    if options:
+        payload['options'] = options
+
+    def post(url: str) -> str:
+        response = get_session().post(_url("/api/generate", url), json=payload,
+                                      timeout=(OLLAMA_CONNECT_TIMEOUT, timeout or OLLAMA_READ_TIMEOUT))
+        response.raise_for_status()
+        return response.json().get('response', '')
+
+    if host is not None:
+        return post(host)
+    return get_endpoint_pool().call(post)
+
+
+def generate_stream(prompt: str, model: Optional[str] = None, system: Optional[str] = None,
+                    options: Optional[Dict] = None, host: Optional[str] = None,
+                    timeout: Optional[float] = None) -> Iterator[str]:
+    """
+    Run a streaming completion, yielding text chunks as the model produces them.
+
+    Args:
+        See generate; timeout applies to the wait between chunks
+
+    Yields:
+        Generated text chunks
+
+    Raises:
+        requests.RequestException: If the request fails
+    """
+    payload = {'model': model or OLLAMA_MODEL, 'prompt': prompt, 'stream': True}
+    if system:
+        payload['system'] = system
+    if options:
+        payload['options'] = options
+
+    # Streams are routed but never hedged; their duration is not recorded as latency
+    pool = get_endpoint_pool() if host is None else None
+    endpoint = pool.acquire() if pool is not None else None
+    error: Optional[str] = None
+    try:
+        with get_session().post(_url("/api/generate", endpoint.url if endpoint else host), json=payload, stream=True,
+                                timeout=(OLLAMA_CONNECT_TIMEOUT, timeout or OLLAMA_READ_TIMEOUT)) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get('error'):
+                    raise RuntimeError(chunk['error'])
+                if chunk.get('response'):
+                    yield chunk['response']
+                if chunk.get('done'):
+                    break
+    except Exception as e:
+        error = str(e) or type(e).__name__
+        raise
+    finally:
+        if endpoint is not None:
+            pool.release(endpoint, None, error)
+
+
+def get_client_config() -> Dict:
+    """Current connection settings, for diagnostics."""
+    return {
+        'host': OLLAMA_HOST,
+        'hosts': OLLAMA_HOSTS,
+        'model': OLLAMA_MODEL,
+        'pool_connections': OLLAMA_POOL_CONNECTIONS,
+        'pool_maxsize': OLLAMA_POOL_MAXSIZE,
+        'connect_timeout': OLLAMA_CONNECT_TIMEOUT,
+        'read_timeout': OLLAMA_READ_TIMEOUT,
+        'availability_ttl': OLLAMA_AVAILABILITY_TTL,
+        'hedge': OLLAMA_HEDGE_ENABLED
+    }
+
+
+def get_pool_stats() -> Dict:
+    """Per-endpoint load, error and latency statistics plus hedging counts."""
+    return get_endpoint_pool().stats()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Ollama Health - shared health state and circuit breaker for Ollama polishing.
+A background probe and the outcome of real polish calls feed one circuit
+breaker per process. After repeated failures the circuit opens and polishing
+is skipped immediately instead of every question waiting for a timeout;
+a successful probe or trial call closes it again.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from ollama_client import REQUESTS_AVAILABLE, check_ollama_available
+
+# Configuration (override with environment variables)
+OLLAMA_FAILURE_THRESHOLD = int(os.environ.get("OLLAMA_FAILURE_THRESHOLD", "3"))  # Consecutive failures that open the circuit
+OLLAMA_RECOVERY_TIMEOUT = float(os.environ.get("OLLAMA_RECOVERY_TIMEOUT", "30"))  # Seconds before a trial call is let through
+OLLAMA_HEALTH_INTERVAL = float(os.environ.get("OLLAMA_HEALTH_INTERVAL", "15"))  # Seconds between background probes
+OLLAMA_HEALTH_PROBE = os.environ.get("OLLAMA_HEALTH_PROBE", "1").lower() not in ("0", "false", "no")
+OLLAMA_SLOW_CALL_SECONDS = float(os.environ.get("OLLAMA_SLOW_CALL_SECONDS", "60"))  # Unchanged results slower than this count as failures
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Classic three-state circuit breaker.
+
+    closed: calls go through; failure_threshold consecutive failures open the circuit.
+    open: calls are rejected until recovery_timeout has passed.
+    half_open: one trial call is let through; success closes, failure re-opens.
+    """
+
+    def __init__(self, failure_threshold: int = OLLAMA_FAILURE_THRESHOLD,
+                 recovery_timeout: float = OLLAMA_RECOVERY_TIMEOUT):
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.skipped = 0
+        self.successes = 0
+        self.failures = 0
+        self.times_opened = 0
+        self.last_error: Optional[str] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Whether a call may go through now. Rejected calls are counted as skipped."""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.skipped += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self.state = CLOSED
+            self._trial_in_flight = False
+
+    def record_failure(self, error: Optional[str] = None) -> None:
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            if error:
+                self.last_error = error
+            if self.state == HALF_OPEN or (self.state == CLOSED and
+                                           self.consecutive_failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+            self._trial_in_flight = False
+
+    def record_inconclusive(self) -> None:
+        """A call finished without showing whether the server is healthy; free the half-open trial slot."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            retry_in = 0.0
+            if self.state == OPEN:
+                retry_in = max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at))
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'recovery_timeout': self.recovery_timeout,
+                'retry_in': retry_in,
+                'skipped': self.skipped,
+                'successes': self.successes,
+                'failures': self.failures,
+                'times_opened': self.times_opened,
+                'last_error': self.last_error
+            }
+
+
+class OllamaHealthMonitor:
+    """Circuit breaker plus an optional background availability probe."""
+
+    def __init__(self, breaker: Optional[CircuitBreaker] = None,
+                 probe_interval: float = OLLAMA_HEALTH_INTERVAL,
+                 probe_enabled: bool = OLLAMA_HEALTH_PROBE and REQUESTS_AVAILABLE):
+        self.breaker = breaker or CircuitBreaker()
+        self.probe_interval = probe_interval
+        self.probe_enabled = probe_enabled
+        self.last_probe_at: Optional[float] = None
+        self.last_probe_ok: Optional[bool] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start the background probe thread (once per process)."""
+        if not self.probe_enabled or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="ollama-health", daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def probe(self) -> bool:
+        """Check the server once and feed the result into the breaker."""
+        available = check_ollama_available(force=True)
+        self.last_probe_at = time.time()
+        self.last_probe_ok = available
+        if available:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure("Availability probe failed")
+        return available
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.probe()
+            except Exception as e:
+                self.breaker.record_failure(f"Availability probe error: {e}")
+            self._stop.wait(self.probe_interval)
+
+    def status(self) -> Dict:
+        status = self.breaker.to_dict()
+        status.update({
+            'probe_enabled': self.probe_enabled,
+            'probe_interval': self.probe_interval,
+            'last_probe_at': self.last_probe_at,
+            'last_probe_ok': self.last_probe_ok
+        })
+        return status
+
+
+_monitor: Optional[OllamaHealthMonitor] = None
+_monitor_lock = threading.Lock()
+
+
+def get_health_monitor() -> OllamaHealthMonitor:
+    """Get the process-wide health monitor, starting its probe thread on first use."""
+    global _monitor
+    if _monitor is None:
+        with _monitor_lock:
+            if _monitor is None:
+                _monitor = OllamaHealthMonitor()
+    # Cheap when already running; restarts the probe in a forked child
+    _monitor.start()
+    return _monitor
+
+
+def allow_polish() -> bool:
+    """Whether polishing should be attempted now (False while the circuit is open)."""
+    return get_health_monitor().breaker.allow_request()
+
+
+def record_polish_success() -> None:
+    get_health_monitor().breaker.record_success()
+
+
+def record_polish_failure(error: Optional[str] = None) -> None:
+    get_health_monitor().breaker.record_failure(error)
+
+
+def record_polish_result(changed: bool, elapsed: float) -> None:
+    """
+    Feed the outcome of a polish call that did not raise into the breaker.
+
+    Args:
+        changed: Whether the polisher returned a different text
+        elapsed: Duration of the call in seconds
+    """
+    breaker = get_health_monitor().breaker
+    if changed:
+        breaker.record_success()
+    elif elapsed >= OLLAMA_SLOW_CALL_SECONDS:
+        # The polisher falls back to the original text after its own timeout
+        breaker.record_failure(f"Polish returned original text after {elapsed:.1f}s")
+    else:
+        breaker.record_inconclusive()
+
+
+def get_ollama_health() -> Dict:
+    """Circuit state, skip counts and probe status for this process."""
+    return get_health_monitor().status()
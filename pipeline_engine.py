@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+Pipeline Engine - the one implementation of the question improvement pipeline.
+Runs preprocess -> score -> match/transform -> template score -> polish ->
+rescore as explicit stages over a single question or a batch, with pluggable
+metric caches and polish executors. The web app, the demo examples and the
+bulk runners all build on it, so an optimization in one stage applies
+everywhere.
+"""
+
+import os
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from async_polisher import POLISH_CONCURRENCY, POLISH_TIMEOUT, polish_questions_concurrently
+from batch_polisher import POLISH_BATCH_SIZE, polish_questions_batched
+from instrumentation import stage_timer
+from polish_scheduler import enhanced_score
+from reporter import get_reporter
+
+# Polishing policies
+POLISH_NONE = "none"    # Stop after the template stages
+POLISH_AUTO = "auto"    # Polish unmatched or low-scoring questions (gated at the threshold)
+POLISH_FORCE = "force"  # Polish every question once, skipping the threshold gate
+POLISH_MODES = (POLISH_NONE, POLISH_AUTO, POLISH_FORCE)
+
+# Questions prepared before their polishing stage runs together (see run_iter)
+PIPELINE_BATCH_SIZE = int(os.environ.get("PIPELINE_BATCH_SIZE", "64"))
+
+# Stages that only need the CPU, run in order by prepare()
+CPU_STAGES = ("preprocess", "score", "match", "template_score", "decide")
+
+PolishExecutor = Callable[[List[Dict]], List[Optional[Dict]]]
+PolishStreamer = Callable[[Dict], Iterable[str]]
+
+
+def _tester():
+    # Imported lazily: simple_question_tester imports this module
+    import simple_question_tester
+    return simple_question_tester
+
+
+def sequential_polish_executor(requests: List[Dict], deadline: Optional[float] = None) -> List[Optional[Dict]]:
+    """
+    Polish requests one at a time with polish_low_scoring_questions.
+
+    Args:
+        requests: Polish requests
+        deadline: time.perf_counter() value after which no further request is started (None = no limit)
+
+    Returns:
+        One outcome per request; None for requests not started before the deadline
+    """
+    tester = _tester()
+    outcomes: List[Optional[Dict]] = []
+    for request in requests:
+        if deadline is not None and time.perf_counter() >= deadline:
+            outcomes.append(None)
+            continue
+        outcomes.append({'polished_text': tester.polish_low_scoring_questions(
+            request['question_text'],
+            request['template_metrics'],
+            request['question_type'],
+            request['error_traceback'],
+            force=request.get('force', False)
+        )})
+    return outcomes
+
+
+def stream_polish_request(request: Dict) -> Iterator[str]:
+    """Stream the polished text for one request with stream_polish_low_scoring_question."""
+    return _tester().stream_polish_low_scoring_question(
+        request['question_text'],
+        request['template_metrics'],
+        request['question_type'],
+        request['error_traceback'],
+        force=request.get('force', False)
+    )
+
+
+def concurrent_polish_executor(concurrency: int = POLISH_CONCURRENCY,
+                               timeout: Optional[float] = POLISH_TIMEOUT) -> PolishExecutor:
+    """Executor that polishes a batch with async_polisher."""
+    def execute(requests: List[Dict]) -> List[Optional[Dict]]:
+        return polish_questions_concurrently(requests, concurrency=concurrency, timeout=timeout)
+    return execute
+
+
+def batched_polish_executor(batch_size: int = POLISH_BATCH_SIZE, concurrency: int = POLISH_CONCURRENCY,
+                            timeout: Optional[float] = POLISH_TIMEOUT) -> PolishExecutor:
+    """Executor that packs short questions into multi-question prompts with batch_polisher."""
+    def execute(requests: List[Dict]) -> List[Optional[Dict]]:
+        return polish_questions_batched(requests, batch_size=batch_size,
+                                        concurrency=max(1, concurrency), timeout=timeout)
+    return execute
+
+
+def make_polish_executor(concurrency: int = 1, batch_size: int = 1,
+                         timeout: Optional[float] = POLISH_TIMEOUT,
+                         deadline: Optional[float] = None) -> PolishExecutor:
+    """
+    Pick the sequential, concurrent or batched executor for the given settings.
+
+    The concurrent and batched executors bound each request with timeout; the
+    sequential one cannot interrupt a call, so it stops starting new requests
+    at deadline (a time.perf_counter() value) instead.
+    """
+    if batch_size > 1:
+        return batched_polish_executor(batch_size, concurrency, timeout)
+    if concurrency > 1:
+        return concurrent_polish_executor(concurrency, timeout)
+    if deadline is not None:
+        return lambda requests: sequential_polish_executor(requests, deadline)
+    return sequential_polish_executor
+
+
+class PipelineEngine:
+    """
+    Stage-based question improvement pipeline.
+
+    A question moves through the engine as a state dictionary. prepare()
+    runs the CPU stages; polish_states() hands every question that needs
+    polishing in a batch to the polish executor at once; finish() re-scores
+    polished text and computes improvements. Stages never print: entry
+    points observe questions through the on_prepared/on_finished hooks.
+    """
+
+    def __init__(self, polish: str = POLISH_AUTO, polish_executor: Optional[PolishExecutor] = None,
+                 metrics_fn: Optional[Callable[[str], Dict[str, float]]] = None,
+                 template_metrics_fn: Optional[Callable[[Dict, str], Dict[str, float]]] = None,
+                 prefetch_fn: Optional[Callable[[Iterable[str]], int]] = None,
+                 preprocess_fn: Optional[Callable[[str, str], Dict]] = None,
+                 polish_threshold: float = 9.0,
+                 on_prepared: Optional[Callable[[Dict], None]] = None,
+                 on_finished: Optional[Callable[[Dict], None]] = None):
+        """
+        Args:
+            polish: One of POLISH_MODES
+            polish_executor: Polishes a list of requests (polish_questions_concurrently format) and
+                returns one outcome per request with 'polished_text', or None if it was deferred
+                (default: sequential_polish_executor)
+            metrics_fn: Scores a text (default: calculate_metrics_for_text, backed by the metrics cache)
+            template_metrics_fn: Scores a template output (default: get_template_metrics)
+            prefetch_fn: Bulk-loads cached metrics for a batch of texts (default: prefetch_metrics)
+            preprocess_fn: Preprocesses (text, error_traceback) (default: preprocess_question)
+            polish_threshold: Enhanced score below which questions are polished
+            on_prepared: Called with each state after the CPU stages
+            on_finished: Called with each state once it is complete
+        """
+        if polish not in POLISH_MODES:
+            raise ValueError(f"Unknown polish mode: {polish}")
+        tester = _tester()
+        self.polish = polish
+        self.polish_executor = polish_executor or sequential_polish_executor
+        self.metrics_fn = metrics_fn or tester.calculate_metrics_for_text
+        self.template_metrics_fn = template_metrics_fn or tester.get_template_metrics
+        self.prefetch_fn = prefetch_fn if prefetch_fn is not None else tester.prefetch_metrics
+        self.preprocess_fn = preprocess_fn or tester.preprocess_question
+        self.polish_threshold = polish_threshold
+        self.on_prepared = on_prepared
+        self.on_finished = on_finished
+
+    # ------------------------------------------------------------------
+    # State
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def new_state(question_text: str, question_type: str = "", error_traceback: str = "",
+                  question_data: Optional[Dict] = None) -> Dict:
+        """Create the state dictionary for one question."""
+        return {
+            'question_data': question_data if question_data is not None else {},
+            'input_text': question_text,
+            'question_type': question_type or "",
+            'input_error_traceback': error_traceback or "",
+            'polish_deferred': False
+        }
+
+    @classmethod
+    def state_from_question(cls, question_data: Dict) -> Dict:
+        """Create a state from a get_random_questions_from_csv style dictionary."""
+        question_text = question_data.get('combined_text', question_data.get('text', ''))
+        return cls.new_state(question_text, question_data.get('type', ''),
+                             question_data.get('error_traceback', ''), question_data)
+
+    # ------------------------------------------------------------------
+    # CPU stages
+    # ------------------------------------------------------------------
+
+    def stage_preprocess(self, state: Dict) -> None:
+        """Split out boilerplate and cap the traceback before matching (the text is capped only in prompts)."""
+        preprocessing = self.preprocess_fn(state['input_text'], state['input_error_traceback'])
+        state['question_text'] = preprocessing.pop('text')
+        state['error_traceback'] = preprocessing.pop('error_traceback')
+        state['preprocessing'] = preprocessing
+
+    def stage_score(self, state: Dict) -> None:
+        """Score the untouched input, so improvements do not depend on the preprocessing settings."""
+        state['original_metrics'] = self.metrics_fn(state['input_text'])
+        state['original_enhanced_score'] = enhanced_score(state['original_metrics'])
+
+    def stage_match(self, state: Dict) -> None:
+        """Match the question against its type's templates and transform it."""
+        tester = _tester()
+        state['has_templates'] = state['question_type'] in tester.PROMPT_TEMPLATES
+        state['template'] = None
+        state['regex_groups'] = None
+        state['template_matched'] = False
+        state['template_improved_text'] = state['question_text']
+        if not state['has_templates']:
+            return
+        with stage_timer("regex_match", state['question_type']):
+            template, match_obj = tester.match_question_to_template_simple(
+                state['question_text'], tester.PROMPT_TEMPLATES[state['question_type']]
+            )
+        if template and match_obj:
+            state['template'] = template
+            state['regex_groups'] = match_obj.groups()
+            state['template_matched'] = True
+            with stage_timer("transform", state['question_type']):
+                state['template_improved_text'] = tester.transform_question_with_template_simple(
+                    state['question_text'], template, match_obj
+                )
+
+    def stage_template_score(self, state: Dict) -> None:
+        """Score the template output (unmatched, unpreprocessed text is unchanged, so reuse the original scores)."""
+        if state['template_matched']:
+            state['template_metrics'] = self.template_metrics_fn(state['template'], state['template_improved_text'])
+        elif state['question_text'] != state['input_text']:
+            # Boilerplate was split out, so the text carried forward differs from the input
+            state['template_metrics'] = self.metrics_fn(state['question_text'])
+        else:
+            state['template_metrics'] = state['original_metrics']
+        state['template_enhanced_score'] = enhanced_score(state['template_metrics'])
+        state['template_improvement'] = state['template_enhanced_score'] - state['original_enhanced_score']
+
+    def stage_decide(self, state: Dict) -> None:
+        """Decide whether the question goes to the polishing stage."""
+        if self.polish == POLISH_NONE:
+            state['needs_polish'] = False
+        elif self.polish == POLISH_FORCE:
+            state['needs_polish'] = True
+        else:
+            state['needs_polish'] = (not state['template_matched'] or
+                                     state['template_enhanced_score'] < self.polish_threshold)
+
+    def prepare(self, state: Dict, skip: Iterable[str] = ()) -> Dict:
+        """Run the CPU stages on one state, except those named in skip."""
+        for stage in CPU_STAGES:
+            if stage not in skip:
+                with stage_timer(stage, state['question_type']):
+                    getattr(self, f"stage_{stage}")(state)
+        if self.on_prepared:
+            self.on_prepared(state)
+        return state
+
+    # ------------------------------------------------------------------
+    # Polishing and re-scoring
+    # ------------------------------------------------------------------
+
+    def polish_request(self, state: Dict) -> Dict:
+        """Polish request for a prepared state (polish_questions_concurrently format)."""
+        return {
+            'question_text': state['template_improved_text'],
+            'template_metrics': state['template_metrics'],
+            'question_type': state['question_type'] or "Unknown",
+            'error_traceback': state['error_traceback'],
+            'force': self.polish == POLISH_FORCE,
+            'question_id': state['question_data'].get('id')
+        }
+
+    def polish_states(self, states: List[Dict]) -> None:
+        """Run the polishing stage for every prepared state that needs it, as one executor call."""
+        for state in states:
+            state['polished_text'] = state['template_improved_text']
+        pending = [state for state in states if state['needs_polish']]
+        if not pending:
+            return
+        try:
+            with stage_timer("polish"):
+                outcomes = self.polish_executor([self.polish_request(state) for state in pending])
+        except Exception as e:
+            # If polishing fails, keep the template results
+            get_reporter().error(f"   ❌ Ollama polishing failed: {e}")
+            return
+        for state, outcome in zip(pending, outcomes):
+            if outcome is None:
+                state['polish_deferred'] = True
+            elif outcome.get('polished_text'):
+                state['polished_text'] = outcome['polished_text']
+
+    def stage_rescore(self, state: Dict) -> None:
+        """Score polished text and compute the final improvements."""
+        polished_text = state.get('polished_text', state['template_improved_text'])
+        state['ollama_used'] = polished_text != state['template_improved_text']
+        state['ollama_improved_text'] = polished_text
+        if state['ollama_used']:
+            state['final_metrics'] = self.metrics_fn(polished_text)
+        else:
+            state['final_metrics'] = state['template_metrics']
+        state['final_enhanced_score'] = enhanced_score(state['final_metrics'])
+        state['final_improvement'] = state['final_enhanced_score'] - state['original_enhanced_score']
+        state['ollama_additional_improvement'] = (
+            state['final_enhanced_score'] - state['template_enhanced_score'] if state['ollama_used'] else 0.0
+        )
+
+    def finish(self, state: Dict) -> Dict:
+        """Run the re-scoring stage on one polished state."""
+        with stage_timer("rescore", state['question_type']):
+            self.stage_rescore(state)
+        if self.on_finished:
+            self.on_finished(state)
+        return state
+
+    # ------------------------------------------------------------------
+    # Entry points
+    # ------------------------------------------------------------------
+
+    def process(self, states: List[Dict]) -> List[Dict]:
+        """Run every stage over a batch of states."""
+        for state in states:
+            with stage_timer("preprocess", state['question_type']):
+                self.stage_preprocess(state)
+        if self.prefetch_fn and len(states) > 1:
+            # Bulk-load cached metrics for the batch before scoring it
+            with stage_timer("prefetch"):
+                self.prefetch_fn([state['question_text'] for state in states])
+        for state in states:
+            self.prepare(state, skip=("preprocess",))
+        self.polish_states(states)
+        return [self.finish(state) for state in states]
+
+    def run_one(self, question_text: str, question_type: str = "", error_traceback: str = "",
+                question_data: Optional[Dict] = None) -> Dict:
+        """Run the pipeline for a single question and return its final state."""
+        return self.process([self.new_state(question_text, question_type, error_traceback, question_data)])[0]
+
+    def run_iter(self, questions: Iterable[Dict], batch_size: int = PIPELINE_BATCH_SIZE) -> Iterator[Dict]:
+        """
+        Run the pipeline over questions in batches, yielding final states in input order.
+
+        Args:
+            questions: get_random_questions_from_csv style dictionaries, or states from new_state
+            batch_size: Questions prepared before their polishing stage runs together
+        """
+        batch: List[Dict] = []
+        for question in questions:
+            batch.append(question if 'input_text' in question else self.state_from_question(question))
+            if len(batch) >= max(1, batch_size):
+                yield from self.process(batch)
+                batch = []
+        if batch:
+            yield from self.process(batch)
+
+    def run_batch(self, questions: Iterable[Dict]) -> List[Dict]:
+        """Run the pipeline over all questions as a single batch."""
+        return self.process([q if 'input_text' in q else self.state_from_question(q) for q in questions])
+
+    def run_stream(self, question_text: str, question_type: str = "", error_traceback: str = "",
+                   polish_streamer: Optional[PolishStreamer] = None) -> Iterator[Tuple[str, object]]:
+        """
+        Run the pipeline for one question, streaming the polishing stage.
+
+        Args:
+            question_text: Question text
+            question_type: Question type (optional)
+            error_traceback: Error traceback (optional)
+            polish_streamer: Yields polished text chunks for a polish request (default: stream_polish_request)
+
+        Yields:
+            ('template', state) once the template stages are done (final fields describe the
+            template result), then ('token', chunk) per generated chunk, then ('finished', state)
+        """
+        state = self.prepare(self.new_state(question_text, question_type, error_traceback))
+        state['polished_text'] = state['template_improved_text']
+        self.stage_rescore(state)
+        yield 'template', state
+
+        if state['needs_polish']:
+            chunks = []
+            with stage_timer("polish"):
+                for chunk in (polish_streamer or stream_polish_request)(self.polish_request(state)):
+                    chunks.append(chunk)
+                    yield 'token', chunk
+            polished_text = _tester().clean_polished_text("".join(chunks))
+            if polished_text:
+                state['polished_text'] = polished_text
+        yield 'finished', self.finish(state)
+
+
+def build_pipeline_results(state: Dict) -> Dict:
+    """
+    Web app / demo view of a final state.
+
+    Args:
+        state: State returned by PipelineEngine
+
+    Returns:
+        Dictionary with the original, template and final texts, metrics and improvements
+    """
+    return {
+        'original_text': state['input_text'],
+        'processed_text': state['question_text'],
+        'original_metrics': state['original_metrics'],
+        'original_enhanced_score': state['original_enhanced_score'],
+        'template_matched': state['template_matched'],
+        'template_improved_text': state['template_improved_text'],
+        'template_metrics': state['template_metrics'],
+        'template_enhanced_score': state['template_enhanced_score'],
+        'ollama_used': state['ollama_used'],
+        'ollama_improved_text': state['ollama_improved_text'],
+        'final_metrics': state['final_metrics'],
+        'final_enhanced_score': state['final_enhanced_score'],
+        'template_improvement': state['template_improvement'],
+        'final_improvement': state['final_improvement'],
+        'ollama_additional_improvement': state['ollama_additional_improvement'],
+        'preprocessing': state['preprocessing']
+    }
+
+
+def iter_improved_questions(source: Union[str, Iterable[Union[str, Dict]]], polish: str = POLISH_AUTO,
+                            lookahead: int = 1, polish_executor: Optional[PolishExecutor] = None,
+                            engine: Optional[PipelineEngine] = None) -> Iterator[Dict]:
+    """
+    Improve questions lazily, yielding each result as soon as it is finished.
+
+    Rows are pulled from the source only when the consumer asks for the next
+    result, so a slow consumer is never outrun: at most lookahead questions
+    are read and processed ahead of it.
+
+    Args:
+        source: CSV file path, or an iterable of question dictionaries
+            (get_random_questions_from_csv format) or plain question texts
+        polish: One of POLISH_MODES
+        lookahead: Questions processed together before their results are yielded; values
+            above 1 let a concurrent or batched polish_executor work on several at once
+        polish_executor: Polish executor for the engine (see PipelineEngine)
+        engine: Engine to run instead of a new one (polish and polish_executor are then ignored)
+
+    Yields:
+        The question dictionary merged with build_pipeline_results() and 'polish_deferred'
+    """
+    if isinstance(source, str):
+        source = _tester().iter_questions_from_csv(source)
+    engine = engine or PipelineEngine(polish=polish, polish_executor=polish_executor)
+
+    def states() -> Iterator[Dict]:
+        for question in source:
+            if isinstance(question, str):
+                yield PipelineEngine.new_state(question)
+            else:
+                yield PipelineEngine.state_from_question(question)
+
+    for state in engine.run_iter(states(), batch_size=max(1, lookahead)):
+        yield {
+            **state['question_data'],
+            **build_pipeline_results(state),
+            'polish_deferred': state['polish_deferred']
+        }
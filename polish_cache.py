@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Polish Cache - persistent cache of Ollama polishing results.
+Entries are keyed by the normalized input text, question type, model name
+and prompt-template version, so repeated template outputs and boilerplate
+are only sent to the LLM once.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from typing import Dict, Optional
+
+from disk_cache import DiskCache
+from ollama_client import OLLAMA_MODEL as DEFAULT_OLLAMA_MODEL
+
+# Configuration (override with environment variables)
+POLISH_CACHE_PATH = os.environ.get("POLISH_CACHE_PATH", ".cache/polish_cache.sqlite3")
+POLISH_CACHE_ENABLED = os.environ.get("POLISH_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+POLISH_CACHE_TTL = float(os.environ.get("POLISH_CACHE_TTL", str(30 * 24 * 3600)))  # Seconds (default: 30 days)
+POLISH_CACHE_MAX_ENTRIES = int(os.environ.get("POLISH_CACHE_MAX_ENTRIES", "200000"))
+
+
+def _polisher_setting(env_name: str, attributes, default: str) -> str:
+    """Read a setting from the environment, then from local_polisher if it defines one."""
+    value = os.environ.get(env_name)
+    if value:
+        return value
+    try:
+        import local_polisher
+    except ImportError:
+        return default
+    for attribute in attributes:
+        value = getattr(local_polisher, attribute, None)
+        if value:
+            return str(value)
+    return default
+
+
+# Model and prompt version are part of every key, so changing either invalidates old results.
+# Callers pass the model their backend actually sends: ollama_client's (the default) or local_polisher's.
+OLLAMA_MODEL = DEFAULT_OLLAMA_MODEL
+LOCAL_POLISHER_MODEL = _polisher_setting("OLLAMA_MODEL", ("DEFAULT_MODEL", "MODEL_NAME", "MODEL"), DEFAULT_OLLAMA_MODEL)
+POLISH_PROMPT_VERSION = _polisher_setting("POLISH_PROMPT_VERSION", ("PROMPT_VERSION",), "1")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_cache: Optional[DiskCache] = None
+_cache_lock = threading.Lock()
+
+
+def normalize_polish_text(text: str) -> str:
+    """Collapse whitespace so trivially different copies of a text share a cache entry."""
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def polish_key(text: str, question_type: str = "", model: Optional[str] = None,
+               prompt_version: Optional[str] = None) -> str:
+    """
+    Cache key for a polish request.
+
+    Args:
+        text: Text sent for polishing
+        question_type: Question type
+        model: Model the polishing backend sends (default: OLLAMA_MODEL, ollama_client's model)
+        prompt_version: Prompt template version (default: POLISH_PROMPT_VERSION)
+    """
+    parts = [
+        model or OLLAMA_MODEL,
+        prompt_version or POLISH_PROMPT_VERSION,
+        question_type or "",
+        normalize_polish_text(text)
+    ]
+    return hashlib.sha256("\0".join(parts).encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def get_polish_cache() -> Optional[DiskCache]:
+    """Get the process-wide polish cache, opening it on first use. None if disabled or unavailable."""
+    global _cache, POLISH_CACHE_ENABLED
+    if not POLISH_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = DiskCache(POLISH_CACHE_PATH, table="polish",
+                                       max_entries=POLISH_CACHE_MAX_ENTRIES,
+                                       ttl_seconds=POLISH_CACHE_TTL)
+                except Exception as e:
+                    print(f"⚠️  Polish cache disabled ({POLISH_CACHE_PATH}): {e}")
+                    POLISH_CACHE_ENABLED = False
+                    return None
+    return _cache
+
+
+def get_cached_polish(text: str, question_type: str = "", model: Optional[str] = None,
+                      prompt_version: Optional[str] = None) -> Optional[str]:
+    """
+    Look up a previous polishing result.
+
+    Returns:
+        The polished text, or None on a miss
+    """
+    cache = get_polish_cache()
+    if cache is None:
+        return None
+    try:
+        entry = cache.get(polish_key(text, question_type, model, prompt_version))
+    except Exception as e:
+        print(f"⚠️  Polish cache lookup failed: {e}")
+        return None
+    return entry['polished_text'] if entry else None
+
+
+def store_polish(text: str, polished_text: str, question_type: str = "", model: Optional[str] = None,
+                 prompt_version: Optional[str] = None) -> None:
+    """Store a polishing result."""
+    cache = get_polish_cache()
+    if cache is None:
+        return
+    try:
+        cache.set(polish_key(text, question_type, model, prompt_version), {
+            'polished_text': polished_text,
+            'question_type': question_type,
+            'model': model or OLLAMA_MODEL,
+            'prompt_version': prompt_version or POLISH_PROMPT_VERSION
+        })
+    except Exception as e:
+        print(f"⚠️  Polish cache write failed: {e}")
+
+
+def get_polish_cache_stats() -> Dict:
+    """Hit/miss counters, size and key settings of the polish cache."""
+    cache = get_polish_cache()
+    return {
+        'enabled': cache is not None,
+        'model': OLLAMA_MODEL,
+        'local_polisher_model': LOCAL_POLISHER_MODEL,
+        'prompt_version': POLISH_PROMPT_VERSION,
+        'disk': cache.stats() if cache is not None else None
+    }
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Polish Scheduler - spend a limited Ollama budget where it helps most.
+Orders polish candidates by expected gain (lowest template-enhanced score
+first, with a per-type quota so one noisy type cannot take the whole
+budget), polishes them in waves until a call or wall-clock budget runs out,
+and records which questions were deferred.
+"""
+
+import json
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+# Configuration (override with environment variables; empty = unlimited)
+POLISH_BUDGET_CALLS = int(os.environ["POLISH_BUDGET_CALLS"]) if os.environ.get("POLISH_BUDGET_CALLS") else None
+POLISH_BUDGET_SECONDS = float(os.environ["POLISH_BUDGET_SECONDS"]) if os.environ.get("POLISH_BUDGET_SECONDS") else None
+POLISH_PER_TYPE_QUOTA = int(os.environ["POLISH_PER_TYPE_QUOTA"]) if os.environ.get("POLISH_PER_TYPE_QUOTA") else None
+
+
+def enhanced_score(metrics: Dict[str, float]) -> float:
+    """Average of the four main metrics (same formula as should_polish_with_ollama)."""
+    return sum([
+        metrics.get('clarity', 0.0),
+        metrics.get('conciseness', 0.0),
+        metrics.get('technical_accuracy', 0.0),
+        metrics.get('actionability', 0.0)
+    ]) / 4
+
+
+class PolishScheduler:
+    """
+    Budgeted, prioritized polishing.
+
+    Candidates within their type's quota come first, lowest enhanced score
+    first; candidates over quota follow in the same order, so the quota only
+    limits a type while others still have candidates. Unforced requests
+    scoring at or above the threshold (e.g. unmatched questions that already
+    score well) are never polished, so they are left out before budgeting.
+    A budget is checked before each wave, and a wave never exceeds the
+    remaining call budget.
+    """
+
+    def __init__(self, max_calls: Optional[int] = POLISH_BUDGET_CALLS,
+                 max_seconds: Optional[float] = POLISH_BUDGET_SECONDS,
+                 per_type_quota: Optional[int] = POLISH_PER_TYPE_QUOTA,
+                 threshold: float = 9.0):
+        """
+        Args:
+            max_calls: Maximum number of questions sent for polishing (None = unlimited)
+            max_seconds: Wall-clock budget for the polishing stage in seconds (None = unlimited)
+            per_type_quota: Questions per type polished before other types get priority (None = no quota)
+            threshold: Enhanced score at or above which unforced requests are skipped
+                (same gate as should_polish_with_ollama)
+        """
+        self.max_calls = max_calls
+        self.max_seconds = max_seconds
+        self.per_type_quota = per_type_quota
+        self.threshold = threshold
+        self.skipped = 0
+        self.calls = 0
+        self.elapsed = 0.0
+        self.deferred: List[Dict] = []
+        self.stop_reason: Optional[str] = None
+        self._start: Optional[float] = None
+
+    def order(self, requests: List[Dict]) -> List[int]:
+        """
+        Priority order of the requests.
+
+        Args:
+            requests: Dictionaries with 'template_metrics' and 'question_type'
+
+        Returns:
+            Indices of the candidate requests (see is_candidate), highest expected gain first
+        """
+        by_score = sorted((i for i in range(len(requests)) if self.is_candidate(requests[i])),
+                          key=lambda i: enhanced_score(requests[i].get('template_metrics', {})))
+        if not self.per_type_quota:
+            return by_score
+        within_quota, over_quota = [], []
+        per_type: Dict[str, int] = {}
+        for i in by_score:
+            question_type = requests[i].get('question_type', "")
+            per_type[question_type] = per_type.get(question_type, 0) + 1
+            (within_quota if per_type[question_type] <= self.per_type_quota else over_quota).append(i)
+        return within_quota + over_quota
+
+    def is_candidate(self, request: Dict) -> bool:
+        """Whether polishing could change the request (forced, or scoring below the threshold)."""
+        return bool(request.get('force')) or enhanced_score(request.get('template_metrics', {})) < self.threshold
+
+    def remaining_seconds(self) -> Optional[float]:
+        if self.max_seconds is None or self._start is None:
+            return None
+        return max(0.0, self.max_seconds - (time.perf_counter() - self._start))
+
+    def _exhausted(self) -> Optional[str]:
+        if self.max_calls is not None and self.calls >= self.max_calls:
+            return "call budget"
+        remaining = self.remaining_seconds()
+        if remaining is not None and remaining <= 0:
+            return "time budget"
+        return None
+
+    def run(self, requests: List[Dict], polish_fn: Callable[[List[Dict], Optional[float]], List[Dict]],
+            wave_size: int = 1) -> List[Optional[Dict]]:
+        """
+        Polish requests in priority order until the budget runs out.
+
+        Args:
+            requests: Polish requests (polish_questions_concurrently format)
+            polish_fn: Polishes a wave of requests given the seconds left (None = unlimited)
+                and returns one outcome per request
+            wave_size: Requests handed to polish_fn at a time. polish_fn may return
+                None for requests it had no time to start; they are deferred
+
+        Returns:
+            One outcome per request in request order; None for deferred requests.
+            Requests that are not candidates keep their text without using the budget
+        """
+        self._start = time.perf_counter()
+        outcomes: List[Optional[Dict]] = [None] * len(requests)
+        order = self.order(requests)
+        for i, request in enumerate(requests):
+            if not self.is_candidate(request):
+                outcomes[i] = {'polished_text': request['question_text']}
+        self.skipped = len(requests) - len(order)
+        unstarted: List[int] = []
+        position = 0
+        while position < len(order):
+            self.stop_reason = self._exhausted()
+            if self.stop_reason:
+                break
+            size = max(1, wave_size)
+            if self.max_calls is not None:
+                size = min(size, self.max_calls - self.calls)
+            wave = order[position:position + size]
+            for i, outcome in zip(wave, polish_fn([requests[i] for i in wave], self.remaining_seconds())):
+                if outcome is None:
+                    unstarted.append(i)
+                else:
+                    outcomes[i] = outcome
+                    self.calls += 1
+            position += len(wave)
+            if unstarted:
+                self.stop_reason = "time budget"
+                break
+        self.elapsed = time.perf_counter() - self._start
+
+        self.deferred = [{
+            'index': i,
+            'question_type': requests[i].get('question_type', ""),
+            'enhanced_score': enhanced_score(requests[i].get('template_metrics', {})),
+            'question_text': requests[i]['question_text']
+        } for i in unstarted + order[position:]]
+        return outcomes
+
+    def summary(self) -> Dict:
+        """Calls made, time spent, why polishing stopped and how many questions were deferred."""
+        deferred_by_type: Dict[str, int] = {}
+        for item in self.deferred:
+            deferred_by_type[item['question_type']] = deferred_by_type.get(item['question_type'], 0) + 1
+        return {
+            'calls': self.calls,
+            'skipped': self.skipped,
+            'elapsed': self.elapsed,
+            'max_calls': self.max_calls,
+            'max_seconds': self.max_seconds,
+            'per_type_quota': self.per_type_quota,
+            'stop_reason': self.stop_reason,
+            'deferred': len(self.deferred),
+            'deferred_by_type': deferred_by_type
+        }
+
+    def save_deferred(self, path: str, extra_fields: Optional[List[Dict]] = None) -> None:
+        """
+        Write the deferred questions to a JSON file so a later run can pick them up.
+
+        Args:
+            path: Output file
+            extra_fields: Optional per-deferred-question dictionaries merged into each entry (e.g. ids)
+        """
+        entries = [dict(item, **(extra_fields[n] if extra_fields else {})) for n, item in enumerate(self.deferred)]
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'summary': self.summary(), 'deferred': entries}, f, indent=2, default=str)
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Profiling - built-in profiling mode for the scripts and the web app.
+Runs a workload under cProfile (deterministic) and/or a stack sampler and
+writes a .pstats file plus a .collapsed file of folded stacks, one line per
+unique stack with its sample count. Every sampled stack is prefixed with
+the pipeline stages (see instrumentation.stage_timer) the thread was inside,
+so flamegraph.pl / speedscope group hot spots in metrics3 and the template
+matcher under the stage that called them.
+"""
+
+import argparse
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from instrumentation import get_instrumentation
+
+# Configuration (override with environment variables)
+PROFILE_OUTPUT_DIR = os.environ.get("PROFILE_OUTPUT_DIR", "profiles")
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get("PROFILE_SAMPLE_INTERVAL", "0.005"))  # Seconds between stack samples
+PROFILE_MAX_DEPTH = int(os.environ.get("PROFILE_MAX_DEPTH", "128"))  # Innermost frames kept per sampled stack
+PROFILE_TOP_FUNCTIONS = int(os.environ.get("PROFILE_TOP_FUNCTIONS", "15"))
+
+# Profiling modes
+PROFILE_CPROFILE = "cprofile"  # cProfile on the profiled thread plus the stage-grouped sampler
+PROFILE_SAMPLE = "sample"      # Sampler only: low overhead, covers every thread, no .pstats
+PROFILE_MODES = (PROFILE_CPROFILE, PROFILE_SAMPLE)
+
+NO_STAGE = "(no stage)"
+
+# Profilers currently running and the instrumentation settings to restore when the last one stops
+_active_profilers = 0
+_saved_instrumentation_state = (False, True)
+_profilers_lock = threading.Lock()
+
+
+def _begin_stage_tracking() -> None:
+    global _active_profilers, _saved_instrumentation_state
+    instrumentation = get_instrumentation()
+    with _profilers_lock:
+        if _active_profilers == 0:
+            _saved_instrumentation_state = (instrumentation.track_active, instrumentation.enabled)
+            instrumentation.active_stages.clear()
+            instrumentation.track_active = True
+            instrumentation.enabled = True
+        _active_profilers += 1
+
+
+def _end_stage_tracking() -> None:
+    global _active_profilers
+    instrumentation = get_instrumentation()
+    with _profilers_lock:
+        _active_profilers -= 1
+        if _active_profilers == 0:
+            instrumentation.track_active, instrumentation.enabled = _saved_instrumentation_state
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{code.co_name}"
+
+
+class StackSampler:
+    """Background thread that periodically folds the stacks of running threads by stage."""
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL, thread_ids: Optional[Iterable[int]] = None,
+                 max_depth: int = PROFILE_MAX_DEPTH):
+        """
+        Args:
+            interval: Seconds between samples
+            thread_ids: Only sample these threads (None = every thread inside a stage, plus the main thread)
+            max_depth: Innermost frames kept per stack
+        """
+        self.interval = interval
+        self.thread_ids = set(thread_ids) if thread_ids is not None else None
+        self.max_depth = max_depth
+        self.samples = 0
+        self.stacks: Dict[Tuple[str, ...], int] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "StackSampler":
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        instrumentation = get_instrumentation()
+        own_id = threading.get_ident()
+        main_id = threading.main_thread().ident
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if self.thread_ids is not None and thread_id not in self.thread_ids:
+                    continue
+                stage_path = instrumentation.active_stage_path(thread_id)
+                if not stage_path and self.thread_ids is None and thread_id != main_id:
+                    # Idle pool and stage workers would otherwise drown the real work
+                    continue
+                frames = []
+                while frame is not None and len(frames) < self.max_depth:
+                    frames.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack = (stage_path or (NO_STAGE,)) + tuple(reversed(frames))
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+                self.samples += 1
+
+    def stage_samples(self) -> Dict[str, int]:
+        """Samples per outermost stage, most sampled first."""
+        totals: Dict[str, int] = {}
+        for stack, count in self.stacks.items():
+            totals[stack[0]] = totals.get(stack[0], 0) + count
+        return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+    def write_collapsed(self, path: str) -> None:
+        """Write folded stacks ("stage;frame;frame count"), the input format of flamegraph.pl and speedscope."""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.stacks.items(), key=lambda item: -item[1]):
+                f.write(";".join(stack) + f" {count}\n")
+
+
+class Profiler:
+    """
+    Profile a block of code: `with Profiler("analyze"): ...`.
+
+    cProfile only sees the thread that starts the profiler; the sampler
+    sees every thread, so use PROFILE_SAMPLE for staged or concurrent runs.
+    Stage tracking is switched on for the profiled window (instrumentation
+    is enabled for its duration if it was off).
+    """
+
+    def __init__(self, name: str = "profile", mode: str = PROFILE_CPROFILE, output_dir: str = PROFILE_OUTPUT_DIR,
+                 interval: float = PROFILE_SAMPLE_INTERVAL, current_thread_only: bool = False):
+        """
+        Args:
+            name: Base name of the output files
+            mode: One of PROFILE_MODES
+            output_dir: Directory for the .pstats and .collapsed files
+            interval: Seconds between stack samples
+            current_thread_only: Only sample the thread that starts the profiler (e.g. one web request)
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {mode!r}, expected one of {PROFILE_MODES}")
+        self.name = name
+        self.mode = mode
+        self.output_dir = output_dir
+        self.interval = interval
+        self.current_thread_only = current_thread_only
+        self.paths: Dict[str, str] = {}
+        self.elapsed = 0.0
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+        self._start = 0.0
+
+    def start(self) -> "Profiler":
+        _begin_stage_tracking()
+        thread_ids = [threading.get_ident()] if self.current_thread_only else None
+        self._sampler = StackSampler(self.interval, thread_ids).start()
+        if self.mode == PROFILE_CPROFILE:
+            self._profile = cProfile.Profile()
+            try:
+                self._profile.enable()
+            except ValueError:
+                # Another profiler is already active (e.g. a concurrent profiled request)
+                self._profile = None
+        self._start = time.perf_counter()
+        return self
+
+    def stop(self) -> Dict[str, str]:
+        """
+        Stop profiling and write the output files.
+
+        Returns:
+            Dictionary of output kind ('pstats', 'collapsed') to file path
+        """
+        self.elapsed = time.perf_counter() - self._start
+        if self._profile is not None:
+            self._profile.disable()
+        self._sampler.stop()
+        _end_stage_tracking()
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, self.name)
+        if self._profile is not None:
+            self.paths['pstats'] = base + ".pstats"
+            self._profile.dump_stats(self.paths['pstats'])
+        self.paths['collapsed'] = base + ".collapsed"
+        self._sampler.write_collapsed(self.paths['collapsed'])
+        return self.paths
+
+    def __enter__(self) -> "Profiler":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def summary(self) -> Dict:
+        """Elapsed time, output paths and sample counts per stage."""
+        return {
+            'name': self.name,
+            'mode': self.mode,
+            'elapsed': self.elapsed,
+            'paths': dict(self.paths),
+            'samples': self._sampler.samples if self._sampler else 0,
+            'stage_samples': self._sampler.stage_samples() if self._sampler else {}
+        }
+
+
+def print_profile_summary(profiler: Profiler, top: int = PROFILE_TOP_FUNCTIONS) -> None:
+    """Print where a profiled run spent its time: samples per stage and the top cumulative functions."""
+    # Imported here so profiling stays usable before the reporter is configured
+    from reporter import get_reporter, NORMAL
+    report = get_reporter()
+    summary = profiler.summary()
+
+    report.info(f"\n🔬 PROFILE ({summary['mode']}, {summary['elapsed']:.1f}s, {summary['samples']:,} samples)")
+    for stage, count in summary['stage_samples'].items():
+        report.info(f"   {stage:<28} {count / summary['samples']:6.1%}")
+    for kind, path in summary['paths'].items():
+        report.info(f"   📄 {kind}: {path}")
+
+    if 'pstats' in summary['paths'] and report.enabled(NORMAL):
+        report.info(f"\n   Top {top} functions by cumulative time:")
+        stats = pstats.Stats(summary['paths']['pstats'], stream=report.stream or sys.stdout)
+        stats.sort_stats("cumulative").print_stats(top)
+
+
+def add_profile_argument(parser: argparse.ArgumentParser, default=None) -> None:
+    """Add `--profile [MODE]` to a script's argument parser (pass default=argparse.SUPPRESS for parent parsers)."""
+    parser.add_argument("--profile", nargs="?", const=PROFILE_CPROFILE, choices=PROFILE_MODES, default=default,
+                        help=f"Profile the run and write .pstats / .collapsed files to {PROFILE_OUTPUT_DIR}/ "
+                             f"(default mode: {PROFILE_CPROFILE})")
+
+
+def run_profiled(name: str, mode: Optional[str], workload, *args, **kwargs):
+    """
+    Run workload(*args, **kwargs), under a Profiler when mode is set.
+
+    Args:
+        name: Base name of the output files (a timestamp is appended)
+        mode: One of PROFILE_MODES, or None to run without profiling
+
+    Returns:
+        The workload's return value
+    """
+    if not mode:
+        return workload(*args, **kwargs)
+    profiler = Profiler(f"{name}-{time.strftime('%Y%m%d-%H%M%S')}", mode)
+    with profiler:
+        result = workload(*args, **kwargs)
+    print_profile_summary(profiler)
+    return result
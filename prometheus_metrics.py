@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Prometheus Metrics - text-exposition telemetry for the web app.
+Request counts and latency histograms per API route, template match counts
+per question type, pipeline stage latencies (including Ollama calls), and
+Ollama outcome and cache hit counters, rendered in the Prometheus text
+format (version 0.0.4). Counters and histograms are plain dictionaries
+behind a per-metric lock, so recording costs a dictionary update. Counters
+that other modules already keep (breaker, endpoint pool, caches) are read
+at scrape time instead of being duplicated.
+"""
+
+import bisect
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from instrumentation import get_instrumentation
+
+# Configuration (override with environment variables)
+PROMETHEUS_ALLOW_REMOTE = os.environ.get("PROMETHEUS_ALLOW_REMOTE", "0").lower() in ("1", "true", "yes")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers fast template-only requests through slow Ollama polishes
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+STAGE_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LOCAL_ADDRESSES = ("127.0.0.1", "::1", "localhost")
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _header(name: str, metric_type: str, documentation: str) -> List[str]:
+    return [f"# HELP {name} {documentation}", f"# TYPE {name} {metric_type}"]
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = _header(self.name, "counter", self.documentation)
+        lines.extend(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                     for key, value in values)
+        return lines
+
+
+class BucketHistogram:
+    """Fixed-bucket histogram with optional labels, exported as cumulative Prometheus buckets."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = REQUEST_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (last = above every bound)], sum, count
+        self._values: Dict[Labels, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        lines = _header(self.name, "histogram", self.documentation)
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Metrics owned by this process plus collectors that read counters kept elsewhere at scrape time."""
+
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = REQUEST_BUCKETS) -> BucketHistogram:
+        return self._register(BucketHistogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[str]]) -> None:
+        """Add a function returning exposition lines (HELP/TYPE included) at scrape time."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics, collectors = list(self._metrics), list(self._collectors)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collector in collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                # One broken source must not take the whole scrape down
+                lines.append(f"# collector {getattr(collector, '__name__', 'unknown')} failed: {_escape(e)}")
+        return "\n".join(lines) + "\n"
+
+
+def _gauge_or_counter(name: str, metric_type: str, documentation: str,
+                      samples: Iterable[Tuple[Dict[str, str], float]]) -> List[str]:
+    lines = _header(name, metric_type, documentation)
+    for labels, value in samples:
+        lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+    return lines
+
+
+def _collect_ollama() -> List[str]:
+    from ollama_health import get_ollama_health
+    from ollama_client import get_pool_stats
+
+    health = get_ollama_health()
+    lines = _gauge_or_counter("ollama_polish_outcomes_total", "counter",
+                              "Polish calls by outcome as seen by the circuit breaker",
+                              [({'outcome': 'success'}, health['successes']),
+                               ({'outcome': 'failure'}, health['failures']),
+                               ({'outcome': 'skipped'}, health['skipped'])])
+    lines += _gauge_or_counter("ollama_circuit_open", "gauge", "1 while the Ollama circuit breaker is open",
+                               [({}, 1 if health['state'] == 'open' else 0)])
+
+    endpoints = get_pool_stats()['endpoints']
+    lines += _gauge_or_counter("ollama_endpoint_requests_total", "counter", "HTTP requests sent to each Ollama endpoint",
+                               [({'endpoint': e['url']}, e['requests']) for e in endpoints])
+    lines += _gauge_or_counter("ollama_endpoint_errors_total", "counter", "Failed HTTP requests per Ollama endpoint",
+                               [({'endpoint': e['url']}, e['errors']) for e in endpoints])
+    lines += _gauge_or_counter("ollama_endpoint_in_flight", "gauge", "Requests currently in flight per Ollama endpoint",
+                               [({'endpoint': e['url']}, e['in_flight']) for e in endpoints])
+    return lines
+
+
+def _collect_caches() -> List[str]:
+    from metrics_cache import get_metrics_cache_stats
+    from polish_cache import get_polish_cache_stats
+
+    hits, misses = [], []
+    metrics_stats = get_metrics_cache_stats()
+    hits.append(({'cache': 'metrics_memory'}, metrics_stats['memory_hits']))
+    misses.append(({'cache': 'metrics_memory'}, metrics_stats['memory_misses']))
+    for cache, stats in (('metrics_disk', metrics_stats['disk']), ('polish', get_polish_cache_stats()['disk'])):
+        if stats is not None:
+            hits.append(({'cache': cache}, stats['hits']))
+            misses.append(({'cache': cache}, stats['misses']))
+    return (_gauge_or_counter("cache_hits_total", "counter", "Cache lookups that found an entry", hits) +
+            _gauge_or_counter("cache_misses_total", "counter", "Cache lookups that found nothing", misses))
+
+
+# Process-wide registry and the metrics the web app records
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.counter("http_requests_total", "HTTP requests handled, by route, method and status",
+                                 ("route", "method", "status"))
+HTTP_REQUEST_DURATION = REGISTRY.histogram("http_request_duration_seconds",
+                                           "Time to build the response, by route (streams end later)",
+                                           ("route", "method"), REQUEST_BUCKETS)
+PIPELINE_QUESTIONS = REGISTRY.counter("pipeline_questions_total", "Questions run through the pipeline, by type",
+                                      ("question_type",))
+TEMPLATE_MATCHES = REGISTRY.counter("pipeline_template_matches_total", "Questions that matched a template, by type",
+                                    ("question_type",))
+OLLAMA_POLISHED = REGISTRY.counter("pipeline_ollama_polished_total", "Questions whose text Ollama changed, by type",
+                                   ("question_type",))
+STAGE_DURATION = REGISTRY.histogram("pipeline_stage_duration_seconds",
+                                    "Pipeline stage latency (stage=\"ollama\" is one Ollama polish call)",
+                                    ("stage",), STAGE_BUCKETS)
+STAGE_ERRORS = REGISTRY.counter("pipeline_stage_errors_total", "Pipeline stage runs that raised", ("stage",))
+
+REGISTRY.add_collector(_collect_ollama)
+REGISTRY.add_collector(_collect_caches)
+
+
+def _record_stage(stage: str, seconds: float, question_type: Optional[str], error: bool) -> None:
+    STAGE_DURATION.observe(seconds, stage=stage)
+    if error:
+        STAGE_ERRORS.inc(stage=stage)
+
+
+def enable_stage_metrics() -> None:
+    """Feed every instrumentation stage timing into pipeline_stage_duration_seconds."""
+    get_instrumentation().add_listener(_record_stage)
+
+
+def observe_request(route: str, method: str, status: int, seconds: float) -> None:
+    """Record one handled HTTP request (route is the URL rule, not the raw path, to keep labels bounded)."""
+    HTTP_REQUESTS.inc(route=route, method=method, status=status)
+    HTTP_REQUEST_DURATION.observe(seconds, route=route, method=method)
+
+
+def record_pipeline_result(question_type: str, template_matched: bool, ollama_used: bool) -> None:
+    """Count one pipeline run for the per-type match and polish rates."""
+    PIPELINE_QUESTIONS.inc(question_type=question_type)
+    if template_matched:
+        TEMPLATE_MATCHES.inc(question_type=question_type)
+    if ollama_used:
+        OLLAMA_POLISHED.inc(question_type=question_type)
+
+
+def is_local_address(address: Optional[str]) -> bool:
+    """Whether a scrape comes from this machine (or any address when PROMETHEUS_ALLOW_REMOTE is set)."""
+    return PROMETHEUS_ALLOW_REMOTE or (address or "") in LOCAL_ADDRESSES
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Question Preprocessor - length-aware fast path for huge question texts.
+Splits out support boilerplate that recurs across the questions CSV being
+processed (typically in ParseErrorQuestion), and caps oversized texts and
+error tracebacks before template matching, scoring and Ollama polishing.
+The boilerplate set is learned once per corpus, so the same input always
+gives the same output regardless of request history or row order.
+"""
+
+import csv
+import hashlib
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+# Configuration (override with environment variables)
+PREPROCESS_ENABLED = os.environ.get("PREPROCESS_ENABLED", "1").lower() not in ("0", "false", "no")
+LONG_TEXT_THRESHOLD = int(os.environ.get("PREPROCESS_LONG_TEXT_THRESHOLD", "600"))  # Shorter texts skip block analysis
+MAX_TEXT_CHARS = int(os.environ.get("PREPROCESS_MAX_TEXT_CHARS", "3000"))  # Cap for question text in Ollama prompts
+MAX_TRACEBACK_CHARS = int(os.environ.get("PREPROCESS_MAX_TRACEBACK_CHARS", "2000"))
+TRACEBACK_TAIL_LINES = int(os.environ.get("PREPROCESS_TRACEBACK_TAIL_LINES", "20"))
+BOILERPLATE_MIN_BLOCK_CHARS = int(os.environ.get("PREPROCESS_BOILERPLATE_MIN_BLOCK_CHARS", "80"))
+BOILERPLATE_MIN_OCCURRENCES = int(os.environ.get("PREPROCESS_BOILERPLATE_MIN_OCCURRENCES", "3"))  # Distinct corpus texts
+# Questions CSV to learn boilerplate from (empty = no boilerplate). Unless set, the bulk runners switch it to
+# the CSV they process (see use_boilerplate_corpus); relative paths are tried from here, then next to this module
+BOILERPLATE_CORPUS = os.environ.get("PREPROCESS_BOILERPLATE_CORPUS", "questions.csv")
+BOILERPLATE_CORPUS_PINNED = "PREPROCESS_BOILERPLATE_CORPUS" in os.environ
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_BLOCK_SPLIT_RE = re.compile(r"\n\s*\n")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _omitted_marker(count: int) -> str:
+    return f"\n...[{count} characters omitted]...\n"
+
+
+def cap_text(text: str, max_chars: int, head_fraction: float = 0.67) -> str:
+    """
+    Cap a text at roughly max_chars by keeping its head and tail.
+
+    Args:
+        text: Text to cap
+        max_chars: Maximum number of characters to keep
+        head_fraction: Share of the budget spent on the beginning of the text
+
+    Returns:
+        The text unchanged if it fits, otherwise head + omission marker + tail
+    """
+    if max_chars <= 0 or len(text) <= max_chars:
+        return text
+    head = int(max_chars * head_fraction)
+    tail = max_chars - head
+    omitted = len(text) - head - tail
+    return text[:head].rstrip() + _omitted_marker(omitted) + (text[-tail:].lstrip() if tail else "")
+
+
+def summarize_traceback(error_traceback: str, max_chars: int = MAX_TRACEBACK_CHARS,
+                        tail_lines: int = TRACEBACK_TAIL_LINES) -> str:
+    """
+    Shorten an error traceback, keeping the last lines where the actual error is reported.
+
+    Args:
+        error_traceback: Raw traceback text
+        max_chars: Maximum number of characters to keep
+        tail_lines: Maximum number of trailing lines to keep for multi-line tracebacks
+
+    Returns:
+        The summarized traceback
+    """
+    if len(error_traceback) <= max_chars:
+        return error_traceback
+    lines = error_traceback.splitlines()
+    if len(lines) > tail_lines:
+        dropped = sum(len(line) + 1 for line in lines[:-tail_lines])
+        error_traceback = f"...[{dropped} characters omitted]...\n" + "\n".join(lines[-tail_lines:])
+    # The end of a traceback carries the error, so spend most of the budget there
+    return cap_text(error_traceback, max_chars, head_fraction=0.33)
+
+
+def cap_prompt_text(text: str, max_chars: int = MAX_TEXT_CHARS) -> str:
+    """Cap a question text that goes into an Ollama prompt (never into a template or result)."""
+    return cap_text(text, max_chars) if PREPROCESS_ENABLED else text
+
+
+def _block_id(block: str) -> str:
+    normalized = _WHITESPACE_RE.sub(" ", block).strip().lower()
+    return hashlib.sha1(normalized.encode("utf-8", "surrogatepass")).hexdigest()[:16]
+
+
+def learn_boilerplate(texts: Iterable[str], min_block_chars: int = BOILERPLATE_MIN_BLOCK_CHARS,
+                      min_occurrences: int = BOILERPLATE_MIN_OCCURRENCES) -> Set[str]:
+    """
+    Find blocks that recur across distinct texts of a reference corpus.
+
+    Args:
+        texts: Corpus texts (duplicates count once)
+        min_block_chars: Shorter blocks are never boilerplate
+        min_occurrences: Number of distinct texts a block must appear in
+
+    Returns:
+        Set of block ids (see QuestionPreprocessor)
+    """
+    counts: Dict[str, int] = {}
+    seen_texts = set()
+    for text in texts:
+        text_id = hashlib.sha1(text.encode("utf-8", "surrogatepass")).digest()
+        if text_id in seen_texts:
+            continue
+        seen_texts.add(text_id)
+        block_ids = {_block_id(block) for block in _BLOCK_SPLIT_RE.split(text)
+                     if len(block.strip()) >= min_block_chars}
+        for block_id in block_ids:
+            counts[block_id] = counts.get(block_id, 0) + 1
+    return {block_id for block_id, count in counts.items() if count >= min_occurrences}
+
+
+def resolve_corpus_path(csv_file: Optional[str]) -> Optional[str]:
+    """
+    Locate a corpus CSV: as given (absolute or from the current directory), then next to this module.
+
+    Returns:
+        Absolute path of the file, or None if it does not exist (or csv_file is empty)
+    """
+    if not csv_file:
+        return None
+    for candidate in (csv_file, os.path.join(MODULE_DIR, csv_file)):
+        if os.path.isfile(candidate):
+            return os.path.abspath(candidate)
+    return None
+
+
+def _iter_corpus_texts(path: str) -> Iterable[str]:
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            text = (row.get('text') or "").strip()
+            lexical_path = (row.get('lexical_path') or "").strip()
+            yield f"{text} {lexical_path}".strip() if lexical_path else text
+
+
+def load_boilerplate_corpus(csv_file: Optional[str] = BOILERPLATE_CORPUS) -> Set[str]:
+    """
+    Learn boilerplate from the text (+ lexical_path) column of a questions CSV.
+
+    Args:
+        csv_file: Questions CSV, resolved with resolve_corpus_path (missing or empty path = no boilerplate)
+
+    Returns:
+        Set of boilerplate block ids
+    """
+    path = resolve_corpus_path(csv_file)
+    if path is None:
+        return set()
+    return learn_boilerplate(_iter_corpus_texts(path))
+
+
+class QuestionPreprocessor:
+    """
+    Preprocessor with a fixed set of known boilerplate blocks.
+
+    Texts longer than long_text_threshold are split into blank-line separated
+    blocks. Blocks in the boilerplate set (see learn_boilerplate) are split
+    out of the text, unless that would leave only the first block (the
+    template preamble); repeated blocks within one row are always
+    deduplicated. Shorter texts only get their traceback capped. The question
+    text itself is never cut here: it is matched and substituted into
+    templates, so an omission marker must not end up in it. Oversized texts
+    are capped only where they become prompt input (see cap_prompt_text), and
+    the report flags them as truncated. Processing never changes the
+    boilerplate set, so results do not depend on what was processed before.
+    """
+
+    def __init__(self, long_text_threshold: int = LONG_TEXT_THRESHOLD,
+                 max_text_chars: int = MAX_TEXT_CHARS,
+                 max_traceback_chars: int = MAX_TRACEBACK_CHARS,
+                 min_block_chars: int = BOILERPLATE_MIN_BLOCK_CHARS,
+                 boilerplate_blocks: Optional[Iterable[str]] = None,
+                 corpus: Optional[str] = None):
+        """
+        Args:
+            long_text_threshold: Shorter texts skip block analysis
+            max_text_chars: Cap for the question text in prompts ('truncated' in the report)
+            max_traceback_chars: Cap for the error traceback
+            min_block_chars: Shorter blocks are never split out as boilerplate
+            boilerplate_blocks: Block ids to split out (see learn_boilerplate; default: none)
+            corpus: Path the boilerplate was learned from (reported by stats())
+        """
+        self.corpus = corpus
+        self.long_text_threshold = long_text_threshold
+        self.max_text_chars = max_text_chars
+        self.max_traceback_chars = max_traceback_chars
+        self.min_block_chars = min_block_chars
+        self.boilerplate_blocks = frozenset(boilerplate_blocks or ())
+        self._lock = threading.Lock()
+        self.totals = {
+            'rows': 0,
+            'rows_changed': 0,
+            'input_chars': 0,
+            'removed_chars': 0,
+            'traceback_input_chars': 0,
+            'traceback_removed_chars': 0,
+            'boilerplate_blocks_removed': 0,
+            'duplicate_blocks_removed': 0,
+            'texts_truncated': 0
+        }
+
+    def _split_boilerplate(self, text: str) -> Dict:
+        blocks = [block for block in _BLOCK_SPLIT_RE.split(text) if block.strip()]
+        unique: List[str] = []
+        kept: List[str] = []
+        boilerplate_ids: List[str] = []
+        seen_in_row = set()
+
+        for block in blocks:
+            block_id = _block_id(block)
+            if block_id in seen_in_row:
+                continue
+            seen_in_row.add(block_id)
+            unique.append(block)
+            if len(block.strip()) >= self.min_block_chars and block_id in self.boilerplate_blocks:
+                boilerplate_ids.append(block_id)
+            else:
+                kept.append(block)
+
+        if boilerplate_ids and len(kept) <= 1:
+            # Never strip a question down to its first block (the template preamble); only deduplicate
+            kept, boilerplate_ids = unique, []
+
+        return {
+            'text': "\n\n".join(block.strip("\n") for block in kept),
+            'boilerplate_ids': boilerplate_ids,
+            'duplicate_blocks_removed': len(blocks) - len(unique)
+        }
+
+    def preprocess(self, text: str, error_traceback: Optional[str] = "") -> Dict:
+        """
+        Preprocess one question.
+
+        Args:
+            text: Question text
+            error_traceback: Error traceback for the question (optional)
+
+        Returns:
+            Dictionary with the processed 'text' and 'error_traceback' plus a report:
+            original/processed lengths, removed characters, boilerplate block ids,
+            duplicate blocks removed and whether prompts get a truncated text
+        """
+        text = text or ""
+        error_traceback = "" if error_traceback is None else str(error_traceback)
+        if error_traceback == "nan":
+            error_traceback = ""
+
+        processed = text
+        boilerplate_ids: List[str] = []
+        duplicates = 0
+        truncated = False
+
+        if len(text) >= self.long_text_threshold:
+            split = self._split_boilerplate(text)
+            processed = split['text']
+            boilerplate_ids = split['boilerplate_ids']
+            duplicates = split['duplicate_blocks_removed']
+            truncated = self.max_text_chars > 0 and len(processed) > self.max_text_chars
+
+        processed_traceback = summarize_traceback(error_traceback, self.max_traceback_chars)
+
+        report = {
+            'text': processed,
+            'error_traceback': processed_traceback,
+            'original_length': len(text),
+            'processed_length': len(processed),
+            'removed_chars': len(text) - len(processed),
+            'traceback_original_length': len(error_traceback),
+            'traceback_removed_chars': len(error_traceback) - len(processed_traceback),
+            'boilerplate_ids': boilerplate_ids,
+            'duplicate_blocks_removed': duplicates,
+            'truncated': truncated
+        }
+
+        with self._lock:
+            totals = self.totals
+            totals['rows'] += 1
+            totals['input_chars'] += len(text)
+            totals['removed_chars'] += max(0, report['removed_chars'])
+            totals['traceback_input_chars'] += len(error_traceback)
+            totals['traceback_removed_chars'] += max(0, report['traceback_removed_chars'])
+            totals['boilerplate_blocks_removed'] += len(boilerplate_ids)
+            totals['duplicate_blocks_removed'] += duplicates
+            totals['texts_truncated'] += int(truncated)
+            if report['removed_chars'] or report['traceback_removed_chars']:
+                totals['rows_changed'] += 1
+
+        return report
+
+    def stats(self) -> Dict:
+        """Cumulative totals, including the share of input characters removed."""
+        with self._lock:
+            totals = dict(self.totals)
+        totals['known_boilerplate_blocks'] = len(self.boilerplate_blocks)
+        totals['boilerplate_corpus'] = self.corpus
+        all_input = totals['input_chars'] + totals['traceback_input_chars']
+        all_removed = totals['removed_chars'] + totals['traceback_removed_chars']
+        totals['removed_rate'] = all_removed / all_input * 100 if all_input else 0.0
+        return totals
+
+
+# Shared process-wide preprocessor, built from BOILERPLATE_CORPUS on first use
+_default_preprocessor: Optional[QuestionPreprocessor] = None
+_default_preprocessor_lock = threading.Lock()
+_corpus: Optional[str] = BOILERPLATE_CORPUS
+
+
+def _build_preprocessor(csv_file: Optional[str]) -> QuestionPreprocessor:
+    path = resolve_corpus_path(csv_file)
+    return QuestionPreprocessor(boilerplate_blocks=load_boilerplate_corpus(path), corpus=path or csv_file or None)
+
+
+def get_preprocessor() -> QuestionPreprocessor:
+    """Get the shared process-wide preprocessor."""
+    global _default_preprocessor
+    if _default_preprocessor is None:
+        with _default_preprocessor_lock:
+            if _default_preprocessor is None:
+                _default_preprocessor = _build_preprocessor(_corpus)
+    return _default_preprocessor
+
+
+def reset_preprocessor() -> QuestionPreprocessor:
+    """Replace the shared preprocessor with a fresh one (clears its counters, reloads the corpus)."""
+    global _default_preprocessor
+    with _default_preprocessor_lock:
+        _default_preprocessor = _build_preprocessor(_corpus)
+        return _default_preprocessor
+
+
+def use_boilerplate_corpus(csv_file: str) -> None:
+    """
+    Learn boilerplate from the questions CSV about to be processed.
+
+    Rebuilds the shared preprocessor when csv_file differs from the current
+    corpus. Does nothing when PREPROCESS_BOILERPLATE_CORPUS is set, so an
+    explicit corpus always wins.
+
+    Args:
+        csv_file: Questions CSV being processed
+    """
+    global _default_preprocessor, _corpus
+    if BOILERPLATE_CORPUS_PINNED:
+        return
+    with _default_preprocessor_lock:
+        if resolve_corpus_path(csv_file) == resolve_corpus_path(_corpus) and _default_preprocessor is not None:
+            return
+        _corpus = csv_file
+        _default_preprocessor = _build_preprocessor(csv_file)
+
+
+def preprocess_question(text: str, error_traceback: Optional[str] = "") -> Dict:
+    """
+    Preprocess a question with the shared preprocessor (no-op when PREPROCESS_ENABLED is off).
+
+    Args:
+        text: Question text
+        error_traceback: Error traceback for the question (optional)
+
+    Returns:
+        See QuestionPreprocessor.preprocess
+    """
+    if not PREPROCESS_ENABLED:
+        error_traceback = "" if error_traceback is None else str(error_traceback)
+        return {
+            'text': text,
+            'error_traceback': error_traceback,
+            'original_length': len(text),
+            'processed_length': len(text),
+            'removed_chars': 0,
+            'traceback_original_length': len(error_traceback),
+            'traceback_removed_chars': 0,
+            'boilerplate_ids': [],
+            'duplicate_blocks_removed': 0,
+            'truncated': False
+        }
+    return get_preprocessor().preprocess(text, error_traceback)
+
+
+def get_preprocessing_stats() -> Dict:
+    """Cumulative preprocessing totals for this process."""
+    return get_preprocessor().stats()
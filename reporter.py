@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Reporter - verbosity-controlled console output for bulk runs.
+Per-question detail is off by default; summaries still print, progress is
+a single throttled line, and every event can also be written as a JSON
+line for log collectors. Callers check enabled() before building detail
+strings, so quiet runs skip the formatting work as well as the I/O.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, Optional, TextIO
+
+QUIET = 0    # Errors only
+NORMAL = 1   # Headers, summaries and progress
+DETAIL = 2   # Everything, including per-question texts and metrics
+
+# Configuration (override with environment variables)
+REPORT_VERBOSITY = int(os.environ.get("REPORT_VERBOSITY", str(NORMAL)))
+REPORT_PROGRESS_INTERVAL = float(os.environ.get("REPORT_PROGRESS_INTERVAL", "5"))  # Seconds between progress lines
+REPORT_JSON_PATH = os.environ.get("REPORT_JSON_PATH", "")  # JSON lines event file ("-" = stdout, empty = off)
+
+
+class Reporter:
+    """Console output gated by verbosity, throttled progress and optional JSON events."""
+
+    def __init__(self, verbosity: int = REPORT_VERBOSITY, progress_interval: float = REPORT_PROGRESS_INTERVAL,
+                 json_path: str = REPORT_JSON_PATH, stream: Optional[TextIO] = None):
+        """
+        Args:
+            verbosity: QUIET, NORMAL or DETAIL
+            progress_interval: Minimum seconds between progress lines
+            json_path: File that receives one JSON object per event ("-" = stdout, empty = off)
+            stream: Console stream (default: sys.stdout at write time)
+        """
+        self.verbosity = verbosity
+        self.progress_interval = progress_interval
+        self.stream = stream
+        self.json_path = json_path
+        self._json: Optional[TextIO] = None
+        if json_path == "-":
+            self._json = sys.stdout
+        elif json_path:
+            directory = os.path.dirname(os.path.abspath(json_path))
+            os.makedirs(directory, exist_ok=True)
+            self._json = open(json_path, 'a', encoding='utf-8')
+        self._last_progress: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def json_enabled(self) -> bool:
+        return self._json is not None
+
+    def enabled(self, level: int) -> bool:
+        """Whether messages at this level are shown (check before building expensive strings)."""
+        return self.verbosity >= level
+
+    def _write(self, message: str) -> None:
+        print(message, file=self.stream or sys.stdout)
+
+    def error(self, message: str) -> None:
+        self._write(message)
+
+    def info(self, message: str = "") -> None:
+        if self.verbosity >= NORMAL:
+            self._write(message)
+
+    def detail(self, message: str = "") -> None:
+        if self.verbosity >= DETAIL:
+            self._write(message)
+
+    def event(self, name: str, **fields) -> None:
+        """Write a machine-readable event (no-op unless a JSON path is configured)."""
+        if self._json is None:
+            return
+        line = json.dumps({'event': name, 'time': time.time(), **fields}, default=str)
+        with self._lock:
+            self._json.write(line + "\n")
+            self._json.flush()
+
+    def progress(self, done: int, total: Optional[int] = None, label: str = "questions", **fields) -> None:
+        """
+        Report progress, printing at most one line per progress_interval (and always the last one).
+
+        Args:
+            done: Items finished so far
+            total: Total items (None if unknown)
+            label: What is being counted; progress is throttled per label
+            **fields: Extra values for the JSON event
+        """
+        now = time.perf_counter()
+        finished = total is not None and done >= total
+        with self._lock:
+            last = self._last_progress.get(label)
+            if last is None:
+                # The first call only starts the clock
+                self._last_progress[label] = now
+                if not finished:
+                    return
+            elif not finished and now - last < self.progress_interval:
+                return
+            self._last_progress[label] = now
+            if finished:
+                self._last_progress.pop(label, None)
+        if self.verbosity == NORMAL:
+            self._write(f"   ⏳ {done:,}/{total:,} {label}" if total is not None else f"   ⏳ {done:,} {label}")
+        self.event('progress', label=label, done=done, total=total, **fields)
+
+    def close(self) -> None:
+        if self._json is not None and self._json is not sys.stdout:
+            self._json.close()
+        self._json = None
+
+
+_reporter: Optional[Reporter] = None
+_reporter_lock = threading.Lock()
+
+
+def get_reporter() -> Reporter:
+    """Get the process-wide reporter (configured from the environment on first use)."""
+    global _reporter
+    if _reporter is None:
+        with _reporter_lock:
+            if _reporter is None:
+                _reporter = Reporter()
+    return _reporter
+
+
+def configure_reporter(verbosity: Optional[int] = None, json_path: Optional[str] = None,
+                       progress_interval: Optional[float] = None) -> Reporter:
+    """
+    Replace the process-wide reporter, keeping any setting that is not given.
+
+    Args:
+        verbosity: QUIET, NORMAL or DETAIL
+        json_path: JSON lines event file ("-" = stdout, empty = off)
+        progress_interval: Minimum seconds between progress lines
+
+    Returns:
+        The new reporter
+    """
+    global _reporter
+    with _reporter_lock:
+        previous = _reporter
+        _reporter = Reporter(
+            verbosity=previous.verbosity if verbosity is None and previous else
+            (REPORT_VERBOSITY if verbosity is None else verbosity),
+            progress_interval=previous.progress_interval if progress_interval is None and previous else
+            (REPORT_PROGRESS_INTERVAL if progress_interval is None else progress_interval),
+            json_path=previous.json_path if json_path is None and previous else
+            (REPORT_JSON_PATH if json_path is None else json_path)
+        )
+        if previous is not None:
+            previous.close()
+    return _reporter
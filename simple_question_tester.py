@@ -3,9 +3,11 @@
 import os
 import re
 import json
+import hashlib
 import pandas as pd
 import random
-from typing import Dict, List, Optional, Tuple
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from datetime import datetime
 
 # Configuration
@@ -14,14 +16,31 @@ INTERACTIVE_MODE = False  # Set to False for automated mode
 
 # Try to import Ollama for polishing, but make it optional
 try:
-    from local_polisher import polish_question_with_fallback, check_ollama_available, get_available_models
+    from local_polisher import polish_question_with_fallback
 
     OLLAMA_AVAILABLE = True
 except ImportError:
     OLLAMA_AVAILABLE = False
-    print("Warning: Ollama polisher not available. Local polishing will be disabled.")
+    print("Warning: local_polisher not available. POLISH_BACKEND=local_polisher will be disabled.")
     polish_question_with_fallback = None
 
+from streaming_stats import ImprovementStats
+from reporter import get_reporter, DETAIL, NORMAL
+from instrumentation import stage_timer, increment_counter
+from metrics_cache import get_cached_metrics, store_metrics, prefetch_metrics
+from polish_cache import (get_cached_polish, store_polish, polish_key, POLISH_PROMPT_VERSION,
+                          OLLAMA_MODEL as POLISH_CACHE_OLLAMA_MODEL, LOCAL_POLISHER_MODEL)
+from single_flight import SingleFlight
+from ollama_health import allow_polish, record_polish_result, record_polish_failure
+from ollama_client import generate, generate_stream, REQUESTS_AVAILABLE
+from question_preprocessor import preprocess_question, use_boilerplate_corpus, cap_prompt_text
+from async_polisher import POLISH_TIMEOUT
+from batch_polisher import BATCH_PROMPT_VERSION
+from pipeline_engine import (PipelineEngine, POLISH_AUTO, POLISH_NONE, build_pipeline_results,
+                             make_polish_executor)
+from staged_runner import StagedRunner, STAGE_CPU_WORKERS, print_stage_stats
+from polish_scheduler import PolishScheduler, POLISH_BUDGET_CALLS, POLISH_BUDGET_SECONDS, POLISH_PER_TYPE_QUOTA
+
 from metrics3 import (
     clarity,
     conciseness,
@@ -348,11 +367,10 @@ def match_question_to_template_simple(question_text: str, templates: List[Dict])
     for template in templates:
         original = template["original"]
         
-        # Create flexible regex pattern
-        pattern = create_flexible_regex_pattern(original)
+        # Flexible regex pattern, compiled once per template with case insensitive and dotall flags
+        pattern = get_compiled_template_pattern(original)
         
-        # Try to match with case insensitive and dotall flags
-        match = re.match(pattern, question_text, re.IGNORECASE | re.DOTALL)
+        match = pattern.match(question_text)
         
         if match:
             # Found a match - return it
@@ -361,6 +379,73 @@ def match_question_to_template_simple(question_text: str, templates: List[Dict])
     # No regex match found
     return None, None
 
+# Template index: compiled patterns per template and precomputed metrics for
+# templates whose "nicer" text has no placeholders (constant output)
+_PLACEHOLDER_RE = re.compile(r"<[A-Z][A-Z0-9_]*>")
+_COMPILED_TEMPLATE_PATTERNS: Dict[str, re.Pattern] = {}
+_CONSTANT_TEMPLATE_METRICS: Dict[str, Dict[str, float]] = {}
+_TEMPLATE_INDEX_BUILT = False
+
+def get_compiled_template_pattern(original: str) -> re.Pattern:
+    """Get the compiled flexible regex for a template's original text, compiling it on first use."""
+    pattern = _COMPILED_TEMPLATE_PATTERNS.get(original)
+    if pattern is None:
+        pattern = re.compile(create_flexible_regex_pattern(original), re.IGNORECASE | re.DOTALL)
+        _COMPILED_TEMPLATE_PATTERNS[original] = pattern
+    return pattern
+
+def is_constant_template(template: Dict) -> bool:
+    """True if the template's improved text does not depend on the matched question."""
+    return not _PLACEHOLDER_RE.search(template["nicer"])
+
+def build_template_index(precompute_metrics: bool = True) -> Dict[str, int]:
+    """
+    Compile every template pattern and precompute metrics for constant-output templates.
+    
+    Args:
+        precompute_metrics: Score the constant "nicer" texts now (default: True)
+        
+    Returns:
+        Dictionary with the number of compiled patterns and precomputed constant templates
+    """
+    global _TEMPLATE_INDEX_BUILT
+    
+    for templates in PROMPT_TEMPLATES.values():
+        for template in templates:
+            get_compiled_template_pattern(template["original"])
+            if precompute_metrics and is_constant_template(template):
+                nicer_text = template["nicer"]
+                if nicer_text not in _CONSTANT_TEMPLATE_METRICS:
+                    _CONSTANT_TEMPLATE_METRICS[nicer_text] = calculate_metrics_for_text(nicer_text)
+    
+    if precompute_metrics:
+        _TEMPLATE_INDEX_BUILT = True
+    
+    return {
+        'compiled_patterns': len(_COMPILED_TEMPLATE_PATTERNS),
+        'constant_templates': len(_CONSTANT_TEMPLATE_METRICS)
+    }
+
+def get_template_metrics(template: Dict, improved_text: str) -> Dict[str, float]:
+    """
+    Get metrics for a template-improved text, reusing precomputed metrics for constant templates.
+    
+    Args:
+        template: The matched template
+        improved_text: Text produced by transform_question_with_template_simple
+        
+    Returns:
+        Dictionary with metric scores
+    """
+    if not _TEMPLATE_INDEX_BUILT:
+        build_template_index()
+    
+    precomputed = _CONSTANT_TEMPLATE_METRICS.get(improved_text)
+    if precomputed is not None and is_constant_template(template):
+        return dict(precomputed)
+    
+    return calculate_metrics_for_text(improved_text)
+
 def transform_question_with_template_simple(question_text: str, template: Dict, match_obj: re.Match) -> str:
     """
     Transform question using template and captured groups.
@@ -432,6 +517,76 @@ def transform_question_with_template_simple(question_text: str, template: Dict,
     
     return nicer_text
 
+def question_from_csv_row(row, idx) -> Optional[Dict]:
+    """
+    Build a question dictionary from one questions.csv row.
+    
+    Args:
+        row: pandas row (or any mapping with the CSV columns)
+        idx: Row index, used as the id when the row has none
+    
+    Returns:
+        Question dictionary (see get_random_questions_from_csv), or None for empty rows
+    """
+    # Combine text + lexical_path
+    text = str(row['text']).strip()
+    lexical_path = str(row.get('lexical_path', '')).strip()
+    
+    # Filter out nan values
+    if lexical_path == 'nan' or lexical_path == '':
+        combined_text = text
+    else:
+        combined_text = text + " " + lexical_path
+    
+    combined_text = combined_text.strip()
+    
+    if not combined_text or combined_text == 'nan':
+        return None
+    
+    return {
+        'id': row.get('id', idx),
+        'text': text,
+        'lexical_path': lexical_path,
+        'type': row.get('type', ''),
+        'error_traceback': row.get('error_traceback', ''),
+        'choices': row.get('choices', ''),
+        'combined_text': combined_text
+    }
+
+def shard_of(question_id, num_shards: int) -> int:
+    """
+    Shard a question belongs to, stable across processes and machines.
+    
+    Args:
+        question_id: Question id (the CSV 'id' column, or the row index)
+        num_shards: Total number of shards
+    
+    Returns:
+        Shard index in [0, num_shards)
+    """
+    digest = hashlib.md5(str(question_id).encode('utf-8')).hexdigest()
+    return int(digest[:8], 16) % num_shards
+
+def iter_questions_from_csv(csv_file: str = "questions.csv", chunk_size: int = 1000) -> Iterator[Dict]:
+    """
+    Lazily read every question from a CSV file, in file order.
+    
+    Only one chunk of rows is held in memory at a time.
+    
+    Args:
+        csv_file: Path to the CSV file (default: "questions.csv")
+        chunk_size: Rows read from disk at a time (default: 1000)
+    
+    Yields:
+        Question dictionaries (see get_random_questions_from_csv)
+    """
+    use_boilerplate_corpus(csv_file)
+    for chunk in pd.read_csv(csv_file, chunksize=chunk_size):
+        for idx, row in chunk.iterrows():
+            question_data = question_from_csv_row(row, idx)
+            if question_data is not None:
+                yield question_data
+
 def get_random_questions_from_csv(num_questions: int = 10, csv_file: str = "questions.csv") -> List[Dict]:
     """
     Get a specified number of random unique questions from questions.csv with diversity.
@@ -450,14 +605,17 @@ def get_random_questions_from_csv(num_questions: int = 10, csv_file: str = "ques
         - choices: Choices (if any)
         - combined_text: text + lexical_path combined
     """
+    report = get_reporter()
     try:
         # Read CSV file
         df = pd.read_csv(csv_file)
-        print(f"📊 Loaded {len(df)} questions from {csv_file}")
+        report.info(f"📊 Loaded {len(df)} questions from {csv_file}")
+        use_boilerplate_corpus(csv_file)
         
         # Ensure we get diverse question types
-        question_types = df['type'].value_counts()
-        print(f"📋 Available question types: {list(question_types.index)}")
+        if report.enabled(DETAIL):
+            question_types = df['type'].value_counts()
+            report.detail(f"📋 Available question types: {list(question_types.index)}")
         
         # Calculate how many questions to sample from each type
         # Prioritize less common types to ensure diversity
@@ -518,31 +676,9 @@ def get_random_questions_from_csv(num_questions: int = 10, csv_file: str = "ques
         
         # Process the sampled questions
         for idx, row in final_sampled.iterrows():
-            # Combine text + lexical_path as requested
-            text = str(row['text']).strip()
-            lexical_path = str(row.get('lexical_path', '')).strip()
-            
-            # Filter out nan values
-            if lexical_path == 'nan' or lexical_path == '':
-                combined_text = text
-            else:
-                combined_text = text + " " + lexical_path
-            
-            combined_text = combined_text.strip()
-            
-            if not combined_text or combined_text == 'nan':
-                continue
-            
-            question_data = {
-                'id': row.get('id', idx),
-                'text': text,
-                'lexical_path': lexical_path,
-                'type': row.get('type', ''),
-                'error_traceback': row.get('error_traceback', ''),
-                'choices': row.get('choices', ''),
-                'combined_text': combined_text
-            }
-            questions.append(question_data)
+            question_data = question_from_csv_row(row, idx)
+            if question_data is not None:
+                questions.append(question_data)
         
         # If we still don't have enough questions, add some random ones
         if len(questions) < num_questions:
@@ -551,29 +687,9 @@ def get_random_questions_from_csv(num_questions: int = 10, csv_file: str = "ques
             if len(remaining_df) > 0:
                 additional_sampled = remaining_df.sample(n=min(remaining_needed, len(remaining_df)), random_state=42)
                 for idx, row in additional_sampled.iterrows():
-                    text = str(row['text']).strip()
-                    lexical_path = str(row.get('lexical_path', '')).strip()
-                    
-                    if lexical_path == 'nan' or lexical_path == '':
-                        combined_text = text
-                    else:
-                        combined_text = text + " " + lexical_path
-                    
-                    combined_text = combined_text.strip()
-                    
-                    if not combined_text or combined_text == 'nan':
-                        continue
-                    
-                    question_data = {
-                        'id': row.get('id', idx),
-                        'text': text,
-                        'lexical_path': lexical_path,
-                        'type': row.get('type', ''),
-                        'error_traceback': row.get('error_traceback', ''),
-                        'choices': row.get('choices', ''),
-                        'combined_text': combined_text
-                    }
-                    questions.append(question_data)
+                    question_data = question_from_csv_row(row, idx)
+                    if question_data is not None:
+                        questions.append(question_data)
         
         # Show diversity summary
         type_counts = {}
@@ -581,18 +697,18 @@ def get_random_questions_from_csv(num_questions: int = 10, csv_file: str = "ques
             q_type = q['type']
             type_counts[q_type] = type_counts.get(q_type, 0) + 1
         
-        print(f"✅ Retrieved {len(questions)} diverse questions")
-        print(f"📊 Question type distribution:")
+        report.info(f"✅ Retrieved {len(questions)} diverse questions")
+        report.detail(f"📊 Question type distribution:")
         for q_type, count in type_counts.items():
-            print(f"   {q_type}: {count}")
+            report.detail(f"   {q_type}: {count}")
         
         return questions
         
     except FileNotFoundError:
-        print(f"❌ Error: {csv_file} file not found in current directory")
+        report.error(f"❌ Error: {csv_file} file not found in current directory")
         return []
     except Exception as e:
-        print(f"❌ Error reading CSV: {e}")
+        report.error(f"❌ Error reading CSV: {e}")
         return []
 
 def get_demo_examples(num_examples: int = 5, csv_file: str = "questions.csv") -> List[Dict]:
@@ -607,140 +723,25 @@ def get_demo_examples(num_examples: int = 5, csv_file: str = "questions.csv") ->
         List of dictionaries containing processed demo examples
     """
     questions = get_random_questions_from_csv(num_examples, csv_file)
-    demo_examples = []
-    
-    for question_data in questions:
-        question_text = question_data['combined_text']
-        question_type = question_data['type']
-        
-        # Calculate original metrics
-        original_metrics = calculate_metrics_for_text(question_text)
-        original_enhanced_score = sum([
-            original_metrics['clarity'],
-            original_metrics['conciseness'],
-            original_metrics['technical_accuracy'],
-            original_metrics['actionability']
-        ]) / 4
-        
-        # Initialize results
-        results = {
-            'original_text': question_text,
-            'original_metrics': original_metrics,
-            'original_enhanced_score': original_enhanced_score,
-            'template_matched': False,
-            'template_improved_text': question_text,
-            'template_metrics': original_metrics,
-            'template_enhanced_score': original_enhanced_score,
-            'ollama_used': False,
-            'ollama_improved_text': question_text,
-            'final_metrics': original_metrics,
-            'final_enhanced_score': original_enhanced_score,
-            'template_improvement': 0.0,
-            'final_improvement': 0.0,
-            'ollama_additional_improvement': 0.0
-        }
-        
-        # Try template matching
-        if question_type and question_type in PROMPT_TEMPLATES:
-            templates = PROMPT_TEMPLATES[question_type]
-            template, match_obj = match_question_to_template_simple(question_text, templates)
-            
-            if template and match_obj:
-                template_improved_text = transform_question_with_template_simple(question_text, template, match_obj)
-                template_metrics = calculate_metrics_for_text(template_improved_text)
-                template_enhanced_score = sum([
-                    template_metrics['clarity'],
-                    template_metrics['conciseness'],
-                    template_metrics['technical_accuracy'],
-                    template_metrics['actionability']
-                ]) / 4
-                
-                results.update({
-                    'template_matched': True,
-                    'template_improved_text': template_improved_text,
-                    'template_metrics': template_metrics,
-                    'template_enhanced_score': template_enhanced_score,
-                    'template_improvement': template_enhanced_score - original_enhanced_score
-                })
-        
-        # Check if Ollama polishing is needed - FIRST check if no template matched
-        if not results['template_matched']:
+
+    def announce(state: Dict) -> None:
+        if not state['template_matched']:
             print(f"   🔧 No template matched - forcing Ollama polishing")
-            try:
-                ollama_improved_text = polish_low_scoring_questions(
-                    results['template_improved_text'],
-                    results['template_metrics'],
-                    question_type or "Unknown"
-                )
-                
-                if ollama_improved_text != results['template_improved_text']:
-                    final_metrics = calculate_metrics_for_text(ollama_improved_text)
-                    final_enhanced_score = sum([
-                        final_metrics['clarity'],
-                        final_metrics['conciseness'],
-                        final_metrics['technical_accuracy'],
-                        final_metrics['actionability']
-                    ]) / 4
-                    
-                    results.update({
-                        'ollama_used': True,
-                        'ollama_improved_text': ollama_improved_text,
-                        'final_metrics': final_metrics,
-                        'final_enhanced_score': final_enhanced_score,
-                        'final_improvement': final_enhanced_score - original_enhanced_score,
-                        'ollama_additional_improvement': final_enhanced_score - results['template_enhanced_score']
-                    })
-                else:
-                    results['final_improvement'] = results['template_improvement']
-            except Exception as e:
-                # If Ollama fails, use template results
-                results['final_improvement'] = results['template_improvement']
-        # SECOND check if template matched but score is low
-        elif should_polish_with_ollama(results['template_metrics'], threshold=9.0):
-            try:
-                ollama_improved_text = polish_low_scoring_questions(
-                    results['template_improved_text'],
-                    results['template_metrics'],
-                    question_type or "Unknown"
-                )
-                
-                if ollama_improved_text != results['template_improved_text']:
-                    final_metrics = calculate_metrics_for_text(ollama_improved_text)
-                    final_enhanced_score = sum([
-                        final_metrics['clarity'],
-                        final_metrics['conciseness'],
-                        final_metrics['technical_accuracy'],
-                        final_metrics['actionability']
-                    ]) / 4
-                    
-                    results.update({
-                        'ollama_used': True,
-                        'ollama_improved_text': ollama_improved_text,
-                        'final_metrics': final_metrics,
-                        'final_enhanced_score': final_enhanced_score,
-                        'final_improvement': final_enhanced_score - original_enhanced_score,
-                        'ollama_additional_improvement': final_enhanced_score - results['template_enhanced_score']
-                    })
-                else:
-                    results['final_improvement'] = results['template_improvement']
-            except Exception as e:
-                # If Ollama fails, use template results
-                results['final_improvement'] = results['template_improvement']
-        else:
-            results['final_improvement'] = results['template_improvement']
-        
-        demo_example = {
+
+    engine = PipelineEngine(polish=POLISH_AUTO, on_prepared=announce)
+    demo_examples = []
+    for state in engine.run_iter(questions, batch_size=1):
+        question_data = state['question_data']
+        demo_examples.append({
             'original': {
                 'text': question_data['text'],
                 'lexical_path': question_data['lexical_path'],
-                'type': question_type,
+                'type': question_data['type'],
                 'combined_text': question_data['combined_text']
             },
-            'pipeline_results': results
-        }
-        
-        demo_examples.append(demo_example)
-    
+            'pipeline_results': build_pipeline_results(state)
+        })
+
     return demo_examples
 
 def process_random_questions(num_questions: int = 10, csv_file: str = "questions.csv") -> List[Dict]:
@@ -857,22 +858,34 @@ def test_metrics_comparison():
         print(f"   Questions with improvements: {len(total_improvements)}")
         print(f"   Questions processed: {len(results)}")
 
-def calculate_metrics_for_text(text: str) -> Dict[str, float]:
+def calculate_metrics_for_text(text: str, use_cache: bool = True) -> Dict[str, float]:
     """
     Calculate metrics for a given text.
     
     Args:
         text: The text to evaluate
+        use_cache: Look up and store results in the persistent metrics cache (default: True)
         
     Returns:
         Dictionary with metric scores
     """
+    if use_cache:
+        cached = get_cached_metrics(text)
+        if cached is not None:
+            increment_counter("metrics_cache_hits")
+            return cached
+        increment_counter("metrics_cache_misses")
+    
     try:
         # Calculate individual metrics
-        clarity_score = clarity(text)
-        conciseness_score = conciseness(text)
-        technical_accuracy_score = technical_accuracy(text)
-        actionability_score = actionability(text)
+        with stage_timer("metrics.clarity"):
+            clarity_score = clarity(text)
+        with stage_timer("metrics.conciseness"):
+            conciseness_score = conciseness(text)
+        with stage_timer("metrics.technical_accuracy"):
+            technical_accuracy_score = technical_accuracy(text)
+        with stage_timer("metrics.actionability"):
+            actionability_score = actionability(text)
         
         # Calculate enhanced scores using individual functions
         # Note: These functions might need to be imported or defined differently
@@ -882,7 +895,7 @@ def calculate_metrics_for_text(text: str) -> Dict[str, float]:
         enhanced_technical_accuracy = technical_accuracy_score
         enhanced_actionability = actionability_score
         
-        return {
+        metrics = {
             'clarity': clarity_score,
             'conciseness': conciseness_score,
             'technical_accuracy': technical_accuracy_score,
@@ -892,6 +905,12 @@ def calculate_metrics_for_text(text: str) -> Dict[str, float]:
             'enhanced_technical_accuracy': enhanced_technical_accuracy,
             'enhanced_actionability': enhanced_actionability
         }
+        
+        # Only successful scores are cached; the fallback below is not
+        if use_cache:
+            store_metrics(text, metrics)
+        
+        return metrics
     except Exception as e:
         print(f"⚠️  Error calculating metrics: {e}")
         return {
@@ -905,7 +924,9 @@ def calculate_metrics_for_text(text: str) -> Dict[str, float]:
             'enhanced_actionability': 0.0
         }
 
-def print_metrics_comparison(original_text: str, improved_text: str, question_type: str = ""):
+def print_metrics_comparison(original_text: str, improved_text: str, question_type: str = "",
+                             original_metrics: Optional[Dict[str, float]] = None,
+                             improved_metrics: Optional[Dict[str, float]] = None):
     """
     Print a comparison of metrics between original and improved text.
     
@@ -913,13 +934,17 @@ def print_metrics_comparison(original_text: str, improved_text: str, question_ty
         original_text: The original question text
         improved_text: The template-improved text
         question_type: The type of question (optional)
+        original_metrics: Already computed metrics for original_text (optional)
+        improved_metrics: Already computed metrics for improved_text (optional)
     """
     print(f"\n📊 METRICS COMPARISON {f'({question_type})' if question_type else ''}")
     print("=" * 60)
     
-    # Calculate metrics for both texts
-    original_metrics = calculate_metrics_for_text(original_text)
-    improved_metrics = calculate_metrics_for_text(improved_text)
+    # Calculate metrics for both texts unless the caller already has them
+    if original_metrics is None:
+        original_metrics = calculate_metrics_for_text(original_text)
+    if improved_metrics is None:
+        improved_metrics = calculate_metrics_for_text(improved_text)
     
     # Print original text and metrics
     print(f"📝 ORIGINAL TEXT:")
@@ -980,239 +1005,211 @@ def process_random_questions_with_metrics(num_questions: int = 10, csv_file: str
         List of dictionaries containing processed question data with template matching results and metrics
     """
     questions = get_random_questions_from_csv(num_questions, csv_file)
-    results = []
-    
-    for i, question_data in enumerate(questions, 1):
-        question_text = question_data['combined_text']
-        question_type = question_data['type']
-        
+
+    def show(state: Dict) -> None:
+        question_text = state['question_text']
+        question_type = state['question_type']
         print(f"\n{'='*60}")
-        print(f"📝 QUESTION {i}/{len(questions)}: {question_text[:80]}{'...' if len(question_text) > 80 else ''}")
+        print(f"📝 QUESTION {state['position']}/{len(questions)}: {question_text[:80]}{'...' if len(question_text) > 80 else ''}")
         print(f"   Type: {question_type}")
-        
-        if question_type in PROMPT_TEMPLATES:
-            templates = PROMPT_TEMPLATES[question_type]
-            template, match_obj = match_question_to_template_simple(question_text, templates)
-            
-            if template and match_obj:
-                nicer_text = transform_question_with_template_simple(question_text, template, match_obj)
-                print(f"   ✅ Matched template: {template['original']}")
-                print(f"   🔍 Regex groups: {match_obj.groups()}")
-                
-                # Calculate and display metrics comparison
-                print_metrics_comparison(question_text, nicer_text, question_type)
-                
-                # Calculate improvement
-                original_metrics = calculate_metrics_for_text(question_text)
-                improved_metrics = calculate_metrics_for_text(nicer_text)
-                original_avg = (original_metrics['clarity'] + original_metrics['conciseness'] + 
-                              original_metrics['technical_accuracy'] + original_metrics['actionability']) / 4
-                improved_avg = (improved_metrics['clarity'] + improved_metrics['conciseness'] + 
-                              improved_metrics['technical_accuracy'] + improved_metrics['actionability']) / 4
-                improvement = improved_avg - original_avg
-                
-                result = {
-                    **question_data,
-                    'matched_template': template['original'],
-                    'nicer_text': nicer_text,
-                    'regex_groups': match_obj.groups(),
-                    'matched': True,
-                    'original_metrics': original_metrics,
-                    'improved_metrics': improved_metrics,
-                    'improvement': improvement
-                }
-            else:
-                print(f"   ❌ No template match found")
-                print(f"   📊 Metrics for original text only:")
-                original_metrics = calculate_metrics_for_text(question_text)
-                print(f"      Clarity: {original_metrics['clarity']:.3f}")
-                print(f"      Conciseness: {original_metrics['conciseness']:.3f}")
-                print(f"      Technical Accuracy: {original_metrics['technical_accuracy']:.3f}")
-                print(f"      Actionability: {original_metrics['actionability']:.3f}")
-                
-                result = {
-                    **question_data,
-                    'matched_template': None,
-                    'nicer_text': question_text,
-                    'regex_groups': None,
-                    'matched': False,
-                    'original_metrics': original_metrics,
-                    'improved_metrics': original_metrics,  # Same as original since no improvement
-                    'improvement': 0.0  # No improvement
-                }
+        if state['template_matched']:
+            print(f"   ✅ Matched template: {state['template']['original']}")
+            print(f"   🔍 Regex groups: {state['regex_groups']}")
+            # Display metrics comparison
+            print_metrics_comparison(question_text, state['template_improved_text'], question_type,
+                                     state['original_metrics'], state['template_metrics'])
+            return
+        if state['has_templates']:
+            print(f"   ❌ No template match found")
         else:
             print(f"   ⚠️  No templates for type: {question_type}")
-            print(f"   📊 Metrics for original text only:")
-            original_metrics = calculate_metrics_for_text(question_text)
-            print(f"      Clarity: {original_metrics['clarity']:.3f}")
-            print(f"      Conciseness: {original_metrics['conciseness']:.3f}")
-            print(f"      Technical Accuracy: {original_metrics['technical_accuracy']:.3f}")
-            print(f"      Actionability: {original_metrics['actionability']:.3f}")
-            
-            result = {
-                **question_data,
-                'matched_template': None,
-                'nicer_text': question_text,
-                'regex_groups': None,
-                'matched': False,
-                'original_metrics': original_metrics,
-                'improved_metrics': original_metrics,  # Same as original since no improvement
-                'improvement': 0.0  # No improvement
-            }
-        
-        results.append(result)
+        original_metrics = state['original_metrics']
+        print(f"   📊 Metrics for original text only:")
+        print(f"      Clarity: {original_metrics['clarity']:.3f}")
+        print(f"      Conciseness: {original_metrics['conciseness']:.3f}")
+        print(f"      Technical Accuracy: {original_metrics['technical_accuracy']:.3f}")
+        print(f"      Actionability: {original_metrics['actionability']:.3f}")
+
+    def states() -> Iterator[Dict]:
+        for i, question_data in enumerate(questions, 1):
+            state = PipelineEngine.new_state(question_data['combined_text'], question_data['type'],
+                                             question_data=question_data)
+            state['position'] = i
+            yield state
+
+    results = []
+    for state in PipelineEngine(polish=POLISH_NONE, on_prepared=show).run_iter(states()):
+        results.append({
+            **state['question_data'],
+            'matched_template': state['template']['original'] if state['template_matched'] else None,
+            'nicer_text': state['template_improved_text'],
+            'regex_groups': state['regex_groups'],
+            'matched': state['template_matched'],
+            'original_metrics': state['original_metrics'],
+            'improved_metrics': state['template_metrics'],
+            'improvement': state['template_improvement']
+        })
     
     return results
 
-def process_all_questions_with_metrics(csv_file: str = "questions.csv", sample_size: int = 100) -> Dict:
+def process_all_questions_with_metrics(csv_file: str = "questions.csv", sample_size: Optional[int] = 100,
+                                       keep_results: bool = True,
+                                       shard: Optional[Tuple[int, int]] = None,
+                                       on_result: Optional[Callable[[Dict], None]] = None) -> Dict:
     """
     Process a sample of all questions from CSV and show comprehensive metrics statistics.
     
     Args:
         csv_file: Path to the CSV file (default: "questions.csv")
-        sample_size: Number of questions to sample (default: 100)
+        sample_size: Number of questions to sample (default: 100, None = all questions)
+        keep_results: Keep every per-question result in memory (default: True).
+            Summary statistics are streamed and do not depend on this.
+        shard: (index, count) to only process questions whose id hashes to that shard
+            (see shard_of); sample_size then applies within the shard
+        on_result: Called with each per-question result as soon as it is ready (optional)
     
     Returns:
         Dictionary with comprehensive statistics
     """
-    print(f"\n📊 PROCESSING ALL QUESTIONS WITH METRICS")
-    print("=" * 60)
-    print(f"📋 Sampling {sample_size} questions from {csv_file}")
+    report = get_reporter()
+    report.info(f"\n📊 PROCESSING ALL QUESTIONS WITH METRICS")
+    report.info("=" * 60)
+    report.info(f"📋 Sampling {sample_size if sample_size is not None else 'all'} questions from {csv_file}")
     
     try:
         # Read CSV file
         df = pd.read_csv(csv_file)
-        print(f"📊 Loaded {len(df)} total questions from CSV")
+        report.info(f"📊 Loaded {len(df)} total questions from CSV")
+        
+        if shard is not None:
+            shard_index, num_shards = shard
+            ids = df['id'] if 'id' in df.columns else df.index
+            df = df[[shard_of(question_id, num_shards) == shard_index for question_id in ids]]
+            report.info(f"🧩 Shard {shard_index}/{num_shards}: {len(df)} questions")
         
         # Sample questions
-        if sample_size > len(df):
+        if sample_size is None or sample_size > len(df):
             sample_size = len(df)
         
         sampled_df = df.sample(n=sample_size, random_state=42)
         
-        results = []
-        improvements_by_type = {}
-        
-        for i, (idx, row) in enumerate(sampled_df.iterrows(), 1):
-            # Combine text + lexical_path
-            text = str(row['text']).strip()
-            lexical_path = str(row.get('lexical_path', '')).strip()
-            
-            if lexical_path == 'nan' or lexical_path == '':
-                question_text = text
-            else:
-                question_text = text + " " + lexical_path
-            
-            question_text = question_text.strip()
-            question_type = row.get('type', '')
-            
-            if not question_text or question_text == 'nan':
-                continue
-            
-            # Process with template matching
-            if question_type in PROMPT_TEMPLATES:
-                templates = PROMPT_TEMPLATES[question_type]
-                template, match_obj = match_question_to_template_simple(question_text, templates)
+        def states() -> Iterator[Dict]:
+            for i, (idx, row) in enumerate(sampled_df.iterrows(), 1):
+                # Combine text + lexical_path
+                text = str(row['text']).strip()
+                lexical_path = str(row.get('lexical_path', '')).strip()
                 
-                if template and match_obj:
-                    nicer_text = transform_question_with_template_simple(question_text, template, match_obj)
-                    matched = True
+                if lexical_path == 'nan' or lexical_path == '':
+                    question_text = text
                 else:
-                    nicer_text = question_text
-                    matched = False
-            else:
-                nicer_text = question_text
-                matched = False
-            
-            # Calculate metrics
-            original_metrics = calculate_metrics_for_text(question_text)
-            improved_metrics = calculate_metrics_for_text(nicer_text)
-            
-            # Calculate improvements
-            original_avg = (original_metrics['clarity'] + original_metrics['conciseness'] + 
-                          original_metrics['technical_accuracy'] + original_metrics['actionability']) / 4
-            improved_avg = (improved_metrics['clarity'] + improved_metrics['conciseness'] + 
-                          improved_metrics['technical_accuracy'] + improved_metrics['actionability']) / 4
-            improvement = improved_avg - original_avg
+                    question_text = text + " " + lexical_path
+                
+                question_text = question_text.strip()
+                if not question_text or question_text == 'nan':
+                    continue
+                state = PipelineEngine.new_state(question_text, row.get('type', ''),
+                                                 question_data={'id': row.get('id', idx)})
+                state['position'] = i
+                yield state
+        
+        results = []
+        summary = ImprovementStats()
+        matched_count = 0
+        
+        for state in PipelineEngine(polish=POLISH_NONE).run_iter(states()):
+            question_type = state['question_type']
+            matched = state['template_matched']
+            improvement = state['template_improvement']
             
             result = {
-                'id': row.get('id', idx),
-                'original_text': question_text,
-                'improved_text': nicer_text,
+                'id': state['question_data']['id'],
+                'original_text': state['input_text'],
+                'improved_text': state['template_improved_text'],
                 'type': question_type,
                 'matched': matched,
-                'original_metrics': original_metrics,
-                'improved_metrics': improved_metrics,
+                'original_metrics': state['original_metrics'],
+                'improved_metrics': state['template_metrics'],
                 'improvement': improvement
             }
-            results.append(result)
-            
-            # Track improvements by type
-            if question_type not in improvements_by_type:
-                improvements_by_type[question_type] = []
-            improvements_by_type[question_type].append(improvement)
+            if keep_results:
+                results.append(result)
+            if on_result is not None:
+                on_result(result)
             
-            # Check for error traceback
-            if result.get('error_traceback') and str(result['error_traceback']).strip() != '':
-                # Track error tracebacks if needed
-                pass
+            # Track improvements overall (matched only) and by type (all questions)
+            summary.count_question(question_type)
+            summary.add('final', improvement, question_type)
+            summary.add_score('final', state['template_enhanced_score'], question_type)
+            if matched:
+                matched_count += 1
+                summary.add('template', improvement, question_type)
             
-            # Progress indicator
-            if i % 10 == 0:
-                print(f"   Processed {i}/{sample_size} questions...")
+            report.progress(state['position'], sample_size)
         
         # Calculate overall statistics
-        all_improvements = [r['improvement'] for r in results if r['matched']]
-        matched_count = sum(1 for r in results if r['matched'])
+        total_processed = summary.total_questions
+        matched_improvements = summary.stage('template')
+        improvements_by_type = {
+            question_type: type_stages['final']
+            for question_type, type_stages in summary.by_type.items()
+        }
         
-        print(f"\n📈 COMPREHENSIVE METRICS SUMMARY")
-        print("=" * 60)
-        print(f"📊 Overall Statistics:")
-        print(f"   Total questions processed: {len(results)}")
-        print(f"   Questions matched with templates: {matched_count}")
-        print(f"   Match rate: {matched_count/len(results)*100:.1f}%")
+        report.info(f"\n📈 COMPREHENSIVE METRICS SUMMARY")
+        report.info("=" * 60)
+        report.info(f"📊 Overall Statistics:")
+        report.info(f"   Total questions processed: {total_processed}")
+        report.info(f"   Questions matched with templates: {matched_count}")
+        report.info(f"   Match rate: {matched_count/total_processed*100 if total_processed else 0:.1f}%")
         
-        if all_improvements:
-            avg_improvement = sum(all_improvements) / len(all_improvements)
-            max_improvement = max(all_improvements)
-            min_improvement = min(all_improvements)
-            positive_improvements = sum(1 for imp in all_improvements if imp > 0)
-            
-            print(f"   Average improvement (matched questions): {avg_improvement:+.3f}")
-            print(f"   Best improvement: {max_improvement:+.3f}")
-            print(f"   Worst improvement: {min_improvement:+.3f}")
-            print(f"   Questions with positive improvement: {positive_improvements}/{len(all_improvements)}")
-            print(f"   Positive improvement rate: {positive_improvements/len(all_improvements)*100:.1f}%")
+        if matched_improvements.count:
+            report.info(f"   Average improvement (matched questions): {matched_improvements.mean:+.3f}")
+            report.info(f"   Best improvement: {matched_improvements.max:+.3f}")
+            report.info(f"   Worst improvement: {matched_improvements.min:+.3f}")
+            report.info(f"   Questions with positive improvement: {matched_improvements.positive}/{matched_improvements.count}")
+            report.info(f"   Positive improvement rate: {matched_improvements.positive_rate:.1f}%")
         
         # Show improvements by question type
-        print(f"\n📋 Improvements by Question Type:")
+        report.info(f"\n📋 Improvements by Question Type:")
         for question_type, improvements in improvements_by_type.items():
-            if improvements:
-                type_matched = len(improvements)
-                type_avg_improvement = sum(improvements) / len(improvements)
-                type_positive = sum(1 for imp in improvements if imp > 0)
-                
-                print(f"   {question_type}:")
-                print(f"      Count: {type_matched}")
-                print(f"      Avg improvement: {type_avg_improvement:+.3f}")
-                print(f"      Positive rate: {type_positive/type_matched*100:.1f}%")
+            if improvements.count:
+                report.info(f"   {question_type}:")
+                report.info(f"      Count: {improvements.count}")
+                report.info(f"      Avg improvement: {improvements.mean:+.3f}")
+                report.info(f"      Positive rate: {improvements.positive_rate:.1f}%")
         
         return {
-            'total_processed': len(results),
+            'total_processed': total_processed,
             'matched_count': matched_count,
-            'match_rate': matched_count/len(results)*100 if results else 0,
-            'avg_improvement': avg_improvement if all_improvements else 0,
+            'match_rate': matched_count/total_processed*100 if total_processed else 0,
+            'avg_improvement': matched_improvements.mean if matched_improvements.count else 0,
             'improvements_by_type': improvements_by_type,
+            'improvement_stats': summary,
             'results': results
         }
         
     except FileNotFoundError:
-        print(f"❌ Error: {csv_file} file not found")
+        report.error(f"❌ Error: {csv_file} file not found")
         return {}
     except Exception as e:
-        print(f"❌ Error processing CSV: {e}")
+        report.error(f"❌ Error processing CSV: {e}")
         return {}
 
+# Shared by every thread so identical concurrent polish requests run once
+_polish_flight = SingleFlight()
+
+# Streamed and pooled results use build_polish_prompt, so they are cached under their own version
+STREAM_PROMPT_VERSION = f"{POLISH_PROMPT_VERSION}-stream1"
+
+# Polishing backends for polish_low_scoring_questions
+POLISH_BACKEND_POOL = "pool"             # build_polish_prompt through ollama_client (endpoint pool, hedging)
+POLISH_BACKEND_LOCAL = "local_polisher"  # local_polisher.polish_question_with_fallback (single host, no pool)
+POLISH_BACKEND = os.environ.get("POLISH_BACKEND", POLISH_BACKEND_POOL)
+
+# Polishing paths, each with its own prompt (see accepted_prompt_versions)
+POLISH_PATH_SINGLE = "single"  # polish_low_scoring_questions
+POLISH_PATH_STREAM = "stream"  # stream_polish_low_scoring_question
+POLISH_PATH_BATCH = "batch"    # batch_polisher multi-question prompts
+
 def should_polish_with_ollama(metrics: Dict[str, float], threshold: float = 9.0) -> bool:
     """
     Determine if a question should be polished with Ollama based on its metrics.
@@ -1234,29 +1231,17 @@ def should_polish_with_ollama(metrics: Dict[str, float], threshold: float = 9.0)
     
     return enhanced_score < threshold
 
-def polish_low_scoring_questions(question_text: str, template_metrics: Dict[str, float], 
-                               question_type: str = "", error_traceback: str = "") -> str:
+def build_polish_diagnostics(template_metrics: Dict[str, float], error_traceback: str = "") -> Dict:
     """
-    Automatically polish questions with template-enhanced scores below 9.0 using Ollama.
+    Build the diagnostics dictionary passed to Ollama along with a question.
     
     Args:
-        question_text: The template-improved question text
         template_metrics: Dictionary of template-improved metric scores
-        question_type: Type of question (optional)
         error_traceback: Error traceback if available (optional)
         
     Returns:
-        Polished question text or original if polishing fails
+        Dictionary with the four metric scores, the enhanced score and the error traceback
     """
-    if not OLLAMA_AVAILABLE or not polish_question_with_fallback:
-        print("   ⚠️  Ollama not available for polishing")
-        return question_text
-    
-    # Check if enhanced score is below threshold
-    if not should_polish_with_ollama(template_metrics, threshold=9.0):
-        return question_text
-    
-    # Calculate enhanced score for display
     enhanced_score = sum([
         template_metrics.get('clarity', 0.0),
         template_metrics.get('conciseness', 0.0),
@@ -1264,10 +1249,7 @@ def polish_low_scoring_questions(question_text: str, template_metrics: Dict[str,
         template_metrics.get('actionability', 0.0)
     ]) / 4
     
-    print(f"   🔧 Polishing with Ollama (template enhanced score {enhanced_score:.3f} below 9.0)")
-    
-    # Prepare diagnostics for Ollama
-    diagnostics = {
+    return {
         "clarity_score": template_metrics.get('clarity', 0.0),
         "conciseness_score": template_metrics.get('conciseness', 0.0),
         "technical_accuracy_score": template_metrics.get('technical_accuracy', 0.0),
@@ -1275,160 +1257,484 @@ def polish_low_scoring_questions(question_text: str, template_metrics: Dict[str,
         "enhanced_score": enhanced_score,
         "error_traceback": error_traceback
     }
+
+def build_polish_prompt(question_text: str, diagnostics: Dict, question_type: str = "") -> str:
+    """
+    Build the single-question prompt used for streamed polishing.
+    
+    Args:
+        question_text: The template-improved question text
+        diagnostics: Dictionary from build_polish_diagnostics
+        question_type: Type of question (optional)
+        
+    Returns:
+        Prompt text
+    """
+    lines = [
+        "Rewrite the following support question so it is clear, concise, technically accurate and actionable.",
+        "Keep the original meaning and every concrete detail (names, values, error messages).",
+        "Current scores out of 10: clarity {:.1f}, conciseness {:.1f}, technical accuracy {:.1f}, actionability {:.1f}. Focus on the lowest ones.".format(
+            diagnostics.get('clarity_score', 0.0),
+            diagnostics.get('conciseness_score', 0.0),
+            diagnostics.get('technical_accuracy_score', 0.0),
+            diagnostics.get('actionability_score', 0.0)
+        )
+    ]
+    if question_type:
+        lines.append(f"Question type: {question_type}")
+    if diagnostics.get('error_traceback'):
+        lines.append(f"Error: {diagnostics['error_traceback']}")
+    lines.append(f"Question: {cap_prompt_text(question_text)}")
+    lines.append("Reply with only the improved question.")
+    return "\n".join(lines)
+
+def clean_polished_text(text: str) -> str:
+    """Strip whitespace, wrapping quotes and a leading label from a model answer."""
+    text = re.sub(r'^\s*(improved question|question)\s*:\s*', '', text.strip(), flags=re.IGNORECASE)
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in '"\'':
+        text = text[1:-1].strip()
+    return text
+
+def stream_polish_low_scoring_question(question_text: str, template_metrics: Dict[str, float],
+                                       question_type: str = "", error_traceback: str = "",
+                                       force: bool = False) -> Iterator[str]:
+    """
+    Streaming variant of polish_low_scoring_questions for interactive use.
+    
+    Yields the model output as it is generated; the caller joins the chunks
+    and applies clean_polished_text. Yields nothing when no polishing is
+    needed or possible, and the whole cached text at once on a cache hit.
+    Shares in-flight calls with polish_low_scoring_questions: if the same
+    text is already being polished, the finished text is yielded in one chunk.
+    
+    Args:
+        question_text: The template-improved question text
+        template_metrics: Dictionary of template-improved metric scores
+        question_type: Type of question (optional)
+        error_traceback: Error traceback if available (optional)
+        force: Polish even if the enhanced score is at or above 9.0
+        
+    Yields:
+        Generated text chunks
+    """
+    def finalize(chunks: List[str]) -> str:
+        # Same result type as _polish_low_scoring_question: the polished or the original text
+        return clean_polished_text("".join(chunks)) or question_text
+    
+    yield from _polish_flight.do_stream(
+        (polish_key(question_text, question_type), force), _stream_polish_low_scoring_question, finalize,
+        question_text, template_metrics, question_type, error_traceback, force
+    )
+
+def _stream_polish_low_scoring_question(question_text: str, template_metrics: Dict[str, float],
+                                        question_type: str = "", error_traceback: str = "",
+                                        force: bool = False) -> Iterator[str]:
+    """
+    Uncoalesced implementation of stream_polish_low_scoring_question.
+    
+    Args:
+        question_text: The template-improved question text
+        template_metrics: Dictionary of template-improved metric scores
+        question_type: Type of question (optional)
+        error_traceback: Error traceback if available (optional)
+        force: Polish even if the enhanced score is at or above 9.0
+        
+    Yields:
+        Generated text chunks
+    """
+    if not force and not should_polish_with_ollama(template_metrics, threshold=9.0):
+        return
+    
+    cached_text = get_cached_polish_for_path(question_text, question_type, POLISH_PATH_STREAM)
+    if cached_text is not None:
+        yield cached_text
+        return
+    
+    if not allow_polish():
+        return
+    
+    diagnostics = build_polish_diagnostics(template_metrics, error_traceback)
+    prompt = build_polish_prompt(question_text, diagnostics, question_type)
+    
+    parts = []
+    start = time.perf_counter()
+    try:
+        for chunk in generate_stream(prompt):
+            parts.append(chunk)
+            yield chunk
+    except GeneratorExit:
+        # Client went away mid-stream; says nothing about server health
+        record_polish_result(False, 0.0)
+        raise
+    except Exception as e:
+        record_polish_failure(str(e))
+        raise
+    
+    polished_text = clean_polished_text("".join(parts))
+    changed = bool(polished_text) and polished_text != question_text
+    record_polish_result(changed, time.perf_counter() - start)
+    if changed:
+        store_polish(question_text, polished_text, question_type, model=polish_model_for(STREAM_PROMPT_VERSION),
+                     prompt_version=STREAM_PROMPT_VERSION)
+
+def polish_low_scoring_questions(question_text: str, template_metrics: Dict[str, float], 
+                               question_type: str = "", error_traceback: str = "",
+                               force: bool = False) -> str:
+    """
+    Automatically polish questions with template-enhanced scores below 9.0 using Ollama.
+    
+    Concurrent calls for the same text and question type (e.g. several users
+    polishing the same question) share one Ollama request and its outcome.
+    
+    Args:
+        question_text: The template-improved question text
+        template_metrics: Dictionary of template-improved metric scores
+        question_type: Type of question (optional)
+        error_traceback: Error traceback if available (optional)
+        force: Polish even if the enhanced score is at or above 9.0
+        
+    Returns:
+        Polished question text or original if polishing fails
+    """
+    return _polish_flight.do(
+        (polish_key(question_text, question_type), force),
+        _polish_low_scoring_question,
+        question_text, template_metrics, question_type, error_traceback, force
+    )
+
+def polish_via_endpoint_pool(question_text: str, diagnostics: Dict, question_type: str = "") -> str:
+    """
+    Polish one question with build_polish_prompt through the Ollama endpoint pool.
+    
+    Args:
+        question_text: The template-improved question text
+        diagnostics: Dictionary from build_polish_diagnostics
+        question_type: Type of question (optional)
+        
+    Returns:
+        The polished text, or question_text if the model returned nothing usable
+        
+    Raises:
+        requests.RequestException: If every endpoint fails
+    """
+    return clean_polished_text(generate(build_polish_prompt(question_text, diagnostics, question_type))) or question_text
+
+def _polish_via_local_polisher(question_text: str, diagnostics: Dict, question_type: str = "") -> str:
+    """Polish with local_polisher, sending it the prompt-capped text (its fallback is the uncapped original)."""
+    prompt_text = cap_prompt_text(question_text)
+    polished_text = polish_question_with_fallback(prompt_text, diagnostics)
+    return question_text if polished_text == prompt_text else polished_text
+
+def _get_polish_backend() -> Tuple[Optional[Callable[[str, Dict, str], str]], str]:
+    """The configured polish function (None if unavailable) and the prompt version its results are cached under."""
+    if POLISH_BACKEND == POLISH_BACKEND_LOCAL:
+        if not OLLAMA_AVAILABLE or not polish_question_with_fallback:
+            return None, POLISH_PROMPT_VERSION
+        return _polish_via_local_polisher, POLISH_PROMPT_VERSION
+    return (polish_via_endpoint_pool if REQUESTS_AVAILABLE else None), STREAM_PROMPT_VERSION
+
+def accepted_prompt_versions(path: str = POLISH_PATH_SINGLE) -> List[str]:
+    """
+    Prompt versions whose cached polishes a polishing path may serve, its own version first.
+    
+    Single polishes use the active backend's prompt (see _get_polish_backend);
+    streamed polishes always use build_polish_prompt. Batch prompts also accept
+    single-polish results, since items a batch drops are retried one at a time.
+    
+    Args:
+        path: One of POLISH_PATH_SINGLE, POLISH_PATH_STREAM, POLISH_PATH_BATCH
+    """
+    if path == POLISH_PATH_STREAM:
+        return [STREAM_PROMPT_VERSION]
+    backend_version = _get_polish_backend()[1]
+    if path == POLISH_PATH_BATCH:
+        return [BATCH_PROMPT_VERSION, backend_version]
+    return [backend_version]
+
+def polish_model_for(prompt_version: str) -> str:
+    """Model that produces polishes under a prompt version: local_polisher's for its prompt, else ollama_client's."""
+    return LOCAL_POLISHER_MODEL if prompt_version == POLISH_PROMPT_VERSION else POLISH_CACHE_OLLAMA_MODEL
+
+def get_cached_polish_for_path(question_text: str, question_type: str, path: str = POLISH_PATH_SINGLE) -> Optional[str]:
+    """First cached polish of question_text under any prompt version the path accepts (None on a miss)."""
+    for prompt_version in accepted_prompt_versions(path):
+        cached_text = get_cached_polish(question_text, question_type, model=polish_model_for(prompt_version),
+                                        prompt_version=prompt_version)
+        if cached_text is not None:
+            return cached_text
+    return None
+
+def get_polish_flight_stats() -> Dict:
+    """Counts of polish calls that ran versus ones that joined an identical in-flight call."""
+    return _polish_flight.stats()
+
+def _polish_low_scoring_question(question_text: str, template_metrics: Dict[str, float],
+                                 question_type: str, error_traceback: str, force: bool = False) -> str:
+    """Uncoalesced implementation of polish_low_scoring_questions."""
+    report = get_reporter()
+    # Check if enhanced score is below threshold
+    if not force and not should_polish_with_ollama(template_metrics, threshold=9.0):
+        return question_text
     
+    polish_fn, prompt_version = _get_polish_backend()
+    
+    # Repeated template outputs were usually polished in an earlier run
+    cached_text = get_cached_polish_for_path(question_text, question_type, POLISH_PATH_SINGLE)
+    if cached_text is not None:
+        increment_counter("polish_cache_hits")
+        report.detail(f"   ♻️  Using cached Ollama polish")
+        return cached_text
+    
+    if polish_fn is None:
+        report.detail("   ⚠️  Ollama not available for polishing")
+        return question_text
+    
+    # Skip immediately while Ollama is known to be down or timing out
+    if not allow_polish():
+        report.detail("   ⏭️  Ollama circuit open - skipping polishing")
+        return question_text
+    
+    # Prepare diagnostics for Ollama
+    diagnostics = build_polish_diagnostics(template_metrics, error_traceback)
+    
+    if force and not should_polish_with_ollama(template_metrics, threshold=9.0):
+        report.detail(f"   🔧 Polishing with Ollama on request (template enhanced score {diagnostics['enhanced_score']:.3f})")
+    else:
+        report.detail(f"   🔧 Polishing with Ollama (template enhanced score {diagnostics['enhanced_score']:.3f} below 9.0)")
+    
+    start = time.perf_counter()
     try:
         # Try to polish with Ollama
-        polished_text = polish_question_with_fallback(question_text, diagnostics)
+        with stage_timer("ollama", question_type):
+            polished_text = polish_fn(question_text, diagnostics, question_type)
+        record_polish_result(polished_text != question_text, time.perf_counter() - start)
         
         if polished_text != question_text:
-            print(f"   ✅ Ollama polishing successful")
+            report.detail(f"   ✅ Ollama polishing successful")
+            store_polish(question_text, polished_text, question_type, model=polish_model_for(prompt_version),
+                         prompt_version=prompt_version)
             return polished_text
         else:
-            print(f"   ⚠️  Ollama polishing returned original text")
+            report.detail(f"   ⚠️  Ollama polishing returned original text")
             return question_text
             
     except Exception as e:
-        print(f"   ❌ Ollama polishing failed: {e}")
+        record_polish_failure(str(e))
+        report.detail(f"   ❌ Ollama polishing failed: {e}")
         return question_text
 
-def process_random_questions_with_ollama_polishing(num_questions: int = 10, csv_file: str = "questions.csv") -> List[Dict]:
+def _show_prepared_question(state: Dict, total: int) -> None:
+    """
+    Print the template stage and the polishing decision for one question.
+    
+    Args:
+        state: PipelineEngine state after the CPU stages (with 'position')
+        total: Total number of questions (for display)
+    """
+    report = get_reporter()
+    if not report.enabled(DETAIL):
+        return
+    
+    question_text = state['question_text']
+    question_type = state['question_type']
+    template_metrics = state['template_metrics']
+    template_enhanced_score = state['template_enhanced_score']
+    
+    report.detail(f"\n{'='*60}")
+    report.detail(f"📝 QUESTION {state['position']}/{total}: {question_text[:80]}{'...' if len(question_text) > 80 else ''}")
+    report.detail(f"   Type: {question_type}")
+    
+    if state['template_matched']:
+        report.detail(f"   ✅ Template matched: {state['template']['original']}")
+        report.detail(f"   🔍 Regex groups: {state['regex_groups']}")
+    elif state['has_templates']:
+        report.detail(f"   ❌ No template match found")
+    else:
+        report.detail(f"   ⚠️  No templates for type: {question_type}")
+    
+    if not state['template_matched']:
+        report.detail(f"   🔧 No template matched - forcing Ollama polishing")
+    elif state['needs_polish']:
+        report.detail(f"   📊 Template enhanced score {template_enhanced_score:.3f} below 9.0 threshold:")
+        for metric, score in template_metrics.items():
+            if metric in ['clarity', 'conciseness', 'technical_accuracy', 'actionability']:
+                report.detail(f"      {metric}: {score:.3f}")
+    else:
+        report.detail(f"   ✅ Template enhanced score {template_enhanced_score:.3f} above 9.0 threshold - no Ollama polishing needed")
+
+def _show_polished_question(state: Dict) -> None:
+    """Print the metrics comparison for a finished question."""
+    report = get_reporter()
+    original_metrics = state['original_metrics']
+    template_metrics = state['template_metrics']
+    final_metrics = state['final_metrics']
+    
+    report.detail(f"\n📊 METRICS COMPARISON:")
+    report.detail(f"   📝 Original: {state['question_text']}")
+    report.detail(f"   📈 Original Metrics: Clarity={original_metrics['clarity']:.3f}, Conciseness={original_metrics['conciseness']:.3f}, Technical={original_metrics['technical_accuracy']:.3f}, Actionability={original_metrics['actionability']:.3f}")
+    
+    if state['template_matched']:
+        report.detail(f"   ✨ Template Improved: {state['template_improved_text']}")
+        report.detail(f"   📈 Template Metrics: Clarity={template_metrics['clarity']:.3f}, Conciseness={template_metrics['conciseness']:.3f}, Technical={template_metrics['technical_accuracy']:.3f}, Actionability={template_metrics['actionability']:.3f}")
+        report.detail(f"   📈 Template Enhanced Score: {state['template_enhanced_score']:.3f}")
+        report.detail(f"   📈 Template Improvement: {state['template_improvement']:+.3f}")
+    
+    if state['ollama_used']:
+        report.detail(f"   🤖 Ollama Improved: {state['ollama_improved_text']}")
+        report.detail(f"   📈 Final Metrics: Clarity={final_metrics['clarity']:.3f}, Conciseness={final_metrics['conciseness']:.3f}, Technical={final_metrics['technical_accuracy']:.3f}, Actionability={final_metrics['actionability']:.3f}")
+        report.detail(f"   📈 Final Improvement: {state['final_improvement']:+.3f}")
+        report.detail(f"   📈 Ollama Additional Improvement: {state['ollama_additional_improvement']:+.3f}")
+
+def _finalize_polished_question(state: Dict) -> Dict:
+    """
+    Report a finished question (metrics comparison and JSON event) and build its result dictionary.
+    
+    Args:
+        state: Final PipelineEngine state
+    
+    Returns:
+        Result dictionary as returned by process_random_questions_with_ollama_polishing
+    """
+    original_metrics = state['original_metrics']
+    template_metrics = state['template_metrics']
+    final_metrics = state['final_metrics']
+    report = get_reporter()
+    report.event('question', id=state['question_data'].get('id'), type=state['question_type'],
+                 template_matched=state['template_matched'], ollama_used=state['ollama_used'],
+                 polish_deferred=state['polish_deferred'],
+                 original_enhanced_score=state['original_enhanced_score'],
+                 final_enhanced_score=state['final_enhanced_score'],
+                 template_improvement=state['template_improvement'],
+                 final_improvement=state['final_improvement'])
+    
+    if report.enabled(DETAIL):
+        _show_polished_question(state)
+    
+    return {
+        **state['question_data'],
+        'original_metrics': original_metrics,
+        'template_improved_text': state['template_improved_text'],
+        'template_metrics': template_metrics,
+        'template_enhanced_score': state['template_enhanced_score'],
+        'template_matched': state['template_matched'],
+        'ollama_improved_text': state['ollama_improved_text'],
+        'final_metrics': final_metrics,
+        'ollama_used': state['ollama_used'],
+        'template_improvement': state['template_improvement'],
+        'final_improvement': state['final_improvement'],
+        'ollama_additional_improvement': state['ollama_additional_improvement'],
+        'preprocessing': state['preprocessing'],
+        'polish_deferred': state['polish_deferred']
+    }
+
+def process_random_questions_with_ollama_polishing(num_questions: int = 10, csv_file: str = "questions.csv",
+                                                   concurrency: int = 1,
+                                                   polish_timeout: Optional[float] = None,
+                                                   batch_size: int = 1,
+                                                   polish_budget_calls: Optional[int] = POLISH_BUDGET_CALLS,
+                                                   polish_budget_seconds: Optional[float] = POLISH_BUDGET_SECONDS,
+                                                   per_type_quota: Optional[int] = POLISH_PER_TYPE_QUOTA,
+                                                   deferred_path: Optional[str] = None,
+                                                   staged: bool = False,
+                                                   cpu_workers: int = STAGE_CPU_WORKERS) -> List[Dict]:
     """
     Process random questions with automatic Ollama polishing for low-scoring questions.
     
     Args:
         num_questions: Number of random questions to process
         csv_file: Path to the CSV file
+        concurrency: Number of Ollama requests in flight at once (default: 1 = one question at a time)
+        polish_timeout: Per-request polishing timeout in seconds for concurrent runs
+            (default: POLISH_TIMEOUT from async_polisher)
+        batch_size: Number of short questions packed into one Ollama prompt (default: 1 = no batching)
+        polish_budget_calls: Maximum questions sent for polishing (default: POLISH_BUDGET_CALLS, None = unlimited)
+        polish_budget_seconds: Wall-clock budget for polishing (default: POLISH_BUDGET_SECONDS, None = unlimited)
+        per_type_quota: Questions per type polished before other types get priority
+            (default: POLISH_PER_TYPE_QUOTA, None = no quota)
+        deferred_path: JSON file listing the questions the budget did not cover (optional)
+        staged: Run matching/scoring on a process pool and polishing on `concurrency` threads,
+            connected by bounded queues (see staged_runner; ignored when a budget is set)
+        cpu_workers: Processes for the matching and scoring stages in staged mode
+    
+    With a budget, candidates are polished lowest enhanced score first and
+    the rest are marked 'polish_deferred'.
     
     Returns:
         List of dictionaries containing processed question data with Ollama polishing results
     """
+    report = get_reporter()
     questions = get_random_questions_from_csv(num_questions, csv_file)
-    results = []
-    
+    pending_states = []
     for i, question_data in enumerate(questions, 1):
-        question_text = question_data['combined_text']
-        question_type = question_data['type']
-        error_traceback = question_data.get('error_traceback', '')
-        
-        print(f"\n{'='*60}")
-        print(f"📝 QUESTION {i}/{len(questions)}: {question_text[:80]}{'...' if len(question_text) > 80 else ''}")
-        print(f"   Type: {question_type}")
-        
-        # Calculate original metrics
-        original_metrics = calculate_metrics_for_text(question_text)
-        
-        # Check if template matching is available
-        template_improved_text = question_text
-        template_matched = False
-        
-        if question_type in PROMPT_TEMPLATES:
-            templates = PROMPT_TEMPLATES[question_type]
-            template, match_obj = match_question_to_template_simple(question_text, templates)
-            
-            if template and match_obj:
-                template_improved_text = transform_question_with_template_simple(question_text, template, match_obj)
-                template_matched = True
-                print(f"   ✅ Template matched: {template['original']}")
-                print(f"   🔍 Regex groups: {match_obj.groups()}")
-            else:
-                print(f"   ❌ No template match found")
-        else:
-            print(f"   ⚠️  No templates for type: {question_type}")
-        
-        # Calculate template-improved metrics
-        template_metrics = calculate_metrics_for_text(template_improved_text)
-        
-        # Calculate template enhanced score
-        template_enhanced_score = sum([
-            template_metrics.get('clarity', 0.0),
-            template_metrics.get('conciseness', 0.0),
-            template_metrics.get('technical_accuracy', 0.0),
-            template_metrics.get('actionability', 0.0)
-        ]) / 4
-        
-        # Check if Ollama polishing is needed based on template-enhanced score
-        ollama_improved_text = template_improved_text
-        ollama_used = False
-        
-        # FIRST check if no template matched
-        if not template_matched:
-            print(f"   🔧 No template matched - forcing Ollama polishing")
-            ollama_improved_text = polish_low_scoring_questions(
-                template_improved_text, 
-                template_metrics, 
-                question_type, 
-                error_traceback
-            )
-            ollama_used = (ollama_improved_text != template_improved_text)
-        # SECOND check if template matched but score is low
-        elif should_polish_with_ollama(template_metrics, threshold=9.0):
-            print(f"   📊 Template enhanced score {template_enhanced_score:.3f} below 9.0 threshold:")
-            for metric, score in template_metrics.items():
-                if metric in ['clarity', 'conciseness', 'technical_accuracy', 'actionability']:
-                    print(f"      {metric}: {score:.3f}")
-            
-            ollama_improved_text = polish_low_scoring_questions(
-                template_improved_text, 
-                template_metrics, 
-                question_type, 
-                error_traceback
-            )
-            ollama_used = (ollama_improved_text != template_improved_text)
-        else:
-            print(f"   ✅ Template enhanced score {template_enhanced_score:.3f} above 9.0 threshold - no Ollama polishing needed")
-        
-        # Calculate final metrics
-        final_metrics = calculate_metrics_for_text(ollama_improved_text)
-        
-        # Calculate improvements
-        template_improvement = sum([
-            template_metrics.get('clarity', 0) - original_metrics.get('clarity', 0),
-            template_metrics.get('conciseness', 0) - original_metrics.get('conciseness', 0),
-            template_metrics.get('technical_accuracy', 0) - original_metrics.get('technical_accuracy', 0),
-            template_metrics.get('actionability', 0) - original_metrics.get('actionability', 0)
-        ]) / 4
-        
-        final_improvement = sum([
-            final_metrics.get('clarity', 0) - original_metrics.get('clarity', 0),
-            final_metrics.get('conciseness', 0) - original_metrics.get('conciseness', 0),
-            final_metrics.get('technical_accuracy', 0) - original_metrics.get('technical_accuracy', 0),
-            final_metrics.get('actionability', 0) - original_metrics.get('actionability', 0)
-        ]) / 4
-        
-        # Display metrics comparison
-        print(f"\n📊 METRICS COMPARISON:")
-        print(f"   📝 Original: {question_text}")
-        print(f"   📈 Original Metrics: Clarity={original_metrics['clarity']:.3f}, Conciseness={original_metrics['conciseness']:.3f}, Technical={original_metrics['technical_accuracy']:.3f}, Actionability={original_metrics['actionability']:.3f}")
-        
-        if template_matched:
-            print(f"   ✨ Template Improved: {template_improved_text}")
-            print(f"   📈 Template Metrics: Clarity={template_metrics['clarity']:.3f}, Conciseness={template_metrics['conciseness']:.3f}, Technical={template_metrics['technical_accuracy']:.3f}, Actionability={template_metrics['actionability']:.3f}")
-            print(f"   📈 Template Enhanced Score: {template_enhanced_score:.3f}")
-            print(f"   📈 Template Improvement: {template_improvement:+.3f}")
-        
-        if ollama_used:
-            print(f"   🤖 Ollama Improved: {ollama_improved_text}")
-            print(f"   📈 Final Metrics: Clarity={final_metrics['clarity']:.3f}, Conciseness={final_metrics['conciseness']:.3f}, Technical={final_metrics['technical_accuracy']:.3f}, Actionability={final_metrics['actionability']:.3f}")
-            print(f"   📈 Final Improvement: {final_improvement:+.3f}")
-            print(f"   📈 Ollama Additional Improvement: {final_improvement - template_improvement:+.3f}")
-        
-        result = {
-            **question_data,
-            'original_metrics': original_metrics,
-            'template_improved_text': template_improved_text,
-            'template_metrics': template_metrics,
-            'template_enhanced_score': template_enhanced_score,
-            'template_matched': template_matched,
-            'ollama_improved_text': ollama_improved_text,
-            'final_metrics': final_metrics,
-            'ollama_used': ollama_used,
-            'template_improvement': template_improvement,
-            'final_improvement': final_improvement,
-            'ollama_additional_improvement': final_improvement - template_improvement if ollama_used else 0.0
-        }
-        
-        results.append(result)
+        state = PipelineEngine.state_from_question(question_data)
+        state['position'] = i
+        pending_states.append(state)
+    
+    budgeted = any(limit is not None for limit in (polish_budget_calls, polish_budget_seconds, per_type_quota))
+    timeout = polish_timeout if polish_timeout is not None else POLISH_TIMEOUT
+    
+    def polish_wave(wave: List[Dict], remaining_seconds: Optional[float]) -> List[Dict]:
+        if remaining_seconds is None:
+            return make_polish_executor(concurrency, batch_size, timeout)(wave)
+        wave_timeout = max(1.0, min(timeout, remaining_seconds))
+        return make_polish_executor(concurrency, batch_size, wave_timeout,
+                                    deadline=time.perf_counter() + remaining_seconds)(wave)
     
+    scheduler = PolishScheduler(polish_budget_calls, polish_budget_seconds, per_type_quota) if budgeted else None
+    scheduled_requests: List[Dict] = []
+    
+    def polish_stage(requests: List[Dict]) -> List[Optional[Dict]]:
+        if scheduler is None:
+            return polish_wave(requests, None)
+        scheduled_requests[:] = requests
+        return scheduler.run(requests, polish_wave, wave_size=max(1, concurrency) * max(1, batch_size))
+    
+    engine = PipelineEngine(
+        polish=POLISH_AUTO,
+        polish_executor=polish_stage,
+        on_prepared=lambda state: _show_prepared_question(state, len(questions))
+    )
+    
+    if staged and not budgeted:
+        # Producer/consumer mode: results are printed in order as soon as each one is ready
+        runner = StagedRunner(polish=POLISH_AUTO, cpu_workers=cpu_workers, polish_workers=concurrency,
+                              polish_executor=lambda requests: polish_wave(requests, None))
+        results = []
+        for state in runner.run(pending_states):
+            _show_prepared_question(state, len(questions))
+            results.append(_finalize_polished_question(state))
+            report.progress(len(results), len(questions))
+        if report.enabled(NORMAL):
+            print_stage_stats(runner.stats())
+        return results
+    if staged:
+        report.info("⚠️  Staged mode needs every candidate up front for a polish budget - running batched instead")
+    
+    if concurrency <= 1 and batch_size <= 1 and not budgeted:
+        # One question at a time, printing each result as it finishes
+        results = []
+        for state in engine.run_iter(pending_states, batch_size=1):
+            results.append(_finalize_polished_question(state))
+            report.progress(len(results), len(questions))
+        return results
+    
+    # Concurrent/batched/budgeted mode: run the CPU stages, polish the candidates together, then re-score in order
+    states = engine.run_batch(pending_states)
+    
+    if scheduler is not None:
+        summary = scheduler.summary()
+        report.info(f"\n⏱️  Polish budget: {summary['calls']} questions polished in {summary['elapsed']:.1f}s,"
+              f" {summary['deferred']} deferred, {summary['skipped']} already at 9.0 or above" + (f" ({summary['stop_reason']} exhausted)" if summary['stop_reason'] else ""))
+        if deferred_path:
+            scheduler.save_deferred(deferred_path, [
+                {'id': scheduled_requests[item['index']].get('question_id')} for item in scheduler.deferred
+            ])
+            report.info(f"💾 Deferred questions saved to: {deferred_path}")
+    
+    results = []
+    for state in states:
+        results.append(_finalize_polished_question(state))
+        report.progress(len(results), len(questions))
     return results
 
 def test_ollama_polishing():
@@ -1437,7 +1743,7 @@ def test_ollama_polishing():
     print("=" * 60)
     
     # Check if Ollama is available
-    if not OLLAMA_AVAILABLE:
+    if _get_polish_backend()[0] is None:
         print("⚠️  Ollama not available. Skipping Ollama polishing tests.")
         print("   To enable Ollama polishing:")
         print("   1. Install Ollama from https://ollama.ai")
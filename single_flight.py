@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Single Flight - coalesce identical concurrent calls into one.
+While a call for a key is running, later callers with the same key wait for
+it and receive its result (or its exception) instead of starting their own.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional
+
+
+class _Call:
+    """One in-flight call and the callers waiting on it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Thread-safe call coalescing keyed by an arbitrary hashable key.
+
+    Only calls that overlap in time are merged; once a call finishes, the
+    next caller with the same key starts a new one. Results are not cached.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) unless a call with the same key is already running.
+
+        Args:
+            key: Identifies equivalent calls
+            fn: Function to run
+
+        Returns:
+            The result of the (possibly shared) call
+
+        Raises:
+            Whatever the shared call raised
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def do_stream(self, key: Hashable, fn: Callable[..., Iterable], finalize: Callable[[List], Any],
+                  *args, **kwargs) -> Iterator:
+        """
+        Streaming variant of do(): the leader yields fn's chunks as they arrive.
+
+        The shared result is finalize(chunks), so plain do() callers with the
+        same key receive the same value as a non-streamed call would return.
+        Callers joining a running call wait for it and get that result as a
+        single chunk.
+
+        Args:
+            key: Identifies equivalent calls
+            fn: Generator function producing chunks
+            finalize: Turns the full list of chunks into the shared result
+
+        Yields:
+            Chunks (leader) or the shared result (joiners)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            if call.result:
+                yield call.result
+            return
+
+        chunks: List = []
+        try:
+            for chunk in fn(*args, **kwargs):
+                chunks.append(chunk)
+                yield chunk
+            call.result = finalize(chunks)
+        except GeneratorExit:
+            # The streaming consumer went away; waiters must not hang or get a partial result
+            call.error = RuntimeError("Streaming call was abandoned before it finished")
+            raise
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        """Number of keys with a call currently running."""
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict:
+        """Executed and coalesced call counts."""
+        with self._lock:
+            total = self.executed + self.coalesced
+            return {
+                'executed': self.executed,
+                'coalesced': self.coalesced,
+                'coalesced_rate': self.coalesced / total * 100 if total else 0.0,
+                'in_flight': len(self._calls)
+            }
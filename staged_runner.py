@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Staged Runner - producer/consumer execution of the pipeline engine.
+Reading, the CPU stages (preprocess, score, match, template score), Ollama
+polishing and re-scoring run as separate stages connected by bounded
+queues. CPU stages run on a process pool and polishing on a thread pool,
+each with its own worker count, so the slowest stage sets the pace while
+the others keep it fed. Queue depths and per-stage utilization are
+reported by stats().
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from pipeline_engine import POLISH_AUTO, PipelineEngine, PolishExecutor
+
+# Configuration (override with environment variables)
+STAGE_CPU_WORKERS = int(os.environ.get("STAGE_CPU_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+STAGE_POLISH_WORKERS = int(os.environ.get("STAGE_POLISH_WORKERS", "4"))
+STAGE_RESCORE_WORKERS = int(os.environ.get("STAGE_RESCORE_WORKERS", "1"))
+STAGE_QUEUE_SIZE = int(os.environ.get("STAGE_QUEUE_SIZE", "32"))  # Items each queue holds before its producer blocks
+
+STAGES = ("read", "prepare", "polish", "rescore")
+
+_DONE = object()
+
+# Engine used by CPU stages inside pool worker processes
+_worker_engine: Optional[PipelineEngine] = None
+
+
+def _init_worker(polish: str) -> None:
+    global _worker_engine
+    _worker_engine = PipelineEngine(polish=polish, prefetch_fn=lambda texts: 0)
+
+
+def _prepare_state(state: Dict) -> Dict:
+    return _worker_engine.prepare(state)
+
+
+def _rescore_state(state: Dict) -> Dict:
+    _worker_engine.stage_rescore(state)
+    return state
+
+
+class StageStats:
+    """Item count, busy time and queue depth for one stage."""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.queue_samples = 0
+        self.queue_depth_total = 0
+        self.queue_depth_max = 0
+        self._lock = threading.Lock()
+
+    def record(self, busy_seconds: float) -> None:
+        with self._lock:
+            self.items += 1
+            self.busy_seconds += busy_seconds
+
+    def sample_queue(self, depth: int) -> None:
+        with self._lock:
+            self.queue_samples += 1
+            self.queue_depth_total += depth
+            self.queue_depth_max = max(self.queue_depth_max, depth)
+
+    def to_dict(self, elapsed: float, current_depth: int) -> Dict:
+        with self._lock:
+            capacity = self.workers * elapsed
+            return {
+                'workers': self.workers,
+                'items': self.items,
+                'busy_seconds': self.busy_seconds,
+                'utilization': self.busy_seconds / capacity if capacity > 0 else 0.0,
+                'input_queue_depth': current_depth,
+                'input_queue_depth_avg': self.queue_depth_total / self.queue_samples if self.queue_samples else 0.0,
+                'input_queue_depth_max': self.queue_depth_max
+            }
+
+
+class StagedRunner:
+    """
+    Run the pipeline engine as four stages connected by bounded queues.
+
+    read (1 thread) -> prepare (process pool) -> polish (thread pool) ->
+    rescore (process pool) -> consumer. Each stage blocks when its output
+    queue is full, so memory stays bounded by the queue sizes no matter how
+    large the input is.
+    """
+
+    def __init__(self, polish: str = POLISH_AUTO, cpu_workers: int = STAGE_CPU_WORKERS,
+                 polish_workers: int = STAGE_POLISH_WORKERS, rescore_workers: int = STAGE_RESCORE_WORKERS,
+                 queue_size: int = STAGE_QUEUE_SIZE, use_processes: bool = True,
+                 polish_executor: Optional[PolishExecutor] = None, ordered: bool = True):
+        """
+        Args:
+            polish: One of pipeline_engine.POLISH_MODES
+            cpu_workers: Workers for the prepare stage
+            polish_workers: Polish requests in flight at once
+            rescore_workers: Workers for the rescore stage
+            queue_size: Capacity of each queue between stages
+            use_processes: Run CPU stages on a process pool (False = in the stage threads)
+            polish_executor: Polish executor for single-question requests (see PipelineEngine)
+            ordered: Yield results in input order (False = as soon as each finishes)
+        """
+        self.polish = polish
+        self.workers = {
+            'read': 1,
+            'prepare': max(1, cpu_workers),
+            'polish': max(1, polish_workers),
+            'rescore': max(1, rescore_workers)
+        }
+        self.queue_size = max(1, queue_size)
+        self.use_processes = use_processes
+        self.ordered = ordered
+        self.engine = PipelineEngine(polish=polish, polish_executor=polish_executor, prefetch_fn=lambda texts: 0)
+        self._stats = {name: StageStats(name, workers) for name, workers in self.workers.items()}
+        self._queues: Dict[str, queue.Queue] = {}
+        self._start: Optional[float] = None
+        self._end: Optional[float] = None
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    # ------------------------------------------------------------------
+    # Queue helpers
+    # ------------------------------------------------------------------
+
+    def _put(self, stage: str, item) -> bool:
+        """Put an item on a stage's input queue, giving up if the run was stopped."""
+        q = self._queues[stage]
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                if stage in self._stats:
+                    self._stats[stage].sample_queue(q.qsize())
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, stage: str):
+        q = self._queues[stage]
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _fail(self, error: BaseException) -> None:
+        if self._error is None:
+            self._error = error
+        self._stop.set()
+
+    # ------------------------------------------------------------------
+    # Stages
+    # ------------------------------------------------------------------
+
+    def _read(self, questions: Iterable[Dict]) -> None:
+        stats = self._stats['read']
+        try:
+            started = time.perf_counter()
+            for sequence, question in enumerate(questions):
+                state = question if 'input_text' in question else PipelineEngine.state_from_question(question)
+                state['sequence'] = sequence
+                stats.record(time.perf_counter() - started)
+                if not self._put('prepare', state):
+                    return
+                started = time.perf_counter()
+        except Exception as e:
+            self._fail(e)
+        finally:
+            for _ in range(self.workers['prepare']):
+                self._put('prepare', _DONE)
+
+    def _worker(self, stage: str, next_stage: str, work, remaining: List[int], lock: threading.Lock) -> None:
+        stats = self._stats[stage]
+        try:
+            while True:
+                state = self._get(stage)
+                if state is _DONE:
+                    break
+                started = time.perf_counter()
+                state = work(state)
+                stats.record(time.perf_counter() - started)
+                if not self._put(next_stage, state):
+                    break
+        except Exception as e:
+            self._fail(e)
+        finally:
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                # The last worker of a stage tells every worker of the next one to finish
+                for _ in range(self.workers.get(next_stage, 1)):
+                    self._put(next_stage, _DONE)
+
+    def _polish(self, state: Dict) -> Dict:
+        self.engine.polish_states([state])
+        return state
+
+    def run(self, questions: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Run the pipeline over questions, yielding final engine states.
+
+        Args:
+            questions: get_random_questions_from_csv style dictionaries, or states from
+                PipelineEngine.new_state
+
+        Yields:
+            Final states, in input order unless ordered=False
+        """
+        self._stop.clear()
+        self._error = None
+        self._queues = {stage: queue.Queue(maxsize=self.queue_size) for stage in ("prepare", "polish", "rescore", "output")}
+        self._start = time.perf_counter()
+        self._end = None
+
+        pool = None
+        if self.use_processes:
+            pool = ProcessPoolExecutor(max_workers=self.workers['prepare'] + self.workers['rescore'],
+                                       initializer=_init_worker, initargs=(self.polish,))
+            prepare = lambda state: pool.submit(_prepare_state, state).result()
+            rescore = lambda state: pool.submit(_rescore_state, state).result()
+        else:
+            prepare = self.engine.prepare
+            rescore = lambda state: self.engine.stage_rescore(state) or state
+
+        threads = [threading.Thread(target=self._read, args=(questions,), name="stage-read", daemon=True)]
+        for stage, next_stage, work in (("prepare", "polish", prepare),
+                                        ("polish", "rescore", self._polish),
+                                        ("rescore", "output", rescore)):
+            remaining, lock = [self.workers[stage]], threading.Lock()
+            threads.extend(threading.Thread(target=self._worker, args=(stage, next_stage, work, remaining, lock),
+                                            name=f"stage-{stage}-{n}", daemon=True)
+                           for n in range(self.workers[stage]))
+        for thread in threads:
+            thread.start()
+
+        try:
+            pending: Dict[int, Dict] = {}
+            next_sequence = 0
+            while True:
+                state = self._get("output")
+                if state is _DONE:
+                    break
+                if not self.ordered:
+                    yield state
+                    continue
+                pending[state['sequence']] = state
+                while next_sequence in pending:
+                    yield pending.pop(next_sequence)
+                    next_sequence += 1
+            for sequence in sorted(pending):
+                yield pending.pop(sequence)
+            if self._error is not None:
+                raise self._error
+        finally:
+            # Also reached when the consumer stops early: unblock and drain every stage
+            self._stop.set()
+            for thread in threads:
+                thread.join(timeout=1.0)
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+            self._end = time.perf_counter()
+
+    def stats(self) -> Dict:
+        """Per-stage workers, items, utilization and input queue depth for the current or last run."""
+        if self._start is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self._end or time.perf_counter()) - self._start
+        stages = {}
+        for stage in STAGES:
+            depth = self._queues[stage].qsize() if stage in self._queues else 0
+            stages[stage] = self._stats[stage].to_dict(elapsed, depth)
+        busiest = max(STAGES[1:], key=lambda stage: stages[stage]['utilization'])
+        return {
+            'elapsed': elapsed,
+            'queue_size': self.queue_size,
+            'use_processes': self.use_processes,
+            'bottleneck': busiest if stages[busiest]['items'] else None,
+            'stages': stages
+        }
+
+
+def print_stage_stats(stats: Dict) -> None:
+    """Print a StagedRunner.stats() summary."""
+    print(f"\n🏭 STAGED PIPELINE ({stats['elapsed']:.1f}s, queue size {stats['queue_size']})")
+    for stage, stage_stats in stats['stages'].items():
+        print(f"   {stage:<8} workers={stage_stats['workers']:<3} items={stage_stats['items']:<6}"
+              f" utilization={stage_stats['utilization']:.0%}"
+              f" queue avg={stage_stats['input_queue_depth_avg']:.1f} max={stage_stats['input_queue_depth_max']}")
+    if stats['bottleneck']:
+        print(f"   🐢 Slowest stage: {stats['bottleneck']}")
@@ -0,0 +1,535 @@
+#!/usr/bin/env python3
+"""
+Streaming Statistics - constant-memory accumulators for analyzer summaries.
+Tracks count, mean, variance, min, max and positive count without keeping
+every value, and merges cleanly across worker processes.
+
+Quantiles and distributions come from fixed-bucket histograms. With bucket
+width w, every reported quantile of a value inside [low, high] is within w of
+the true sample quantile (the defaults give +/-0.01 on the 0-10 score scale).
+Values outside the range are still counted, and quantiles that fall there are
+reported as the exact min/max. Memory is bounded by the bucket count
+((high - low) / w counters per histogram), not by the number of values, so
+10M+ questions cost the same as 10.
+"""
+
+import math
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Pipeline stages tracked by ImprovementStats
+STAGES = ("template", "ollama", "final")
+
+# Histogram ranges: improvements are score differences, scores are 0-10
+IMPROVEMENT_RANGE = (-10.0, 10.0)
+SCORE_RANGE = (0.0, 10.0)
+HISTOGRAM_BUCKET_WIDTH = 0.01
+
+# Quantiles reported in summaries
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+
+class RunningStats:
+    """
+    Running count/mean/variance/min/max/positive accumulator.
+
+    Uses Welford's online update for a single value and Chan et al.'s
+    pairwise combination for merges, so the result does not depend on how
+    the values were split across workers.
+    """
+
+    __slots__ = ("count", "mean", "m2", "min", "max", "positive")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.positive = 0
+
+    def add(self, value: float) -> None:
+        """Add a single value."""
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value > 0:
+            self.positive += 1
+
+    def update(self, values: Iterable[float]) -> None:
+        """Add every value from an iterable."""
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "RunningStats") -> "RunningStats":
+        """Merge another accumulator into this one in place and return self."""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count = other.count
+            self.mean = other.mean
+            self.m2 = other.m2
+            self.min = other.min
+            self.max = other.max
+            self.positive = other.positive
+            return self
+
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.positive += other.positive
+        return self
+
+    @property
+    def variance(self) -> float:
+        """Population variance (0.0 for fewer than two values)."""
+        return self.m2 / self.count if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        """Population standard deviation."""
+        return math.sqrt(self.variance)
+
+    @property
+    def positive_rate(self) -> float:
+        """Percentage of values greater than zero."""
+        return self.positive / self.count * 100 if self.count else 0.0
+
+    def to_dict(self) -> Dict:
+        """Serialize to a JSON/pickle friendly dictionary."""
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'm2': self.m2,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+            'positive': self.positive,
+            'variance': self.variance,
+            'std': self.std,
+            'positive_rate': self.positive_rate
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "RunningStats":
+        """Rebuild an accumulator from to_dict() output."""
+        stats = cls()
+        stats.count = int(data.get('count', 0))
+        stats.mean = float(data.get('mean', 0.0))
+        stats.m2 = float(data.get('m2', 0.0))
+        stats.min = data['min'] if data.get('min') is not None else math.inf
+        stats.max = data['max'] if data.get('max') is not None else -math.inf
+        stats.positive = int(data.get('positive', 0))
+        return stats
+
+    def __repr__(self) -> str:
+        return (f"RunningStats(count={self.count}, mean={self.mean:.3f}, std={self.std:.3f}, "
+                f"min={self.min:.3f}, max={self.max:.3f}, positive={self.positive})")
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram with mergeable counts and quantile estimates.
+
+    Buckets are stored sparsely, so a histogram only holds the buckets that
+    have been hit (at most (high - low) / width of them). Two histograms can
+    only be merged when they share the same range and bucket width.
+    """
+
+    __slots__ = ("low", "high", "width", "counts", "underflow", "overflow", "count", "min", "max")
+
+    def __init__(self, low: float = IMPROVEMENT_RANGE[0], high: float = IMPROVEMENT_RANGE[1],
+                 width: float = HISTOGRAM_BUCKET_WIDTH):
+        if high <= low or width <= 0:
+            raise ValueError(f"Invalid histogram range [{low}, {high}] with width {width}")
+        self.low = float(low)
+        self.high = float(high)
+        self.width = float(width)
+        self.counts: Dict[int, int] = {}
+        self.underflow = 0
+        self.overflow = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    @property
+    def num_buckets(self) -> int:
+        """Number of in-range buckets."""
+        return int(math.ceil((self.high - self.low) / self.width))
+
+    def add(self, value: float) -> None:
+        """Add a single value."""
+        value = float(value)
+        self.count += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value < self.low:
+            self.underflow += 1
+        elif value > self.high:
+            self.overflow += 1
+        else:
+            # The upper bound itself belongs to the last bucket
+            index = min(int((value - self.low) / self.width), self.num_buckets - 1)
+            self.counts[index] = self.counts.get(index, 0) + 1
+
+    def update(self, values: Iterable[float]) -> None:
+        """Add every value from an iterable."""
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "Histogram") -> "Histogram":
+        """Merge another histogram with the same layout into this one."""
+        if (self.low, self.high, self.width) != (other.low, other.high, other.width):
+            raise ValueError("Cannot merge histograms with different ranges or bucket widths")
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate a quantile by interpolating inside the bucket that holds it.
+
+        Args:
+            q: Quantile in [0, 1]
+
+        Returns:
+            Estimated value, or None if the histogram is empty
+        """
+        if not 0.0 <= q <= 1.0:
+            raise ValueError(f"Quantile must be between 0 and 1, got {q}")
+        if self.count == 0:
+            return None
+
+        rank = q * self.count
+        if rank <= self.underflow:
+            return self.min
+        seen = self.underflow
+        for index in sorted(self.counts):
+            bucket_count = self.counts[index]
+            if seen + bucket_count >= rank:
+                fraction = (rank - seen) / bucket_count
+                estimate = self.low + (index + fraction) * self.width
+                return min(max(estimate, self.min), self.max)
+            seen += bucket_count
+        return self.max
+
+    def quantiles(self, qs: Sequence[float] = DEFAULT_QUANTILES) -> Dict[str, Optional[float]]:
+        """Estimate several quantiles, keyed as 'p50', 'p90', 'p99'..."""
+        return {_quantile_label(q): self.quantile(q) for q in qs}
+
+    def buckets(self, bin_width: float = 0.5) -> List[Tuple[float, int]]:
+        """
+        Coarsen the histogram for display.
+
+        Args:
+            bin_width: Width of the returned bins (multiple of the bucket width)
+
+        Returns:
+            List of (bin_start, count) pairs for non-empty bins, in order
+        """
+        step = max(1, int(round(bin_width / self.width)))
+        bins: Dict[int, int] = {}
+        for index, count in self.counts.items():
+            bins[index // step] = bins.get(index // step, 0) + count
+        result = [(round(self.low + b * step * self.width, 6), c) for b, c in sorted(bins.items())]
+        if self.underflow:
+            result.insert(0, (-math.inf, self.underflow))
+        if self.overflow:
+            result.append((self.high, self.overflow))
+        return result
+
+    def to_dict(self) -> Dict:
+        """Serialize to a JSON friendly dictionary."""
+        return {
+            'low': self.low,
+            'high': self.high,
+            'width': self.width,
+            'counts': {str(index): count for index, count in self.counts.items()},
+            'underflow': self.underflow,
+            'overflow': self.overflow,
+            'count': self.count,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Histogram":
+        """Rebuild a histogram from to_dict() output."""
+        histogram = cls(data['low'], data['high'], data['width'])
+        histogram.counts = {int(index): int(count) for index, count in data.get('counts', {}).items()}
+        histogram.underflow = int(data.get('underflow', 0))
+        histogram.overflow = int(data.get('overflow', 0))
+        histogram.count = int(data.get('count', 0))
+        histogram.min = data['min'] if data.get('min') is not None else math.inf
+        histogram.max = data['max'] if data.get('max') is not None else -math.inf
+        return histogram
+
+
+class LogHistogram:
+    """
+    Log-bucketed histogram for positive values spanning many orders of magnitude (e.g. latencies).
+
+    Bucket i covers [low * growth**i, low * growth**(i+1)), so every quantile
+    inside [low, high] is within a relative error of (growth - 1) / 2, and
+    the bucket count is fixed at log(high / low) / log(growth) however many
+    values are added (about 420 buckets for 1µs-10min at 5% growth).
+    """
+
+    __slots__ = ("low", "high", "growth", "_log_growth", "_num_buckets", "counts",
+                 "underflow", "overflow", "count", "min", "max")
+
+    def __init__(self, low: float, high: float, growth: float = 1.05):
+        if low <= 0 or high <= low or growth <= 1:
+            raise ValueError(f"Invalid log histogram range [{low}, {high}] with growth {growth}")
+        self.low = float(low)
+        self.high = float(high)
+        self.growth = float(growth)
+        self._log_growth = math.log(self.growth)
+        self._num_buckets = int(math.ceil(math.log(self.high / self.low) / self._log_growth))
+        self.counts: Dict[int, int] = {}
+        self.underflow = 0
+        self.overflow = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    @property
+    def num_buckets(self) -> int:
+        """Number of in-range buckets (the most this histogram will ever hold)."""
+        return self._num_buckets
+
+    def add(self, value: float) -> None:
+        """Add a single value."""
+        value = float(value)
+        self.count += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value < self.low:
+            self.underflow += 1
+        elif value > self.high:
+            self.overflow += 1
+        else:
+            index = min(int(math.log(value / self.low) / self._log_growth), self._num_buckets - 1)
+            self.counts[index] = self.counts.get(index, 0) + 1
+
+    def merge(self, other: "LogHistogram") -> "LogHistogram":
+        """Merge another histogram with the same layout into this one."""
+        if (self.low, self.high, self.growth) != (other.low, other.high, other.growth):
+            raise ValueError("Cannot merge log histograms with different ranges or growth factors")
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate a quantile by geometric interpolation inside the bucket that holds it.
+
+        Args:
+            q: Quantile in [0, 1]
+
+        Returns:
+            Estimated value, or None if the histogram is empty
+        """
+        if not 0.0 <= q <= 1.0:
+            raise ValueError(f"Quantile must be between 0 and 1, got {q}")
+        if self.count == 0:
+            return None
+
+        rank = q * self.count
+        if rank <= self.underflow:
+            return self.min
+        seen = self.underflow
+        for index in sorted(self.counts):
+            bucket_count = self.counts[index]
+            if seen + bucket_count >= rank:
+                fraction = (rank - seen) / bucket_count
+                estimate = self.low * self.growth ** (index + fraction)
+                return min(max(estimate, self.min), self.max)
+            seen += bucket_count
+        return self.max
+
+    def quantiles(self, qs: Sequence[float] = DEFAULT_QUANTILES) -> Dict[str, Optional[float]]:
+        """Estimate several quantiles, keyed as 'p50', 'p90', 'p99'..."""
+        return {_quantile_label(q): self.quantile(q) for q in qs}
+
+
+def _quantile_label(q: float) -> str:
+    """Format 0.5 as 'p50', 0.999 as 'p99.9'."""
+    return "p" + f"{q * 100:.3f}".rstrip("0").rstrip(".")
+
+
+class ImprovementStats:
+    """
+    Improvement summary tracked overall, per question type and per stage.
+
+    Each (stage, type) pair keeps a RunningStats accumulator and a Histogram
+    of improvements; enhanced scores get their own histograms. Memory grows
+    with the number of (stage, type) pairs, never with the number of
+    questions, so summaries for millions of questions stay small.
+    """
+
+    def __init__(self):
+        self.total_questions = 0
+        self.type_counts: Dict[str, int] = {}
+        self.stages: Dict[str, RunningStats] = {}
+        self.by_type: Dict[str, Dict[str, RunningStats]] = {}
+        self.histograms: Dict[Tuple[str, Optional[str]], Histogram] = {}
+        self.score_histograms: Dict[Tuple[str, Optional[str]], Histogram] = {}
+
+    def count_question(self, question_type: str) -> None:
+        """Count a processed question for the type distribution."""
+        self.total_questions += 1
+        self.type_counts[question_type] = self.type_counts.get(question_type, 0) + 1
+
+    def add(self, stage: str, value: float, question_type: Optional[str] = None) -> None:
+        """
+        Record an improvement value for a stage.
+
+        Args:
+            stage: Pipeline stage ('template', 'ollama' or 'final')
+            value: Enhanced score improvement
+            question_type: Question type for the per-type breakdown (optional)
+        """
+        self.stage(stage).add(value)
+        self.histogram(stage).add(value)
+        if question_type is not None:
+            self.stage(stage, question_type).add(value)
+            self.histogram(stage, question_type).add(value)
+
+    def add_score(self, stage: str, score: float, question_type: Optional[str] = None) -> None:
+        """
+        Record an enhanced score for the score distribution of a stage.
+
+        Args:
+            stage: Pipeline stage the score was measured after
+            score: Enhanced score (0-10)
+            question_type: Question type for the per-type breakdown (optional)
+        """
+        self.score_histogram(stage).add(score)
+        if question_type is not None:
+            self.score_histogram(stage, question_type).add(score)
+
+    def stage(self, stage: str, question_type: Optional[str] = None) -> RunningStats:
+        """Get (creating if needed) the accumulator for a stage, optionally per type."""
+        if question_type is None:
+            if stage not in self.stages:
+                self.stages[stage] = RunningStats()
+            return self.stages[stage]
+        type_stages = self.by_type.setdefault(question_type, {})
+        if stage not in type_stages:
+            type_stages[stage] = RunningStats()
+        return type_stages[stage]
+
+    def histogram(self, stage: str, question_type: Optional[str] = None) -> Histogram:
+        """Get (creating if needed) the improvement histogram for a stage, optionally per type."""
+        key = (stage, question_type)
+        if key not in self.histograms:
+            self.histograms[key] = Histogram(*IMPROVEMENT_RANGE)
+        return self.histograms[key]
+
+    def score_histogram(self, stage: str, question_type: Optional[str] = None) -> Histogram:
+        """Get (creating if needed) the enhanced-score histogram for a stage, optionally per type."""
+        key = (stage, question_type)
+        if key not in self.score_histograms:
+            self.score_histograms[key] = Histogram(*SCORE_RANGE)
+        return self.score_histograms[key]
+
+    def merge(self, other: "ImprovementStats") -> "ImprovementStats":
+        """Merge another summary (e.g. from a worker process) into this one."""
+        self.total_questions += other.total_questions
+        for q_type, count in other.type_counts.items():
+            self.type_counts[q_type] = self.type_counts.get(q_type, 0) + count
+        for stage, stats in other.stages.items():
+            self.stage(stage).merge(stats)
+        for q_type, type_stages in other.by_type.items():
+            for stage, stats in type_stages.items():
+                self.stage(stage, q_type).merge(stats)
+        for (stage, q_type), histogram in other.histograms.items():
+            self.histogram(stage, q_type).merge(histogram)
+        for (stage, q_type), histogram in other.score_histograms.items():
+            self.score_histogram(stage, q_type).merge(histogram)
+        return self
+
+    def quantile_summary(self, qs: Sequence[float] = DEFAULT_QUANTILES) -> Dict:
+        """
+        Improvement and enhanced-score quantiles, overall and per type.
+
+        Returns:
+            Dictionary of the form
+            {'overall': {stage: {'improvement': {...}, 'score': {...}}},
+             'by_type': {type: {stage: {'improvement': {...}, 'score': {...}}}}}
+        """
+        summary: Dict = {'overall': {}, 'by_type': {}}
+        for histograms, kind in ((self.histograms, 'improvement'), (self.score_histograms, 'score')):
+            for (stage, q_type), histogram in histograms.items():
+                target = summary['overall'] if q_type is None else summary['by_type'].setdefault(q_type, {})
+                target.setdefault(stage, {})[kind] = histogram.quantiles(qs)
+        return summary
+
+    def to_dict(self, include_histograms: bool = True) -> Dict:
+        """
+        Serialize to a JSON friendly dictionary.
+
+        Args:
+            include_histograms: Include raw bucket counts (needed for merging)
+        """
+        data = {
+            'total_questions': self.total_questions,
+            'type_counts': dict(self.type_counts),
+            'stages': {stage: stats.to_dict() for stage, stats in self.stages.items()},
+            'by_type': {
+                q_type: {stage: stats.to_dict() for stage, stats in type_stages.items()}
+                for q_type, type_stages in self.by_type.items()
+            },
+            'quantiles': self.quantile_summary()
+        }
+        if include_histograms:
+            data['histograms'] = [
+                {'stage': stage, 'type': q_type, 'histogram': histogram.to_dict()}
+                for (stage, q_type), histogram in self.histograms.items()
+            ]
+            data['score_histograms'] = [
+                {'stage': stage, 'type': q_type, 'histogram': histogram.to_dict()}
+                for (stage, q_type), histogram in self.score_histograms.items()
+            ]
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ImprovementStats":
+        """Rebuild a summary from to_dict() output."""
+        summary = cls()
+        summary.total_questions = int(data.get('total_questions', 0))
+        summary.type_counts = dict(data.get('type_counts', {}))
+        for stage, stats in data.get('stages', {}).items():
+            summary.stages[stage] = RunningStats.from_dict(stats)
+        for q_type, type_stages in data.get('by_type', {}).items():
+            summary.by_type[q_type] = {
+                stage: RunningStats.from_dict(stats) for stage, stats in type_stages.items()
+            }
+        for entry in data.get('histograms', []):
+            summary.histograms[(entry['stage'], entry['type'])] = Histogram.from_dict(entry['histogram'])
+        for entry in data.get('score_histograms', []):
+            summary.score_histograms[(entry['stage'], entry['type'])] = Histogram.from_dict(entry['histogram'])
+        return summary
@@ -0,0 +1,92 @@
+"""Tests for budgeted, prioritized polishing in polish_scheduler."""
+
+import unittest
+
+from polish_scheduler import PolishScheduler
+
+
+def request(text: str, score: float, question_type: str = "Debug", force: bool = False):
+    metrics = {'clarity': score, 'conciseness': score, 'technical_accuracy': score, 'actionability': score}
+    return {'question_text': text, 'template_metrics': metrics, 'question_type': question_type, 'force': force}
+
+
+def polish_all(wave, remaining_seconds):
+    return [{'polished_text': item['question_text'].upper()} for item in wave]
+
+
+class PolishSchedulerOrderTest(unittest.TestCase):
+
+    def test_lowest_score_first(self):
+        requests = [request("a", 6.0), request("b", 2.0), request("c", 4.0)]
+        self.assertEqual(PolishScheduler(None, None, None).order(requests), [1, 2, 0])
+
+    def test_non_candidates_left_out(self):
+        requests = [request("a", 9.5), request("b", 3.0), request("c", 9.5, force=True)]
+        self.assertEqual(PolishScheduler(None, None, None).order(requests), [1, 2])
+
+    def test_quota_puts_other_types_first(self):
+        requests = [
+            request("d1", 1.0, "Debug"), request("d2", 2.0, "Debug"), request("d3", 3.0, "Debug"),
+            request("r1", 5.0, "Review"), request("r2", 6.0, "Review")
+        ]
+        order = PolishScheduler(None, None, per_type_quota=1).order(requests)
+        self.assertEqual(order, [0, 3, 1, 2, 4])
+
+
+class PolishSchedulerRunTest(unittest.TestCase):
+
+    def test_call_budget_defers_the_rest(self):
+        requests = [request(f"q{i}", float(i)) for i in range(5)]
+        scheduler = PolishScheduler(max_calls=2, max_seconds=None, per_type_quota=None)
+        outcomes = scheduler.run(requests, polish_all, wave_size=3)
+
+        self.assertEqual([o and o['polished_text'] for o in outcomes], ["Q0", "Q1", None, None, None])
+        summary = scheduler.summary()
+        self.assertEqual(summary['calls'], 2)
+        self.assertEqual(summary['stop_reason'], "call budget")
+        self.assertEqual([item['index'] for item in scheduler.deferred], [2, 3, 4])
+
+    def test_waves_never_exceed_remaining_budget(self):
+        waves = []
+
+        def record(wave, remaining_seconds):
+            waves.append(len(wave))
+            return polish_all(wave, remaining_seconds)
+
+        scheduler = PolishScheduler(max_calls=5, max_seconds=None, per_type_quota=None)
+        scheduler.run([request(f"q{i}", 1.0) for i in range(10)], record, wave_size=4)
+        self.assertEqual(waves, [4, 1])
+
+    def test_non_candidates_keep_text_without_budget(self):
+        requests = [request("good", 9.5), request("bad", 1.0)]
+        scheduler = PolishScheduler(max_calls=1, max_seconds=None, per_type_quota=None)
+        outcomes = scheduler.run(requests, polish_all)
+
+        self.assertEqual(outcomes[0], {'polished_text': "good"})
+        self.assertEqual(outcomes[1], {'polished_text': "BAD"})
+        self.assertEqual(scheduler.summary()['skipped'], 1)
+        self.assertEqual(scheduler.summary()['deferred'], 0)
+
+    def test_unstarted_requests_are_deferred(self):
+        def half(wave, remaining_seconds):
+            return [polish_all([item], remaining_seconds)[0] if n == 0 else None for n, item in enumerate(wave)]
+
+        requests = [request(f"q{i}", float(i)) for i in range(4)]
+        scheduler = PolishScheduler(max_calls=None, max_seconds=None, per_type_quota=None)
+        outcomes = scheduler.run(requests, half, wave_size=2)
+
+        self.assertEqual(outcomes[0], {'polished_text': "Q0"})
+        self.assertEqual(outcomes[1:], [None, None, None])
+        self.assertEqual(scheduler.stop_reason, "time budget")
+        self.assertEqual([item['index'] for item in scheduler.deferred], [1, 2, 3])
+
+    def test_exhausted_time_budget_polishes_nothing(self):
+        scheduler = PolishScheduler(max_calls=None, max_seconds=0.0, per_type_quota=None)
+        outcomes = scheduler.run([request("q", 1.0, "Review")], polish_all)
+
+        self.assertEqual(outcomes, [None])
+        self.assertEqual(scheduler.summary()['deferred_by_type'], {"Review": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""Tests for shard assignment, overlap and coverage used by the sharded bulk runner."""
+
+import json
+import os
+import tempfile
+import unittest
+
+from streaming_stats import ImprovementStats
+
+try:
+    from metrics_analyzer import shards_overlap, shard_coverage, merge_shard_summaries
+    from simple_question_tester import shard_of
+    from reporter import configure_reporter, get_reporter, QUIET
+    ANALYZER_AVAILABLE = True
+except ImportError:
+    ANALYZER_AVAILABLE = False
+
+
+@unittest.skipUnless(ANALYZER_AVAILABLE, "metrics_analyzer dependencies (pandas, metrics3) not installed")
+class ShardOverlapTest(unittest.TestCase):
+
+    def test_same_count(self):
+        self.assertTrue(shards_overlap((1, 4), (1, 4)))
+        self.assertFalse(shards_overlap((0, 4), (1, 4)))
+
+    def test_nested_counts(self):
+        self.assertTrue(shards_overlap((0, 2), (0, 4)))
+        self.assertTrue(shards_overlap((0, 2), (2, 4)))
+        self.assertFalse(shards_overlap((1, 2), (0, 4)))
+        self.assertFalse(shards_overlap((0, 4), (1, 2)))
+
+    def test_coprime_counts_always_overlap(self):
+        self.assertTrue(shards_overlap((0, 2), (1, 3)))
+        self.assertTrue(shards_overlap((1, 2), (2, 3)))
+
+    def test_matches_brute_force(self):
+        for first in [(i, n) for n in range(1, 7) for i in range(n)]:
+            for second in [(j, m) for m in range(1, 7) for j in range(m)]:
+                brute = any(h % first[1] == first[0] and h % second[1] == second[0] for h in range(60))
+                self.assertEqual(shards_overlap(first, second), brute, (first, second))
+
+
+@unittest.skipUnless(ANALYZER_AVAILABLE, "metrics_analyzer dependencies (pandas, metrics3) not installed")
+class ShardCoverageTest(unittest.TestCase):
+
+    def test_full_single_count(self):
+        self.assertEqual(shard_coverage([(i, 4) for i in range(4)]), 1.0)
+        self.assertEqual(shard_coverage([(0, 1)]), 1.0)
+
+    def test_missing_shard(self):
+        self.assertEqual(shard_coverage([(0, 4), (1, 4), (3, 4)]), 0.75)
+
+    def test_mixed_counts(self):
+        self.assertEqual(shard_coverage([(1, 2), (0, 4), (2, 4)]), 1.0)
+        self.assertEqual(shard_coverage([(1, 2), (0, 4)]), 0.75)
+        self.assertAlmostEqual(shard_coverage([(0, 2), (0, 3)]), 4 / 6)
+
+    def test_too_many_residues(self):
+        self.assertIsNone(shard_coverage([(0, 1009), (0, 1013)]))
+
+    def test_worker_shards_nest_inside_node_shard(self):
+        # run_sharded splits shard i/N across W workers as (i + k*N) / (N*W)
+        node, count, workers = 1, 3, 4
+        worker_shards = [(node + k * count, count * workers) for k in range(workers)]
+        for question_id in range(500):
+            in_worker = any(shard_of(question_id, n) == i for i, n in worker_shards)
+            self.assertEqual(in_worker, shard_of(question_id, count) == node)
+        self.assertAlmostEqual(shard_coverage(worker_shards), 1 / count)
+
+
+@unittest.skipUnless(ANALYZER_AVAILABLE, "metrics_analyzer dependencies (pandas, metrics3) not installed")
+class MergeShardSummariesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.previous_verbosity = get_reporter().verbosity
+        configure_reporter(verbosity=QUIET)
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        configure_reporter(verbosity=self.previous_verbosity)
+        self.directory.cleanup()
+
+    def write_summary(self, index: int, count: int, improvements) -> str:
+        stats = ImprovementStats()
+        for value in improvements:
+            stats.count_question("Debug")
+            stats.add("template", value, "Debug")
+        path = os.path.join(self.directory.name, f"shard-{index:03d}-of-{count:03d}.summary.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'shard': index, 'num_shards': count, 'matched_count': len(improvements),
+                       'improvement_stats': stats.to_dict()}, f)
+        return path
+
+    def test_merges_disjoint_shards(self):
+        paths = [self.write_summary(0, 2, [1.0, 2.0]), self.write_summary(1, 2, [3.0])]
+        stats = merge_shard_summaries(paths)
+        self.assertEqual(stats['improvement_stats'].total_questions, 3)
+        self.assertEqual(stats['improvement_stats'].stage("template").mean, 2.0)
+
+    def test_skips_overlapping_shard(self):
+        paths = [self.write_summary(0, 2, [1.0, 2.0]), self.write_summary(0, 4, [5.0]),
+                 self.write_summary(1, 2, [3.0])]
+        stats = merge_shard_summaries(paths)
+        self.assertEqual(stats['improvement_stats'].total_questions, 3)
+
+    def test_no_summaries(self):
+        self.assertIsNone(merge_shard_summaries([self.directory.name]))
+
+
+if __name__ == "__main__":
+    unittest.main()
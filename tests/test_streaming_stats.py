@@ -0,0 +1,118 @@
+"""Tests for the mergeable accumulators in streaming_stats."""
+
+import json
+import math
+import random
+import unittest
+
+from streaming_stats import RunningStats, ImprovementStats
+
+
+def _values(seed: int, count: int):
+    rng = random.Random(seed)
+    return [rng.uniform(-3.0, 5.0) for _ in range(count)]
+
+
+class RunningStatsMergeTest(unittest.TestCase):
+
+    def assert_same_stats(self, merged: RunningStats, single: RunningStats):
+        self.assertEqual(merged.count, single.count)
+        self.assertAlmostEqual(merged.mean, single.mean, places=9)
+        self.assertAlmostEqual(merged.m2, single.m2, places=6)
+        self.assertAlmostEqual(merged.variance, single.variance, places=9)
+        self.assertEqual(merged.min, single.min)
+        self.assertEqual(merged.max, single.max)
+        self.assertEqual(merged.positive, single.positive)
+
+    def test_merge_matches_single_pass(self):
+        values = _values(1, 1000)
+        single = RunningStats()
+        single.update(values)
+
+        for splits in ([500], [1, 999], [10, 250, 251, 900]):
+            bounds = [0] + splits + [len(values)]
+            merged = RunningStats()
+            for start, end in zip(bounds, bounds[1:]):
+                part = RunningStats()
+                part.update(values[start:end])
+                merged.merge(part)
+            self.assert_same_stats(merged, single)
+
+    def test_merge_order_does_not_matter(self):
+        parts = []
+        for seed in range(4):
+            part = RunningStats()
+            part.update(_values(seed, 50 + seed * 37))
+            parts.append(part)
+
+        forward = RunningStats()
+        for part in parts:
+            forward.merge(RunningStats.from_dict(part.to_dict()))
+        backward = RunningStats()
+        for part in reversed(parts):
+            backward.merge(RunningStats.from_dict(part.to_dict()))
+        self.assert_same_stats(forward, backward)
+
+    def test_merge_with_empty(self):
+        full = RunningStats()
+        full.update([1.0, -2.0, 4.0])
+
+        merged = RunningStats().merge(full)
+        self.assert_same_stats(merged, full)
+        self.assert_same_stats(full.merge(RunningStats()), merged)
+
+    def test_variance_matches_two_pass(self):
+        values = _values(7, 200)
+        stats = RunningStats()
+        stats.update(values)
+        mean = sum(values) / len(values)
+        self.assertAlmostEqual(stats.variance, sum((v - mean) ** 2 for v in values) / len(values), places=9)
+
+    def test_round_trip_empty(self):
+        stats = RunningStats.from_dict(json.loads(json.dumps(RunningStats().to_dict())))
+        self.assertEqual(stats.count, 0)
+        self.assertEqual(stats.min, math.inf)
+        self.assertEqual(stats.max, -math.inf)
+
+
+class ImprovementStatsRoundTripTest(unittest.TestCase):
+
+    def build(self, seed: int) -> ImprovementStats:
+        rng = random.Random(seed)
+        stats = ImprovementStats()
+        for _ in range(300):
+            question_type = rng.choice(["Debug", "Code Review", "other"])
+            stats.count_question(question_type)
+            stats.add("template", rng.uniform(-1.0, 3.0), question_type)
+            if rng.random() < 0.3:
+                stats.add("ollama", rng.uniform(0.0, 2.0), question_type)
+            stats.add_score("final", rng.uniform(0.0, 10.0), question_type)
+        return stats
+
+    def test_round_trip_preserves_summary(self):
+        stats = self.build(3)
+        restored = ImprovementStats.from_dict(json.loads(json.dumps(stats.to_dict())))
+        self.assertEqual(restored.to_dict(), stats.to_dict())
+
+    def test_merge_after_round_trip_matches_single_pass(self):
+        first, second = self.build(4), self.build(5)
+        merged = ImprovementStats.from_dict(first.to_dict()).merge(ImprovementStats.from_dict(second.to_dict()))
+        direct = self.build(4).merge(self.build(5))
+
+        self.assertEqual(merged.total_questions, 600)
+        self.assertEqual(merged.type_counts, direct.type_counts)
+        for stage in ("template", "ollama"):
+            self.assertEqual(merged.stage(stage).count, direct.stage(stage).count)
+            self.assertAlmostEqual(merged.stage(stage).mean, direct.stage(stage).mean, places=9)
+            self.assertAlmostEqual(merged.stage(stage).m2, direct.stage(stage).m2, places=6)
+        self.assertEqual(merged.quantile_summary(), direct.quantile_summary())
+
+    def test_round_trip_without_histograms_keeps_accumulators(self):
+        stats = self.build(6)
+        restored = ImprovementStats.from_dict(stats.to_dict(include_histograms=False))
+        self.assertEqual(restored.stage("template", "Debug").to_dict(), stats.stage("template", "Debug").to_dict())
+        self.assertEqual(restored.histograms, {})
+
+
+if __name__ == "__main__":
+    unittest.main()